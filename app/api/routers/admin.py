@@ -225,7 +225,7 @@ def delete_snapshot(
         )
 
     try:
-        snapshot_path.unlink()
+        service.snapshots.delete(snapshot_path)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -3,18 +3,24 @@ from fastapi import APIRouter, Depends, HTTPException, Response, status
 from app.core.exceptions import (
     DimensionalityMismatchException,
     InvalidAlgorithmException,
+    InvalidIndexParamsException,
     InvalidMetricException,
     ResourceNotFoundException,
 )
 from app.domain.dto import (
+    BatchSearchRequestDTO,
+    BatchSearchResponseDTO,
     ChunkDTO,
     CreateChunkDTO,
     CreateDocumentDTO,
     CreateLibraryDTO,
     DocumentDTO,
+    IndexAutotuneRequestDTO,
+    IndexBuildJobDTO,
     IndexBuildRequestDTO,
     IndexInfoDTO,
     LibraryDTO,
+    SearchPlanDTO,
     SearchRequestDTO,
     SearchResponseDTO,
     SearchResultItemDTO,
@@ -357,8 +363,14 @@ def create_or_replace_index(
     service: VectorDBService = Depends(get_service),
 ) -> IndexInfoDTO:
     try:
-        service.indices.build_index(library_id, payload.algorithm, payload.metric)
-    except (InvalidAlgorithmException, InvalidMetricException) as e:
+        service.indices.build_index(
+            library_id, payload.algorithm, payload.metric, payload.params
+        )
+    except (
+        InvalidAlgorithmException,
+        InvalidMetricException,
+        InvalidIndexParamsException,
+    ) as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e),
@@ -369,9 +381,99 @@ def create_or_replace_index(
         library_id=info["library_id"],
         algorithm=info["algorithm"],
         metric=info["metric"],
+        params=info.get("params", {}),
     )
 
 
+@router.post(
+    "/{library_id}/index/jobs",
+    status_code=status.HTTP_202_ACCEPTED,
+    response_model=IndexBuildJobDTO,
+)
+def submit_index_build(
+    library_id: str,
+    payload: IndexBuildRequestDTO,
+    service: VectorDBService = Depends(get_service),
+) -> IndexBuildJobDTO:
+    try:
+        service.libraries.get_library(library_id)
+    except ResourceNotFoundException:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Library not found: {library_id}",
+        )
+
+    try:
+        job = service.indices.submit_build(
+            library_id, payload.algorithm, payload.metric, payload.params
+        )
+    except (
+        InvalidAlgorithmException,
+        InvalidMetricException,
+        InvalidIndexParamsException,
+    ) as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        )
+    return IndexBuildJobDTO(**job)
+
+
+@router.get(
+    "/{library_id}/index/jobs/{job_id}",
+    response_model=IndexBuildJobDTO,
+)
+def get_index_build(
+    library_id: str,
+    job_id: str,
+    service: VectorDBService = Depends(get_service),
+) -> IndexBuildJobDTO:
+    try:
+        job = service.indices.get_build_job(library_id, job_id)
+    except ResourceNotFoundException as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e),
+        )
+    return IndexBuildJobDTO(**job)
+
+
+@router.post(
+    "/{library_id}/index/autotune",
+    status_code=status.HTTP_202_ACCEPTED,
+    response_model=IndexBuildJobDTO,
+)
+def autotune_index(
+    library_id: str,
+    payload: IndexAutotuneRequestDTO,
+    service: VectorDBService = Depends(get_service),
+) -> IndexBuildJobDTO:
+    try:
+        service.libraries.get_library(library_id)
+    except ResourceNotFoundException:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Library not found: {library_id}",
+        )
+
+    try:
+        job = service.indices.submit_autotune(
+            library_id,
+            payload.metric,
+            k=payload.k,
+            target_recall=payload.target_recall,
+            max_latency_ms=payload.max_latency_ms,
+            sample_size=payload.sample_size,
+            num_queries=payload.num_queries,
+        )
+    except (InvalidMetricException, ValueError) as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        )
+    return IndexBuildJobDTO(**job)
+
+
 @router.get(
     "/{library_id}/index",
     response_model=IndexInfoDTO,
@@ -390,6 +492,7 @@ def get_index(
         library_id=info["library_id"],
         algorithm=info["algorithm"],
         metric=info["metric"],
+        params=info.get("params", {}),
     )
 
 
@@ -413,11 +516,30 @@ def search_chunks(
     service: VectorDBService = Depends(get_service),
 ) -> SearchResponseDTO:
 
+    next_offset = None
     try:
-        results = service.indices.search(
-            library_id, request.vector, request.k, request.metadata_filters
-        )
-    except ValueError as e:
+        if request.is_range():
+            # Range mode: every chunk within the threshold, k per page
+            results, next_offset, plan = service.indices.range_search(
+                library_id,
+                request.vector,
+                request.k,
+                min_score=request.min_score,
+                max_distance=request.max_distance,
+                offset=request.offset,
+                metadata_filters=request.metadata_filters,
+            )
+        else:
+            results, plan = service.indices.search_with_plan(
+                library_id,
+                request.vector,
+                request.k,
+                request.metadata_filters,
+                request.search_params,
+                request.deadline_ms,
+                request.rerank_factor,
+            )
+    except (ValueError, InvalidIndexParamsException) as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e),
@@ -445,4 +567,60 @@ def search_chunks(
         results=items,
         metric=idx.get("metric"),
         algorithm=idx.get("algorithm"),
+        plan=SearchPlanDTO(**plan),
+        next_offset=next_offset,
+    )
+
+
+@router.post("/{library_id}/chunks/search/batch", response_model=BatchSearchResponseDTO)
+def search_chunks_batch(
+    library_id: str,
+    request: BatchSearchRequestDTO,
+    service: VectorDBService = Depends(get_service),
+) -> BatchSearchResponseDTO:
+    try:
+        batch_results, plan = service.indices.search_batch_with_plan(
+            library_id,
+            request.vectors,
+            request.k,
+            request.metadata_filters,
+            request.search_params,
+            request.deadline_ms,
+            request.rerank_factor,
+        )
+    except (ValueError, InvalidIndexParamsException) as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        )
+
+    # Hydrate every distinct chunk once for the whole batch
+    chunk_ids = list({chunk_id for results in batch_results for chunk_id, _ in results})
+    chunks = service.chunks.get_chunks(chunk_ids)
+
+    items: list[list[SearchResultItemDTO]] = []
+    for results in batch_results:
+        query_items: list[SearchResultItemDTO] = []
+        for chunk_id, score in results:
+            chunk = chunks.get(chunk_id)
+            if chunk is None:
+                continue
+
+            query_items.append(
+                SearchResultItemDTO(
+                    chunk_id=chunk.id,
+                    document_id=chunk.document_id,
+                    score=score,
+                    text=chunk.text,
+                    metadata=chunk.metadata,
+                )
+            )
+        items.append(query_items)
+
+    idx = service.indices.get_index_info(library_id)
+    return BatchSearchResponseDTO(
+        results=items,
+        metric=idx.get("metric"),
+        algorithm=idx.get("algorithm"),
+        plan=SearchPlanDTO(**plan),
     )
@@ -41,6 +41,17 @@ class Settings:
         default_factory=lambda: os.getenv("DEFAULT_INDEX", IndexAlgorithm.LINEAR.value)
     )
 
+    # KD-Tree configuration (KDTREE_MAX_CHECKS=0 searches exactly)
+    kdtree_num_trees: int = field(
+        default_factory=lambda: int(os.getenv("KDTREE_NUM_TREES", "1"))
+    )
+    kdtree_max_checks: int = field(
+        default_factory=lambda: int(os.getenv("KDTREE_MAX_CHECKS", "0"))
+    )
+    kdtree_seed: int = field(
+        default_factory=lambda: int(os.getenv("KDTREE_SEED", "42"))
+    )
+
     # LSH configuration
     lsh_num_planes: int = field(
         default_factory=lambda: int(os.getenv("LSH_NUM_PLANES", "16"))
@@ -48,8 +59,70 @@ class Settings:
     lsh_num_tables: int = field(
         default_factory=lambda: int(os.getenv("LSH_NUM_TABLES", "4"))
     )
+    lsh_probes: int = field(default_factory=lambda: int(os.getenv("LSH_PROBES", "16")))
     lsh_seed: int = field(default_factory=lambda: int(os.getenv("LSH_SEED", "42")))
 
+    # HNSW configuration
+    hnsw_m: int = field(default_factory=lambda: int(os.getenv("HNSW_M", "16")))
+    hnsw_ef_construction: int = field(
+        default_factory=lambda: int(os.getenv("HNSW_EF_CONSTRUCTION", "200"))
+    )
+    hnsw_ef_search: int = field(
+        default_factory=lambda: int(os.getenv("HNSW_EF_SEARCH", "64"))
+    )
+    hnsw_seed: int = field(default_factory=lambda: int(os.getenv("HNSW_SEED", "42")))
+
+    # IVF configuration (IVF_NLIST=0 picks sqrt(n) lists at build time)
+    ivf_nlist: int = field(default_factory=lambda: int(os.getenv("IVF_NLIST", "0")))
+    ivf_nprobe: int = field(default_factory=lambda: int(os.getenv("IVF_NPROBE", "8")))
+    ivf_seed: int = field(default_factory=lambda: int(os.getenv("IVF_SEED", "42")))
+
+    # IVF-PQ configuration (IVFPQ_M=0 picks sub-vectors of >= 16 dims)
+    ivfpq_m: int = field(default_factory=lambda: int(os.getenv("IVFPQ_M", "0")))
+    ivfpq_rerank: int = field(
+        default_factory=lambda: int(os.getenv("IVFPQ_RERANK", "100"))
+    )
+
+    # Binary quantization configuration
+    binary_rotation: str = field(
+        default_factory=lambda: os.getenv("BINARY_ROTATION", "none")
+    )
+    binary_rerank: int = field(
+        default_factory=lambda: int(os.getenv("BINARY_RERANK", "200"))
+    )
+    binary_seed: int = field(
+        default_factory=lambda: int(os.getenv("BINARY_SEED", "42"))
+    )
+
+    # Exact re-ranking: compressed indices re-score rerank_factor x k candidates
+    rerank_factor: int = field(
+        default_factory=lambda: int(os.getenv("RERANK_FACTOR", "4"))
+    )
+
+    # Keep a float32 copy of every embedding of libraries whose index
+    # re-ranks, for faster re-ranking; otherwise candidates are fetched
+    # from the repository
+    rerank_store: bool = field(
+        default_factory=lambda: os.getenv("RERANK_STORE", "false").lower() == "true"
+    )
+
+    # Parallel index builds: worker processes (KD-Tree) or threads (LSH,
+    # IVF, IVF-PQ) per build, 1 builds on the calling thread
+    index_build_workers: int = field(
+        default_factory=lambda: int(os.getenv("INDEX_BUILD_WORKERS", "1"))
+    )
+
+    # Threads shared by sharded indices to search their shards in
+    # parallel (0 = one per CPU)
+    shard_search_workers: int = field(
+        default_factory=lambda: int(os.getenv("SHARD_SEARCH_WORKERS", "0"))
+    )
+
+    # Background index builds run at the same time (POST .../index/jobs)
+    index_job_workers: int = field(
+        default_factory=lambda: int(os.getenv("INDEX_JOB_WORKERS", "1"))
+    )
+
     # Logging configuration
     log_level: str = field(default_factory=lambda: os.getenv("LOG_LEVEL", "INFO"))
 
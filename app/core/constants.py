@@ -8,6 +8,44 @@ from enum import Enum
 DEFAULT_SEARCH_MULTIPLIER = 3
 MAX_SEARCH_BUFFER = 50
 MIN_SEARCH_K = 1
+# Filters estimated to match at least this fraction of a library are
+# applied after an over-fetching index query instead of inside it
+POST_FILTER_MIN_SELECTIVITY = 0.5
+# Deepest result a paginated range search may reach (offset + page size)
+MAX_RANGE_RESULTS = 10000
+# Largest multiple of k a search may fetch for exact re-ranking
+MAX_RERANK_FACTOR = 100
+
+
+# Filtered search strategies chosen by the search planner
+class SearchStrategy(str, Enum):
+    """Enumeration of ways a search can be executed."""
+
+    INDEX = "index"
+    EXACT = "exact"
+    FILTERED = "filtered"
+    POST_FILTER = "post_filter"
+
+
+# Lifecycle of a background index build
+class IndexJobStatus(str, Enum):
+    """Enumeration of background index build states."""
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+
+class IndexJobKind(str, Enum):
+    """Enumeration of background index job types."""
+
+    BUILD = "build"
+    AUTOTUNE = "autotune"
+
+
+# Finished index build jobs kept for status queries; older ones are dropped
+MAX_RETAINED_INDEX_JOBS = 100
 
 
 # Index algorithms
@@ -17,6 +55,10 @@ class IndexAlgorithm(str, Enum):
     LINEAR = "linear"
     KDTREE = "kdtree"
     LSH = "lsh"
+    HNSW = "hnsw"
+    IVF = "ivf"
+    IVFPQ = "ivfpq"
+    BINARY = "binary"
 
 
 # Distance metrics
@@ -25,14 +67,99 @@ class DistanceMetric(str, Enum):
 
     COSINE = "cosine"
     EUCLIDEAN = "euclidean"
+    INNER_PRODUCT = "inner_product"
+
+
+# Vector storage formats for flat (linear) search
+class VectorStorage(str, Enum):
+    """Enumeration of in-memory vector encodings for the linear index."""
+
+    FLOAT32 = "float32"
+    FLOAT16 = "float16"
+    INT8 = "int8"
 
 
 # Algorithm-metric compatibility
 ALGORITHM_METRICS = {
-    IndexAlgorithm.LINEAR: [DistanceMetric.COSINE, DistanceMetric.EUCLIDEAN],
+    IndexAlgorithm.LINEAR: [
+        DistanceMetric.COSINE,
+        DistanceMetric.EUCLIDEAN,
+        DistanceMetric.INNER_PRODUCT,
+    ],
     IndexAlgorithm.KDTREE: [DistanceMetric.EUCLIDEAN],
     IndexAlgorithm.LSH: [DistanceMetric.COSINE],
+    IndexAlgorithm.HNSW: [
+        DistanceMetric.COSINE,
+        DistanceMetric.EUCLIDEAN,
+        DistanceMetric.INNER_PRODUCT,
+    ],
+    IndexAlgorithm.IVF: [
+        DistanceMetric.COSINE,
+        DistanceMetric.EUCLIDEAN,
+        DistanceMetric.INNER_PRODUCT,
+    ],
+    IndexAlgorithm.IVFPQ: [DistanceMetric.COSINE, DistanceMetric.EUCLIDEAN],
+    IndexAlgorithm.BINARY: [DistanceMetric.COSINE],
+}
+
+# Build parameters accepted by each algorithm in an index build request
+ALGORITHM_PARAMS = {
+    IndexAlgorithm.LINEAR: ["storage", "rerank"],
+    IndexAlgorithm.KDTREE: ["num_trees", "max_checks", "seed", "workers"],
+    IndexAlgorithm.LSH: ["num_planes", "num_tables", "probes", "seed", "workers"],
+    IndexAlgorithm.HNSW: ["m", "ef_construction", "ef_search", "seed"],
+    IndexAlgorithm.IVF: ["nlist", "nprobe", "seed", "workers"],
+    IndexAlgorithm.IVFPQ: ["nlist", "nprobe", "m", "rerank", "seed", "workers"],
+    IndexAlgorithm.BINARY: ["rotation", "rerank", "seed"],
 }
+# Every algorithm also accepts "shards": split the library across that many
+# indices of the algorithm, searched in parallel
+MAX_INDEX_SHARDS = 256
+
+# Per-query parameters each algorithm accepts in a search's search_params,
+# with the smallest value allowed for each
+ALGORITHM_SEARCH_PARAMS = {
+    IndexAlgorithm.LINEAR: {},
+    IndexAlgorithm.KDTREE: {"max_checks": 0},
+    IndexAlgorithm.LSH: {"probes": 0},
+    IndexAlgorithm.HNSW: {"ef": 1},
+    IndexAlgorithm.IVF: {"nprobe": 1},
+    IndexAlgorithm.IVFPQ: {"nprobe": 1},
+    IndexAlgorithm.BINARY: {},
+}
+
+# Approximate algorithms that can cut a search short at its deadline
+DEADLINE_ALGORITHMS = {
+    IndexAlgorithm.KDTREE,
+    IndexAlgorithm.LSH,
+    IndexAlgorithm.HNSW,
+    IndexAlgorithm.IVF,
+    IndexAlgorithm.IVFPQ,
+}
+
+# Configurations the index auto-tuner benchmarks; those the metric does not
+# support are skipped
+AUTOTUNE_CANDIDATES = [
+    (IndexAlgorithm.LINEAR, {}),
+    (IndexAlgorithm.LINEAR, {"storage": "float16"}),
+    (IndexAlgorithm.LINEAR, {"storage": "int8"}),
+    (IndexAlgorithm.KDTREE, {}),
+    (IndexAlgorithm.KDTREE, {"num_trees": 4, "max_checks": 256}),
+    (IndexAlgorithm.LSH, {"num_planes": 8, "num_tables": 8}),
+    (IndexAlgorithm.LSH, {"num_planes": 12, "num_tables": 16}),
+    (IndexAlgorithm.HNSW, {"m": 8, "ef_search": 32}),
+    (IndexAlgorithm.HNSW, {"m": 16, "ef_search": 64}),
+    (IndexAlgorithm.HNSW, {"m": 32, "ef_search": 128}),
+    (IndexAlgorithm.IVF, {"nprobe": 4}),
+    (IndexAlgorithm.IVF, {"nprobe": 16}),
+    (IndexAlgorithm.IVFPQ, {"nprobe": 16}),
+    (IndexAlgorithm.BINARY, {}),
+]
+AUTOTUNE_SAMPLE_SIZE = 2000
+MAX_AUTOTUNE_SAMPLE_SIZE = 50000
+AUTOTUNE_QUERIES = 50
+MAX_AUTOTUNE_QUERIES = 1000
+AUTOTUNE_SEED = 0
 
 # HTTP configuration
 HTTP_TIMEOUT = 30.0  # Default HTTP timeout in seconds
@@ -48,3 +175,4 @@ EMBEDDING_RETRY_BACKOFF = 2.0  # Exponential backoff multiplier
 # Validation limits
 MAX_TEXT_LENGTH = 10000
 MIN_TEXT_LENGTH = 1
+MAX_BATCH_QUERIES = 100
@@ -60,3 +60,11 @@ class InvalidAlgorithmException(VectorDBException):
             f"Unknown index algorithm '{algorithm}'. Available: {', '.join(available)}"
         )
         super().__init__(message, {"algorithm": algorithm, "available": available})
+
+
+class InvalidIndexParamsException(VectorDBException):
+    """Raised when index build parameters are unknown or out of range."""
+
+    def __init__(self, algorithm: str, reason: str) -> None:
+        message = f"Invalid parameters for {algorithm}: {reason}"
+        super().__init__(message, {"algorithm": algorithm, "reason": reason})
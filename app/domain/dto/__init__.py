@@ -1,14 +1,21 @@
 """Data Transfer Objects."""
 
 from app.domain.dto.schemas import (
+    AutotuneCandidateDTO,
+    BatchSearchRequestDTO,
+    BatchSearchResponseDTO,
     ChunkDTO,
     CreateChunkDTO,
     CreateDocumentDTO,
     CreateLibraryDTO,
     DocumentDTO,
+    IndexAutotuneRequestDTO,
+    IndexAutotuneResponseDTO,
+    IndexBuildJobDTO,
     IndexBuildRequestDTO,
     IndexInfoDTO,
     LibraryDTO,
+    SearchPlanDTO,
     SearchRequestDTO,
     SearchResponseDTO,
     SearchResultItemDTO,
@@ -25,11 +32,18 @@ __all__ = [
     "CreateChunkDTO",
     "UpdateChunkDTO",
     "IndexBuildRequestDTO",
+    "IndexAutotuneRequestDTO",
     "SearchRequestDTO",
+    "BatchSearchRequestDTO",
     "LibraryDTO",
     "DocumentDTO",
     "ChunkDTO",
     "IndexInfoDTO",
+    "IndexBuildJobDTO",
+    "AutotuneCandidateDTO",
+    "IndexAutotuneResponseDTO",
     "SearchResultItemDTO",
+    "SearchPlanDTO",
     "SearchResponseDTO",
+    "BatchSearchResponseDTO",
 ]
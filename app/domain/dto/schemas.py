@@ -1,9 +1,22 @@
-from typing import Optional
+from datetime import datetime
+from typing import Any, Optional, Union
 
-from pydantic import BaseModel, Field, field_validator
+from pydantic import BaseModel, Field, field_validator, model_validator
 from pydantic.config import ConfigDict
 
-from app.core.constants import MAX_TEXT_LENGTH, MIN_TEXT_LENGTH
+from app.core.constants import (
+    AUTOTUNE_QUERIES,
+    AUTOTUNE_SAMPLE_SIZE,
+    MAX_AUTOTUNE_QUERIES,
+    MAX_AUTOTUNE_SAMPLE_SIZE,
+    MAX_BATCH_QUERIES,
+    MAX_RANGE_RESULTS,
+    MAX_RERANK_FACTOR,
+    MAX_TEXT_LENGTH,
+    MIN_TEXT_LENGTH,
+    IndexJobKind,
+    IndexJobStatus,
+)
 
 
 def _validate_embedding(values: list[float]) -> list[float]:
@@ -144,6 +157,10 @@ class UpdateChunkDTO(BaseModel):
 class IndexBuildRequestDTO(BaseModel):
     algorithm: str = Field(...)
     metric: str = Field(...)
+    params: dict[str, Union[int, float, str, bool]] = Field(
+        default_factory=dict,
+        description="Algorithm-specific build parameters, e.g. HNSW m",
+    )
 
     @field_validator("algorithm", "metric")
     @classmethod
@@ -151,10 +168,53 @@ class IndexBuildRequestDTO(BaseModel):
         return v.lower()
 
 
+class IndexAutotuneRequestDTO(BaseModel):
+    metric: str = Field(...)
+    k: int = Field(10, ge=1, le=100, description="Neighbors recall is measured at")
+    target_recall: float = Field(0.9, gt=0, le=1)
+    max_latency_ms: Optional[float] = Field(
+        None, gt=0, description="Largest acceptable p99 query latency"
+    )
+    sample_size: int = Field(AUTOTUNE_SAMPLE_SIZE, ge=1, le=MAX_AUTOTUNE_SAMPLE_SIZE)
+    num_queries: int = Field(AUTOTUNE_QUERIES, ge=1, le=MAX_AUTOTUNE_QUERIES)
+
+    @field_validator("metric")
+    @classmethod
+    def validate_lowercase(cls, v: str) -> str:
+        return v.lower()
+
+
 class SearchRequestDTO(BaseModel):
     vector: list[float] = Field(..., min_length=1, description="Non-empty query vector")
-    k: int = Field(..., ge=1, le=100)
+    k: int = Field(
+        ..., ge=1, le=100, description="Results, or page size of a range search"
+    )
     metadata_filters: dict[str, str] = Field(default_factory=dict)
+    min_score: Optional[float] = Field(
+        None, description="Return every chunk scoring at least this much"
+    )
+    max_distance: Optional[float] = Field(
+        None, ge=0, description="Return every chunk within this distance"
+    )
+    offset: int = Field(
+        0, ge=0, lt=MAX_RANGE_RESULTS, description="Range search results to skip"
+    )
+    search_params: dict[str, int] = Field(
+        default_factory=dict,
+        description="Per-query knobs of the library's index, e.g. HNSW ef",
+    )
+    deadline_ms: Optional[float] = Field(
+        None,
+        gt=0,
+        description="Approximate indexes return their best results so far "
+        "once this many milliseconds have passed",
+    )
+    rerank_factor: Optional[int] = Field(
+        None,
+        ge=1,
+        le=MAX_RERANK_FACTOR,
+        description="Re-score rerank_factor x k candidates with exact vectors",
+    )
 
     @field_validator("vector")
     @classmethod
@@ -168,6 +228,61 @@ class SearchRequestDTO(BaseModel):
     def validate_filters(cls, v: dict[str, str]) -> dict[str, str]:
         return _sanitize_metadata(v)
 
+    @model_validator(mode="after")
+    def validate_range(self) -> "SearchRequestDTO":
+        if self.min_score is not None and self.max_distance is not None:
+            raise ValueError("Pass either min_score or max_distance, not both")
+        if self.offset and not self.is_range():
+            raise ValueError("offset requires min_score or max_distance")
+        if self.is_range() and (
+            self.search_params or self.deadline_ms or self.rerank_factor
+        ):
+            raise ValueError(
+                "search_params, deadline_ms and rerank_factor only apply to "
+                "k-nearest searches"
+            )
+        return self
+
+    def is_range(self) -> bool:
+        return self.min_score is not None or self.max_distance is not None
+
+
+class BatchSearchRequestDTO(BaseModel):
+    vectors: list[list[float]] = Field(
+        ...,
+        min_length=1,
+        max_length=MAX_BATCH_QUERIES,
+        description="Non-empty list of query vectors",
+    )
+    k: int = Field(..., ge=1, le=100)
+    metadata_filters: dict[str, str] = Field(default_factory=dict)
+    search_params: dict[str, int] = Field(
+        default_factory=dict,
+        description="Per-query knobs of the library's index, e.g. HNSW ef",
+    )
+    deadline_ms: Optional[float] = Field(
+        None,
+        gt=0,
+        description="Approximate indexes return their best results so far "
+        "once this many milliseconds have passed",
+    )
+    rerank_factor: Optional[int] = Field(
+        None,
+        ge=1,
+        le=MAX_RERANK_FACTOR,
+        description="Re-score rerank_factor x k candidates with exact vectors",
+    )
+
+    @field_validator("vectors")
+    @classmethod
+    def validate_vectors(cls, v: list[list[float]]) -> list[list[float]]:
+        return [_validate_embedding(vector) for vector in v]
+
+    @field_validator("metadata_filters")
+    @classmethod
+    def validate_filters(cls, v: dict[str, str]) -> dict[str, str]:
+        return _sanitize_metadata(v)
+
 
 class LibraryDTO(BaseModel):
     id: str
@@ -196,6 +311,54 @@ class IndexInfoDTO(BaseModel):
     library_id: str
     algorithm: str
     metric: str
+    params: dict[str, Any] = Field(default_factory=dict)
+
+
+class AutotuneCandidateDTO(BaseModel):
+    algorithm: str
+    params: dict[str, Any]
+    recall: float
+    p50_ms: float
+    p99_ms: float
+    build_ms: float
+    memory_bytes: int
+    meets_target: bool
+
+
+class IndexAutotuneResponseDTO(BaseModel):
+    library_id: str
+    metric: str
+    k: int
+    sample_size: int
+    num_queries: int
+    selected: Optional[IndexInfoDTO] = Field(
+        None, description="Installed index, or null if no candidate met the target"
+    )
+    candidates: list[AutotuneCandidateDTO]
+
+
+class IndexBuildJobDTO(BaseModel):
+    id: str
+    library_id: str
+    kind: IndexJobKind = IndexJobKind.BUILD
+    algorithm: Optional[str] = Field(
+        None, description="Index built; for autotune, the selected one once installed"
+    )
+    metric: str
+    params: dict[str, Any] = Field(default_factory=dict)
+    status: IndexJobStatus
+    total_vectors: int = Field(..., description="Vectors being indexed")
+    processed_vectors: int = Field(..., description="Vectors indexed so far")
+    eta_seconds: Optional[float] = Field(
+        None, description="Estimated seconds left, null until progress is known"
+    )
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    error: Optional[str] = None
+    autotune: Optional[IndexAutotuneResponseDTO] = Field(
+        None, description="Autotune trade-off table, filled in as candidates run"
+    )
 
 
 class SearchResultItemDTO(BaseModel):
@@ -206,7 +369,28 @@ class SearchResultItemDTO(BaseModel):
     metadata: dict[str, str]
 
 
+class SearchPlanDTO(BaseModel):
+    strategy: str = Field(..., description="index, exact, filtered or post_filter")
+    estimated_matches: Optional[int] = Field(
+        None, description="Estimated chunks matching the metadata filters"
+    )
+    candidates: int = Field(
+        ..., description="Chunks scored exactly, or results fetched from the index"
+    )
+
+
 class SearchResponseDTO(BaseModel):
     results: list[SearchResultItemDTO]
     metric: Optional[str]
     algorithm: Optional[str]
+    plan: Optional[SearchPlanDTO] = None
+    next_offset: Optional[int] = Field(
+        None, description="Offset of the next range search page, if any"
+    )
+
+
+class BatchSearchResponseDTO(BaseModel):
+    results: list[list[SearchResultItemDTO]]
+    metric: Optional[str]
+    algorithm: Optional[str]
+    plan: Optional[SearchPlanDTO] = None
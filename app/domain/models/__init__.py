@@ -1,5 +1,5 @@
 """Domain models."""
 
-from app.domain.models.entities import Chunk, Document, Library
+from app.domain.models.entities import Chunk, Document, IndexBuildJob, Library
 
-__all__ = ["Library", "Document", "Chunk"]
+__all__ = ["Library", "Document", "Chunk", "IndexBuildJob"]
@@ -1,8 +1,11 @@
-from typing import Optional
+from datetime import datetime, timezone
+from typing import Any, Optional
 from uuid import uuid4
 
 from pydantic import BaseModel, Field
 
+from app.core.constants import IndexJobKind, IndexJobStatus
+
 
 class Chunk(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid4()))
@@ -26,3 +29,22 @@ class Library(BaseModel):
     description: Optional[str] = None
     metadata: dict[str, str] = Field(default_factory=dict)
     embedding_dim: Optional[int] = None
+
+
+class IndexBuildJob(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid4()))
+    library_id: str
+    kind: IndexJobKind = IndexJobKind.BUILD
+    # Autotune jobs fill in the selected configuration once installed
+    algorithm: Optional[str] = None
+    metric: str
+    params: dict[str, Any] = Field(default_factory=dict)
+    status: IndexJobStatus = IndexJobStatus.QUEUED
+    total_vectors: int = 0
+    processed_vectors: int = 0
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    error: Optional[str] = None
+    # Autotune report, updated as candidates are measured
+    autotune: Optional[dict[str, Any]] = None
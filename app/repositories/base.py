@@ -1,4 +1,4 @@
-from typing import Optional, Protocol
+from typing import Iterable, Optional, Protocol
 
 from app.domain.models import Chunk, Document, Library
 
@@ -32,8 +32,16 @@ class ChunkRepository(Protocol):
 
     def get_chunk(self, chunk_id: str) -> Optional[Chunk]: ...
 
+    def get_chunks(self, chunk_ids: Iterable[str]) -> dict[str, Chunk]: ...
+
     def list_chunks(self, library_id: str) -> list[Chunk]: ...
 
+    def ids_matching(self, library_id: str, filters: dict[str, str]) -> set[str]: ...
+
+    def metadata_counts(
+        self, library_id: str, filters: dict[str, str]
+    ) -> tuple[int, list[int]]: ...
+
     def update_chunk(self, chunk: Chunk) -> Chunk: ...
 
     def delete_chunk(self, chunk_id: str) -> None: ...
@@ -64,8 +72,16 @@ class VectorRepository(Protocol):
 
     def get_chunk(self, chunk_id: str) -> Optional[Chunk]: ...
 
+    def get_chunks(self, chunk_ids: Iterable[str]) -> dict[str, Chunk]: ...
+
     def list_chunks(self, library_id: str) -> list[Chunk]: ...
 
+    def ids_matching(self, library_id: str, filters: dict[str, str]) -> set[str]: ...
+
+    def metadata_counts(
+        self, library_id: str, filters: dict[str, str]
+    ) -> tuple[int, list[int]]: ...
+
     def update_chunk(self, chunk: Chunk) -> Chunk: ...
 
     def delete_chunk(self, chunk_id: str) -> None: ...
@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from typing import Optional
+from typing import Iterable, Optional
 
 from app.core import ReaderWriterLock
 from app.domain.models import Chunk, Document, Library
@@ -12,6 +12,12 @@ class InMemoryRepository(VectorRepository):
         self._libraries: dict[str, Library] = {}
         self._documents: dict[str, Document] = {}
         self._chunks: dict[str, Chunk] = {}
+        # Inverted metadata index: library id -> (key, value) -> chunk ids
+        self._postings: dict[str, dict[tuple[str, str], set[str]]] = {}
+        # Library and metadata items each chunk was indexed under
+        self._indexed: dict[str, tuple[str, list[tuple[str, str]]]] = {}
+        # Number of indexed chunks per library
+        self._library_chunks: dict[str, int] = {}
         self._rw = ReaderWriterLock()
 
     def create_library(self, library: Library) -> Library:
@@ -43,10 +49,13 @@ class InMemoryRepository(VectorRepository):
             ]
             for chunk_id in chunks_to_delete:
                 del self._chunks[chunk_id]
+                self._indexed.pop(chunk_id, None)
 
             for doc_id in doc_ids:
                 del self._documents[doc_id]
 
+            self._postings.pop(library_id, None)
+            self._library_chunks.pop(library_id, None)
             self._libraries.pop(library_id, None)
 
     def create_document(self, document: Document) -> Document:
@@ -74,18 +83,27 @@ class InMemoryRepository(VectorRepository):
             ]
             for chunk_id in chunks_to_delete:
                 del self._chunks[chunk_id]
+                self._unindex_chunk(chunk_id)
 
             self._documents.pop(document_id, None)
 
     def create_chunk(self, chunk: Chunk) -> Chunk:
         with self._rw.write_lock():
-            self._chunks[chunk.id] = chunk
+            self._store_chunk(chunk)
             return chunk
 
     def get_chunk(self, chunk_id: str) -> Optional[Chunk]:
         with self._rw.read_lock():
             return self._chunks.get(chunk_id)
 
+    def get_chunks(self, chunk_ids: Iterable[str]) -> dict[str, Chunk]:
+        with self._rw.read_lock():
+            return {
+                chunk_id: self._chunks[chunk_id]
+                for chunk_id in chunk_ids
+                if chunk_id in self._chunks
+            }
+
     def list_chunks(self, library_id: str) -> list[Chunk]:
         with self._rw.read_lock():
             doc_ids = {
@@ -93,14 +111,49 @@ class InMemoryRepository(VectorRepository):
             }
             return [c for c in self._chunks.values() if c.document_id in doc_ids]
 
+    def ids_matching(self, library_id: str, filters: dict[str, str]) -> set[str]:
+        """Return the ids of the library's chunks whose metadata has every
+        key set to the given value, intersecting the smallest postings first.
+        """
+        with self._rw.read_lock():
+            if not filters:
+                doc_ids = {
+                    d.id for d in self._documents.values() if d.library_id == library_id
+                }
+                return {c.id for c in self._chunks.values() if c.document_id in doc_ids}
+
+            postings = self._postings.get(library_id, {})
+            sets = sorted(
+                (postings.get(item, set()) for item in filters.items()), key=len
+            )
+            matches = set(sets[0])
+            for posting in sets[1:]:
+                if not matches:
+                    break
+                matches &= posting
+            return matches
+
+    def metadata_counts(
+        self, library_id: str, filters: dict[str, str]
+    ) -> tuple[int, list[int]]:
+        """Return the library's chunk count and how many chunks carry each
+        filter's (key, value) pair, without resolving the matches.
+        """
+        with self._rw.read_lock():
+            postings = self._postings.get(library_id, {})
+            return self._library_chunks.get(library_id, 0), [
+                len(postings.get(item, ())) for item in filters.items()
+            ]
+
     def update_chunk(self, chunk: Chunk) -> Chunk:
         with self._rw.write_lock():
-            self._chunks[chunk.id] = chunk
+            self._store_chunk(chunk)
             return chunk
 
     def delete_chunk(self, chunk_id: str) -> None:
         with self._rw.write_lock():
             self._chunks.pop(chunk_id, None)
+            self._unindex_chunk(chunk_id)
 
     def snapshot(self) -> dict[str, list[dict]]:
         with self._rw.read_lock():
@@ -119,4 +172,45 @@ class InMemoryRepository(VectorRepository):
             self._documents = {
                 d["id"]: Document(**d) for d in data.get("documents", [])
             }
-            self._chunks = {c["id"]: Chunk(**c) for c in data.get("chunks", [])}
+            self._chunks = {}
+            self._postings = {}
+            self._indexed = {}
+            self._library_chunks = {}
+            for c in data.get("chunks", []):
+                self._store_chunk(Chunk(**c))
+
+    def _store_chunk(self, chunk: Chunk) -> None:
+        """Insert or replace a chunk, keeping the metadata index in sync.
+
+        Callers hold the write lock.
+        """
+        self._unindex_chunk(chunk.id)
+        self._chunks[chunk.id] = chunk
+        document = self._documents.get(chunk.document_id)
+        if document is None:
+            return
+        # Chunks may be edited in place before update_chunk, so remember
+        # what was indexed rather than trusting the stored object later
+        items = list(chunk.metadata.items())
+        self._indexed[chunk.id] = (document.library_id, items)
+        self._library_chunks[document.library_id] = (
+            self._library_chunks.get(document.library_id, 0) + 1
+        )
+        postings = self._postings.setdefault(document.library_id, {})
+        for item in items:
+            postings.setdefault(item, set()).add(chunk.id)
+
+    def _unindex_chunk(self, chunk_id: str) -> None:
+        """Drop a chunk from the metadata index. Callers hold the write lock."""
+        indexed = self._indexed.pop(chunk_id, None)
+        if indexed is None:
+            return
+        library_id, items = indexed
+        self._library_chunks[library_id] -= 1
+        postings = self._postings.get(library_id, {})
+        for item in items:
+            posting = postings.get(item)
+            if posting is not None:
+                posting.discard(chunk_id)
+                if not posting:
+                    del postings[item]
@@ -1,5 +1,6 @@
 import logging
-from typing import Optional
+from contextlib import nullcontext
+from typing import ContextManager, Optional
 
 from app.core.exceptions import (
     DimensionalityMismatchException,
@@ -10,8 +11,9 @@ from app.repositories.base import VectorRepository
 
 
 class ChunkService:
-    def __init__(self, repository: VectorRepository) -> None:
+    def __init__(self, repository: VectorRepository, index_service=None) -> None:
         self.repository = repository
+        self.index_service = index_service
         self.logger = logging.getLogger(self.__class__.__name__)
 
     def create_chunk(
@@ -37,7 +39,12 @@ class ChunkService:
             embedding=embedding,
             metadata=metadata or {},
         )
-        created = self.repository.create_chunk(chunk)
+        with self._chunk_write():
+            created = self.repository.create_chunk(chunk)
+            if self.index_service and created.embedding:
+                self.index_service.add_vectors(
+                    library_id, [created.id], [created.embedding]
+                )
         self.logger.info(f"Chunk created: {created.id} in document {document_id}")
         return created
 
@@ -47,6 +54,9 @@ class ChunkService:
             raise ResourceNotFoundException("Chunk", chunk_id)
         return chunk
 
+    def get_chunks(self, chunk_ids: list[str]) -> dict[str, Chunk]:
+        return self.repository.get_chunks(chunk_ids)
+
     def list_chunks(self, library_id: str) -> list[Chunk]:
         return self.repository.list_chunks(library_id)
 
@@ -58,9 +68,9 @@ class ChunkService:
         metadata: Optional[dict[str, str]] = None,
     ) -> Chunk:
         chunk = self.get_chunk(chunk_id)
+        document = self.repository.get_document(chunk.document_id)
 
         if embedding is not None:
-            document = self.repository.get_document(chunk.document_id)
             if document:
                 self._validate_embedding_dimensions(document.library_id, embedding)
             chunk.embedding = embedding
@@ -70,14 +80,34 @@ class ChunkService:
         if metadata is not None:
             chunk.metadata = metadata
 
-        updated = self.repository.update_chunk(chunk)
+        with self._chunk_write():
+            updated = self.repository.update_chunk(chunk)
+            if self.index_service and document and embedding is not None:
+                if embedding:
+                    self.index_service.update_vectors(
+                        document.library_id, [updated.id], [embedding]
+                    )
+                else:
+                    self.index_service.remove_vectors(document.library_id, [updated.id])
         self.logger.info(f"Chunk updated: {updated.id}")
         return updated
 
     def delete_chunk(self, chunk_id: str) -> None:
-        self.repository.delete_chunk(chunk_id)
+        chunk = self.repository.get_chunk(chunk_id)
+        with self._chunk_write():
+            self.repository.delete_chunk(chunk_id)
+            if self.index_service and chunk:
+                document = self.repository.get_document(chunk.document_id)
+                if document:
+                    self.index_service.remove_vectors(document.library_id, [chunk_id])
         self.logger.info(f"Chunk deleted: {chunk_id}")
 
+    def _chunk_write(self) -> ContextManager[None]:
+        """Keep snapshots from landing between the repository and index writes."""
+        if self.index_service:
+            return self.index_service.chunk_write()
+        return nullcontext()
+
     def _validate_embedding_dimensions(
         self,
         library_id: str,
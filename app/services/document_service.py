@@ -1,5 +1,6 @@
 import logging
-from typing import Optional
+from contextlib import nullcontext
+from typing import ContextManager, Optional
 
 from app.core.exceptions import ResourceNotFoundException
 from app.domain.models import Document
@@ -7,8 +8,9 @@ from app.repositories.base import VectorRepository
 
 
 class DocumentService:
-    def __init__(self, repository: VectorRepository) -> None:
+    def __init__(self, repository: VectorRepository, index_service=None) -> None:
         self.repository = repository
+        self.index_service = index_service
         self.logger = logging.getLogger(self.__class__.__name__)
 
     def create_document(
@@ -61,5 +63,24 @@ class DocumentService:
         return updated
 
     def delete_document(self, document_id: str) -> None:
-        self.repository.delete_document(document_id)
+        with self._chunk_write():
+            # Collected inside the gate, so a snapshot never sees the document
+            # deleted while some of its chunks are still indexed
+            document = self.repository.get_document(document_id)
+            chunk_ids = []
+            if self.index_service and document:
+                chunk_ids = [
+                    c.id
+                    for c in self.repository.list_chunks(document.library_id)
+                    if c.document_id == document_id
+                ]
+            self.repository.delete_document(document_id)
+            if chunk_ids:
+                self.index_service.remove_vectors(document.library_id, chunk_ids)
         self.logger.info(f"Document deleted: {document_id}")
+
+    def _chunk_write(self) -> ContextManager[None]:
+        """Keep snapshots from landing between the repository and index writes."""
+        if self.index_service:
+            return self.index_service.chunk_write()
+        return nullcontext()
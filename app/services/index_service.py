@@ -1,21 +1,61 @@
+import hashlib
 import logging
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
-from typing import Iterator, Optional
+from datetime import datetime, timezone
+from typing import Any, Callable, Iterator, Optional
+
+import numpy as np
 
 from app.core import ReaderWriterLock, settings
 from app.core.constants import (
     ALGORITHM_METRICS,
+    ALGORITHM_PARAMS,
+    ALGORITHM_SEARCH_PARAMS,
+    AUTOTUNE_CANDIDATES,
+    AUTOTUNE_QUERIES,
+    AUTOTUNE_SAMPLE_SIZE,
+    AUTOTUNE_SEED,
+    DEADLINE_ALGORITHMS,
     DEFAULT_SEARCH_MULTIPLIER,
+    MAX_INDEX_SHARDS,
+    MAX_RANGE_RESULTS,
+    MAX_RETAINED_INDEX_JOBS,
     MAX_SEARCH_BUFFER,
+    POST_FILTER_MIN_SELECTIVITY,
     DistanceMetric,
     IndexAlgorithm,
+    IndexJobKind,
+    IndexJobStatus,
+    SearchStrategy,
 )
 from app.core.exceptions import (
     InvalidAlgorithmException,
+    InvalidIndexParamsException,
     InvalidMetricException,
+    ResourceNotFoundException,
 )
+from app.domain.models import IndexBuildJob
 from app.repositories.base import VectorRepository
-from app.vector_index import KDTreeIndex, LinearIndex, LSHIndex, VectorIndex
+from app.vector_index import (
+    BinaryIndex,
+    HNSWIndex,
+    IVFIndex,
+    IVFPQIndex,
+    KDTreeIndex,
+    LinearIndex,
+    LSHIndex,
+    ShardedIndex,
+    VectorIndex,
+    VectorStore,
+    filter_prefers_scan,
+    past_deadline,
+    similarity_scores,
+    top_k_indices,
+)
+from app.vector_index.evaluation import evaluate_index, exact_neighbors
 
 
 class IndexService:
@@ -23,66 +63,565 @@ class IndexService:
         self.repository = repository
         self.logger = logging.getLogger(self.__class__.__name__)
         self._indices: dict[str, VectorIndex] = {}
-        self._index_meta: dict[str, dict[str, str]] = {}
+        self._index_meta: dict[str, dict[str, Any]] = {}
+        # Full-precision vectors used to re-rank approximate candidates
+        self._stores: dict[str, VectorStore] = {}
+        # Changes made to each library while a build of it is in flight,
+        # one log per build, replayed onto the new index before the swap
+        self._build_logs: dict[str, list[list[tuple[Callable, Callable]]]] = {}
+        self._jobs: dict[str, IndexBuildJob] = {}
+        # Libraries with a compacting rebuild queued or running
+        self._compacting: set[str] = set()
+        self._job_executor = ThreadPoolExecutor(
+            settings.index_job_workers, thread_name_prefix="index-job"
+        )
+        # Guards the dicts above; held only briefly
         self._lock = ReaderWriterLock()
+        # Guard the contents of each library's index and store (see _library_lock)
+        self._library_locks: dict[str, ReaderWriterLock] = {}
+        # Shared by chunk writes, exclusive for snapshots (see chunk_write)
+        self._write_gate = ReaderWriterLock()
 
     def build_index(
         self,
         library_id: str,
         algorithm: str,
         metric: str,
+        params: Optional[dict[str, Any]] = None,
+        progress: Optional[Callable[[int, int], None]] = None,
+        replacing: Optional[VectorIndex] = None,
+        if_missing: bool = False,
     ) -> None:
+        """Build a new index from the repository and swap it in.
+
+        The previous index keeps serving searches during the build. Chunk
+        changes made meanwhile are logged and replayed onto the new index
+        under the library's write lock, which also covers installing it, so
+        none are lost. ``progress``
+        is called with (vectors processed, total vectors). With
+        ``replacing``, the new index is dropped instead of installed if the
+        library's index is no longer that one by then, and with
+        ``if_missing`` if the library has an index by then.
+        """
         algorithm = algorithm.lower()
         metric = metric.lower()
 
-        index = self._create_index(algorithm, metric)
+        index = self.create_index(algorithm, metric, params)
 
-        chunks = self.repository.list_chunks(library_id)
-        if chunks:
+        log: list[tuple[Callable, Callable]] = []
+        with self._lock.write_lock():
+            self._build_logs.setdefault(library_id, []).append(log)
+        try:
+            chunks = self.repository.list_chunks(library_id)
             # Filter out any chunks with empty embeddings (defensive)
             valid_pairs = [(c.embedding, c.id) for c in chunks if c.embedding]
-            if valid_pairs:
-                vectors, ids = zip(*valid_pairs)
-                index.build(list(vectors), list(ids))
-            else:
-                # All embeddings are empty, build empty index
-                index.build([], [])
+            vectors = [vector for vector, _ in valid_pairs]
+            ids = [chunk_id for _, chunk_id in valid_pairs]
+            if progress is not None:
+                progress(0, len(ids))
+                index.progress_callback = lambda done: progress(done, len(ids))
+            if chunks:
+                try:
+                    index.build(vectors, ids)
+                except (TypeError, ValueError) as e:
+                    # Parameters that only fail against the actual data
+                    raise InvalidIndexParamsException(algorithm, str(e))
+            index.progress_callback = None
 
-        with self._lock.write_lock():
-            self._indices[library_id] = index
-            self._index_meta[library_id] = {
-                "algorithm": index.kind(),
-                "metric": index.metric(),
-            }
+            store = None
+            if settings.rerank_store and index.rerank_candidates():
+                store = VectorStore()
+                store.build(vectors, ids)
+
+            with self._library_lock(library_id).write_lock():
+                with self._lock.write_lock():
+                    self._end_build_log(library_id, log)
+                store = self._replay(library_id, index, store, log)
+                with self._lock.write_lock():
+                    current = self._indices.get(library_id)
+                    superseded = (
+                        replacing is not None and current is not replacing
+                    ) or (if_missing and current is not None)
+                    if not superseded:
+                        self._install(library_id, index, store)
+        except BaseException:
+            with self._lock.write_lock():
+                self._end_build_log(library_id, log)
+            raise
 
+        if superseded:
+            self.logger.info(
+                f"Index build for library {library_id} dropped, its index was replaced meanwhile"
+            )
+            return
+        if progress is not None:
+            progress(len(ids), len(ids))
         self.logger.info(
             f"Index built for library {library_id}: algorithm={algorithm}, metric={metric}, chunks={len(chunks)}"
         )
 
+    def submit_build(
+        self,
+        library_id: str,
+        algorithm: str,
+        metric: str,
+        params: Optional[dict[str, Any]] = None,
+    ) -> dict[str, Any]:
+        """Queue a background build_index and return its job.
+
+        The configuration is validated up front, so a bad one fails here
+        instead of in the job.
+        """
+        algorithm = algorithm.lower()
+        metric = metric.lower()
+        self.create_index(algorithm, metric, params)
+
+        job = IndexBuildJob(
+            library_id=library_id,
+            algorithm=algorithm,
+            metric=metric,
+            params=dict(params or {}),
+        )
+        return self._queue_job(
+            job,
+            lambda report: self.build_index(
+                library_id, algorithm, metric, params, report
+            ),
+        )
+
+    def submit_autotune(
+        self,
+        library_id: str,
+        metric: str,
+        k: int = 10,
+        target_recall: float = 0.9,
+        max_latency_ms: Optional[float] = None,
+        sample_size: int = AUTOTUNE_SAMPLE_SIZE,
+        num_queries: int = AUTOTUNE_QUERIES,
+    ) -> dict[str, Any]:
+        """Queue a background autotune and return its job.
+
+        The job publishes the autotune report under ``autotune`` as each
+        candidate is measured, and takes the selected configuration as its
+        ``algorithm`` and ``params`` once that is installed. The metric and
+        library size are checked up front, so those fail here instead.
+        """
+        metric = metric.lower()
+        self._autotune_metric(metric)
+        chunks = self.repository.list_chunks(library_id)
+        available = sum(1 for c in chunks if c.embedding)
+        self._autotune_queries(library_id, available, k, sample_size, num_queries)
+
+        job = IndexBuildJob(
+            library_id=library_id, kind=IndexJobKind.AUTOTUNE, metric=metric
+        )
+
+        def run(report: Callable[[int, int], None]) -> None:
+            def publish(partial: dict[str, Any]) -> None:
+                job.autotune = partial
+
+            result = self.autotune(
+                library_id,
+                metric,
+                k,
+                target_recall,
+                max_latency_ms,
+                sample_size,
+                num_queries,
+                progress=report,
+                on_update=publish,
+            )
+            selected = result["selected"]
+            if selected is not None:
+                job.algorithm, job.params = selected["algorithm"], selected["params"]
+            job.autotune = result
+
+        return self._queue_job(job, run)
+
+    def get_build_job(self, library_id: str, job_id: str) -> dict[str, Any]:
+        with self._lock.read_lock():
+            job = self._jobs.get(job_id)
+        if job is None or job.library_id != library_id:
+            raise ResourceNotFoundException("Index build job", job_id)
+        return self._describe_job(job)
+
+    def autotune(
+        self,
+        library_id: str,
+        metric: str,
+        k: int = 10,
+        target_recall: float = 0.9,
+        max_latency_ms: Optional[float] = None,
+        sample_size: int = AUTOTUNE_SAMPLE_SIZE,
+        num_queries: int = AUTOTUNE_QUERIES,
+        progress: Optional[Callable[[int, int], None]] = None,
+        on_update: Optional[Callable[[dict[str, Any]], None]] = None,
+    ) -> dict[str, Any]:
+        """Benchmark candidate indices on a sample and install the cheapest.
+
+        ``num_queries`` sampled vectors are held out as queries and their
+        exact neighbors among up to ``sample_size`` others are the ground
+        truth. Every configuration in AUTOTUNE_CANDIDATES that supports the
+        metric is built on the sample and measured. The one using the
+        least memory (then the lowest median latency) among those reaching
+        ``target_recall`` within ``max_latency_ms`` at p99 is built for the
+        whole library by build_index, which ``progress`` is passed to.
+        ``on_update`` is called with the report so far after each candidate.
+
+        Returns:
+            The measured table under ``candidates`` and the installed
+            configuration under ``selected``, None if nothing qualified
+        """
+        metric = metric.lower()
+        metric_enum = self._autotune_metric(metric)
+
+        chunks = self.repository.list_chunks(library_id)
+        embeddings = [c.embedding for c in chunks if c.embedding]
+        rng = np.random.default_rng(AUTOTUNE_SEED)
+        picked = rng.permutation(len(embeddings))[: sample_size + num_queries]
+        num_queries = self._autotune_queries(
+            library_id, len(embeddings), k, sample_size, num_queries
+        )
+        sample = np.asarray([embeddings[i] for i in picked], dtype=np.float32)
+        queries, vectors = sample[:num_queries], sample[num_queries:]
+        truth = exact_neighbors(vectors, queries, k, metric)
+
+        report: dict[str, Any] = {
+            "library_id": library_id,
+            "metric": metric,
+            "k": k,
+            "sample_size": len(vectors),
+            "num_queries": num_queries,
+            "selected": None,
+            "candidates": [],
+        }
+        candidates = []
+        for algorithm, params in AUTOTUNE_CANDIDATES:
+            if metric_enum not in ALGORITHM_METRICS.get(algorithm, []):
+                continue
+            try:
+                measured = evaluate_index(
+                    lambda: self.create_index(algorithm.value, metric, params),
+                    vectors,
+                    queries,
+                    truth,
+                    k,
+                    settings.rerank_factor,
+                )
+            except (ValueError, InvalidIndexParamsException) as e:
+                # e.g. an IVF-PQ split that does not divide the dimension
+                self.logger.info(f"Skipping {algorithm.value} {params}: {e}")
+                continue
+            measured["meets_target"] = measured["recall"] >= target_recall and (
+                max_latency_ms is None or measured["p99_ms"] <= max_latency_ms
+            )
+            candidates.append(
+                {"algorithm": algorithm.value, "params": dict(params), **measured}
+            )
+            if on_update is not None:
+                on_update({**report, "candidates": list(candidates)})
+
+        qualified = [c for c in candidates if c["meets_target"]]
+        selected = None
+        if qualified:
+            best = min(qualified, key=lambda c: (c["memory_bytes"], c["p50_ms"]))
+            self.build_index(
+                library_id, best["algorithm"], metric, best["params"], progress
+            )
+            selected = self.get_index_info(library_id)
+
+        self.logger.info(
+            f"Autotuned library {library_id}: {len(candidates)} candidates, selected={selected}"
+        )
+        return {**report, "selected": selected, "candidates": candidates}
+
     def search(
         self,
         library_id: str,
         vector: list[float],
         k: int,
         metadata_filters: Optional[dict[str, str]] = None,
+        search_params: Optional[dict[str, int]] = None,
+        deadline_ms: Optional[float] = None,
+        rerank_factor: Optional[int] = None,
     ) -> list[tuple[str, float]]:
-        if k <= 0:
-            return []
+        return self.search_with_plan(
+            library_id,
+            vector,
+            k,
+            metadata_filters,
+            search_params,
+            deadline_ms,
+            rerank_factor,
+        )[0]
+
+    def search_with_plan(
+        self,
+        library_id: str,
+        vector: list[float],
+        k: int,
+        metadata_filters: Optional[dict[str, str]] = None,
+        search_params: Optional[dict[str, int]] = None,
+        deadline_ms: Optional[float] = None,
+        rerank_factor: Optional[int] = None,
+    ) -> tuple[list[tuple[str, float]], dict[str, Any]]:
+        """Search one vector, also returning the plan that was executed."""
+        batch_results, plan = self.search_batch_with_plan(
+            library_id,
+            [vector],
+            k,
+            metadata_filters,
+            search_params,
+            deadline_ms,
+            rerank_factor,
+        )
+        return batch_results[0], plan
+
+    def search_batch(
+        self,
+        library_id: str,
+        vectors: list[list[float]],
+        k: int,
+        metadata_filters: Optional[dict[str, str]] = None,
+        search_params: Optional[dict[str, int]] = None,
+        deadline_ms: Optional[float] = None,
+        rerank_factor: Optional[int] = None,
+    ) -> list[list[tuple[str, float]]]:
+        return self.search_batch_with_plan(
+            library_id,
+            vectors,
+            k,
+            metadata_filters,
+            search_params,
+            deadline_ms,
+            rerank_factor,
+        )[0]
+
+    def search_batch_with_plan(
+        self,
+        library_id: str,
+        vectors: list[list[float]],
+        k: int,
+        metadata_filters: Optional[dict[str, str]] = None,
+        search_params: Optional[dict[str, int]] = None,
+        deadline_ms: Optional[float] = None,
+        rerank_factor: Optional[int] = None,
+    ) -> tuple[list[list[tuple[str, float]]], dict[str, Any]]:
+        """Search several query vectors against one library.
+
+        The index lookup, the filter planning and the index query are each
+        done once for the whole batch rather than once per vector. The
+        returned plan describes how the filters were applied.
+
+        ``search_params`` holds per-query knobs of the library's index kind,
+        such as HNSW ``ef`` or IVF ``nprobe``. Approximate indexes stop
+        searching once ``deadline_ms`` milliseconds have passed and return
+        the best results found so far.
+
+        Indices that score on a compressed representation return
+        ``rerank_factor * k`` candidates (RERANK_FACTOR by default), which
+        are re-scored against full-precision vectors. Passing
+        ``rerank_factor`` re-ranks the results of any index.
+        """
+        deadline = None
+        if deadline_ms is not None:
+            deadline = time.monotonic() + deadline_ms / 1000.0
+        plan = self.plan_search(library_id, k, metadata_filters)
+        if k <= 0 or not vectors:
+            return [[] for _ in vectors], plan
 
         index = self._get_or_create_index(library_id)
         if not index:
-            return []
+            return [[] for _ in vectors], plan
+
+        query_params = self._query_params(index, search_params, deadline)
+        rerank_k = self._rerank_k(index, k, rerank_factor)
+        strategy = plan["strategy"]
+        if strategy == SearchStrategy.EXACT.value:
+            allowed = self.repository.ids_matching(library_id, metadata_filters)
+            batch_results = self._score_exact(vectors, allowed, index.metric(), k)
+            plan["candidates"] = len(allowed)
+        elif strategy == SearchStrategy.POST_FILTER.value:
+            batch_results = self._search_post_filter(
+                library_id,
+                index,
+                vectors,
+                k,
+                metadata_filters,
+                plan,
+                query_params,
+                rerank_k,
+            )
+        else:
+            allowed = None
+            if strategy == SearchStrategy.FILTERED.value:
+                # The index skips non-matching chunks while it searches
+                allowed = self.repository.ids_matching(library_id, metadata_filters)
+            batch_results = self._query_index(
+                library_id,
+                index,
+                vectors,
+                plan["candidates"],
+                allowed,
+                query_params,
+                rerank_k,
+            )
 
-        # Increase query_k when filters are present to ensure we get enough results
-        query_k = self._calculate_query_k(k, has_filters=bool(metadata_filters))
-        results = index.query(vector, query_k)
+        return [results[:k] for results in batch_results], plan
 
+    def plan_search(
+        self, library_id: str, k: int, metadata_filters: Optional[dict[str, str]]
+    ) -> dict[str, Any]:
+        """Pick how to apply metadata filters from their estimated selectivity.
+
+        The number of matches is estimated from the per-(key, value) chunk
+        counts, assuming the keys are independent:
+
+        - few matches: score the matching chunks exactly (``exact``)
+        - most chunks match: over-fetch from the index and filter the
+          results, growing the fetch until k survive (``post_filter``)
+        - otherwise: filter inside the index traversal (``filtered``)
+        """
+        query_k = self._calculate_query_k(k)
+        if not metadata_filters:
+            return {
+                "strategy": SearchStrategy.INDEX.value,
+                "estimated_matches": None,
+                "candidates": query_k,
+            }
+
+        total, counts = self.repository.metadata_counts(library_id, metadata_filters)
+        selectivity = 1.0
+        for count in counts:
+            selectivity *= count / total if total else 0.0
+        estimate = min([round(total * selectivity)] + counts)
+
+        if filter_prefers_scan(estimate, total, query_k):
+            strategy = SearchStrategy.EXACT
+        elif selectivity >= POST_FILTER_MIN_SELECTIVITY:
+            strategy = SearchStrategy.POST_FILTER
+            query_k = math.ceil(query_k / selectivity)
+        else:
+            strategy = SearchStrategy.FILTERED
+        return {
+            "strategy": strategy.value,
+            "estimated_matches": estimate,
+            "candidates": query_k,
+        }
+
+    def range_search(
+        self,
+        library_id: str,
+        vector: list[float],
+        limit: int,
+        min_score: Optional[float] = None,
+        max_distance: Optional[float] = None,
+        offset: int = 0,
+        metadata_filters: Optional[dict[str, str]] = None,
+    ) -> tuple[list[tuple[str, float]], Optional[int], dict[str, Any]]:
+        """Return one page of the chunks within a score or distance threshold.
+
+        Exactly one of ``min_score`` and ``max_distance`` should be given.
+        Results are ordered best first and paginated by ``offset`` and
+        ``limit``; the returned next offset is None on the last page.
+        """
+        allowed = None
+        plan: dict[str, Any] = {
+            "strategy": SearchStrategy.INDEX.value,
+            "estimated_matches": None,
+            "candidates": offset + limit + 1,
+        }
         if metadata_filters:
-            results = self._apply_metadata_filters(results, metadata_filters)
+            allowed = self.repository.ids_matching(library_id, metadata_filters)
+            plan["strategy"] = SearchStrategy.FILTERED.value
+            plan["estimated_matches"] = len(allowed)
+
+        index = self._get_or_create_index(library_id)
+        if not index or limit <= 0:
+            return [], None, plan
+
+        threshold = self._min_score(index.metric(), min_score, max_distance)
+        # One extra result tells whether another page follows
+        window = min(offset + limit + 1, MAX_RANGE_RESULTS + 1)
+        rerank_k = index.rerank_candidates()
+        if rerank_k:
+            results, fetched = self._range_rerank(
+                library_id, index, vector, threshold, max(window, rerank_k), allowed
+            )
+            window = max(window, fetched)
+        else:
+            with self._library_lock(library_id).read_lock():
+                results = index.range_query(vector, threshold, window, allowed)
+
+        plan["candidates"] = window
+        end = min(offset + limit, MAX_RANGE_RESULTS)
+        next_offset = end if len(results) > end and end < MAX_RANGE_RESULTS else None
+        return results[offset:end], next_offset, plan
+
+    def _range_rerank(
+        self,
+        library_id: str,
+        index: VectorIndex,
+        vector: list[float],
+        threshold: float,
+        k: int,
+        allowed: Optional[set[str]],
+    ) -> tuple[list[tuple[str, float]], int]:
+        """Range search an index whose scores must be re-ranked exactly.
+
+        Compressed scores are not comparable to the threshold, so the
+        candidates are fetched by approximate rank and the threshold is
+        applied to their exact scores. Like VectorIndex.range_query, the
+        fetch doubles while it keeps finding matches: until the newly
+        fetched candidates hold none, or the index runs out. Returns the
+        matches, best first, and how many candidates were fetched.
+        """
+        fetched = 0
+        while True:
+            with self._library_lock(library_id).read_lock():
+                candidates = index.query(vector, k, allowed=allowed)
+            results = self._rerank_exact(
+                library_id, [vector], [candidates], index.metric()
+            )[0]
+            results = [(cid, score) for cid, score in results if score >= threshold]
+            tail = {cid for cid, _ in candidates[fetched:]}
+            if len(candidates) < k or not any(cid in tail for cid, _ in results):
+                return results, k
+            fetched, k = k, 2 * k
+
+    def add_vectors(
+        self, library_id: str, ids: list[str], vectors: list[list[float]]
+    ) -> None:
+        """Insert new chunk vectors into the library's live index, if any.
 
-        return results[:k]
+        Libraries without a built index pick the chunks up when the index
+        is next built, so there is nothing to do for them.
+        """
+        self._mutate(
+            library_id,
+            lambda index: index.add(ids, vectors),
+            lambda store: store.put(ids, vectors),
+        )
 
-    def get_index_info(self, library_id: str) -> dict[str, str]:
+    def update_vectors(
+        self, library_id: str, ids: list[str], vectors: list[list[float]]
+    ) -> None:
+        """Replace chunk vectors in the library's live index, if any."""
+        self._mutate(
+            library_id,
+            lambda index: index.update(ids, vectors),
+            lambda store: store.put(ids, vectors),
+        )
+
+    def remove_vectors(self, library_id: str, ids: list[str]) -> None:
+        """Drop chunk vectors from the library's live index, if any."""
+        self._mutate(
+            library_id,
+            lambda index: index.remove(ids),
+            lambda store: store.remove(ids),
+        )
+
+    def get_index_info(self, library_id: str) -> dict[str, Any]:
         with self._lock.read_lock():
             meta = self._index_meta.get(library_id)
 
@@ -91,6 +630,7 @@ class IndexService:
                 "library_id": library_id,
                 "algorithm": "none",
                 "metric": settings.default_metric,
+                "params": {},
             }
 
         return {"library_id": library_id, **meta}
@@ -99,32 +639,113 @@ class IndexService:
         with self._lock.write_lock():
             self._indices.pop(library_id, None)
             self._index_meta.pop(library_id, None)
+            self._stores.pop(library_id, None)
 
         self.logger.info(f"Index cleared for library {library_id}")
 
-    def get_index_metadata(self) -> dict[str, dict[str, str]]:
+    def get_index_metadata(self) -> dict[str, dict[str, Any]]:
         with self._lock.read_lock():
             return dict(self._index_meta)
 
-    def rebuild_indices(self, metadata: dict[str, dict[str, str]]) -> None:
+    def rebuild_indices(self, metadata: dict[str, dict[str, Any]]) -> None:
         for library_id, meta in metadata.items():
             try:
                 self.build_index(
                     library_id,
                     meta.get("algorithm", settings.default_index),
                     meta.get("metric", settings.default_metric),
+                    meta.get("params"),
                 )
             except Exception as e:
                 self.logger.error(
                     f"Failed to rebuild index for library {library_id}: {e}"
                 )
 
+    @contextmanager
+    def chunk_write(self) -> Iterator[None]:
+        """Hold across writing chunks to the repository and then the index.
+
+        Any number of chunk writes can hold it at once. snapshot_barrier
+        waits for them, so a snapshot never sees a chunk change in the
+        repository that has not reached the index yet.
+        """
+        with self._write_gate.read_lock():
+            yield
+
+    @contextmanager
+    def snapshot_barrier(self) -> Iterator[None]:
+        """Hold chunk writes back while the repository and indices are read."""
+        with self._write_gate.write_lock():
+            yield
+
+    def serialize_index(self, library_id: str) -> Optional[bytes]:
+        """Return the library's index from VectorIndex.serialize, if it has one.
+
+        The blob's metadata records a digest of the chunks the index was
+        built from, which restore_index checks. Call it under
+        snapshot_barrier so the repository and the index agree.
+        """
+        chunks = self.repository.list_chunks(library_id)
+        digest = self._chunk_digest([(c.id, c.embedding) for c in chunks])
+        with self._library_lock(library_id).read_lock():
+            with self._lock.read_lock():
+                index = self._indices.get(library_id)
+            if index is None:
+                return None
+            return index.serialize({"chunk_digest": digest})
+
+    def restore_index(
+        self,
+        library_id: str,
+        algorithm: str,
+        metric: str,
+        params: Optional[dict[str, Any]],
+        payload: bytes,
+    ) -> None:
+        """Install an index from serialize_index output instead of building it.
+
+        The index must have been serialized from exactly the library's
+        current chunk ids and embeddings, so data from another snapshot or
+        from before the chunks changed is rejected with ValueError, like a
+        corrupt payload.
+        """
+        index = self.create_index(algorithm.lower(), metric.lower(), params)
+        metadata = index.deserialize(payload)
+
+        chunks = self.repository.list_chunks(library_id)
+        valid_pairs = [(c.embedding, c.id) for c in chunks if c.embedding]
+        ids = [chunk_id for _, chunk_id in valid_pairs]
+        digest = self._chunk_digest([(c.id, c.embedding) for c in chunks])
+        if (
+            metadata.get("chunk_digest") != digest
+            or index.size() != len(ids)
+            or set(index.ids()) != set(ids)
+        ):
+            raise ValueError(
+                f"Serialized index does not match the chunks of library {library_id}"
+            )
+
+        store = None
+        if settings.rerank_store and index.rerank_candidates():
+            store = VectorStore()
+            store.build([vector for vector, _ in valid_pairs], ids)
+
+        with self._library_lock(library_id).write_lock(), self._lock.write_lock():
+            self._install(library_id, index, store)
+        self.logger.info(
+            f"Index restored for library {library_id}: algorithm={algorithm}, metric={metric}, chunks={len(ids)}"
+        )
+
     @contextmanager
     def read_lock(self) -> Iterator[None]:
         with self._lock.read_lock():
             yield
 
-    def _create_index(self, algorithm: str, metric: str) -> VectorIndex:
+    @staticmethod
+    def create_index(
+        algorithm: str, metric: str, params: Optional[dict[str, Any]] = None
+    ) -> VectorIndex:
+        """Instantiate an empty index, validating algorithm, metric and params."""
         # Convert string to enum, validate it exists
         try:
             algo_enum = IndexAlgorithm(algorithm)
@@ -147,17 +768,58 @@ class IndexService:
             supported_values = [m.value for m in supported_metrics]
             raise InvalidMetricException(algorithm, metric, supported_values)
 
-        # Create the appropriate index
-        if algo_enum == IndexAlgorithm.LINEAR:
-            return LinearIndex(metric=metric)
-        elif algo_enum == IndexAlgorithm.KDTREE:
-            return KDTreeIndex()
-        elif algo_enum == IndexAlgorithm.LSH:
-            return LSHIndex()
-        else:
-            raise InvalidAlgorithmException(
-                algorithm, [algo.value for algo in IndexAlgorithm]
+        params = dict(params or {})
+        shards = params.pop("shards", 1)
+        unknown = sorted(set(params) - set(ALGORITHM_PARAMS.get(algo_enum, [])))
+        if unknown:
+            raise InvalidIndexParamsException(
+                algorithm, f"unknown parameters {', '.join(unknown)}"
+            )
+        if (
+            not isinstance(shards, int)
+            or isinstance(shards, bool)
+            or not 1 <= shards <= MAX_INDEX_SHARDS
+        ):
+            raise InvalidIndexParamsException(
+                algorithm, f"shards must be an integer from 1 to {MAX_INDEX_SHARDS}"
+            )
+
+        if shards > 1:
+            return ShardedIndex(
+                [
+                    IndexService._create_shard(algo_enum, metric, params)
+                    for _ in range(shards)
+                ]
             )
+        return IndexService._create_shard(algo_enum, metric, params)
+
+    @staticmethod
+    def _create_shard(
+        algo_enum: IndexAlgorithm, metric: str, params: dict[str, Any]
+    ) -> VectorIndex:
+        algorithm = algo_enum.value
+        # Create the appropriate index
+        try:
+            if algo_enum == IndexAlgorithm.LINEAR:
+                return LinearIndex(metric=metric, **params)
+            elif algo_enum == IndexAlgorithm.KDTREE:
+                return KDTreeIndex(**params)
+            elif algo_enum == IndexAlgorithm.LSH:
+                return LSHIndex(**params)
+            elif algo_enum == IndexAlgorithm.HNSW:
+                return HNSWIndex(metric=metric, **params)
+            elif algo_enum == IndexAlgorithm.IVF:
+                return IVFIndex(metric=metric, **params)
+            elif algo_enum == IndexAlgorithm.IVFPQ:
+                return IVFPQIndex(metric=metric, **params)
+            elif algo_enum == IndexAlgorithm.BINARY:
+                return BinaryIndex(metric=metric, **params)
+        except (TypeError, ValueError) as e:
+            raise InvalidIndexParamsException(algorithm, str(e))
+
+        raise InvalidAlgorithmException(
+            algorithm, [algo.value for algo in IndexAlgorithm]
+        )
 
     def _get_or_create_index(self, library_id: str) -> Optional[VectorIndex]:
         with self._lock.read_lock():
@@ -165,47 +827,432 @@ class IndexService:
 
         if not index:
             chunks = self.repository.list_chunks(library_id)
-            if not chunks:
-                return None
-
             # Filter out any chunks with empty embeddings (defensive)
-            valid_pairs = [(c.embedding, c.id) for c in chunks if c.embedding]
-            if not valid_pairs:
+            if not any(c.embedding for c in chunks):
                 return None
 
-            index = LinearIndex(metric=settings.default_metric)
-            vectors, ids = zip(*valid_pairs)
-            index.build(list(vectors), list(ids))
+            # Build the fallback like any other index, so chunk changes made
+            # meanwhile are replayed onto it
+            self.build_index(
+                library_id, "linear", settings.default_metric, if_missing=True
+            )
+            with self._lock.read_lock():
+                index = self._indices.get(library_id)
+
+        return index
 
-            # Cache the fallback index
+    def _mutate(
+        self,
+        library_id: str,
+        change: Callable[[VectorIndex], None],
+        store_change: Callable[[VectorStore], None],
+    ) -> None:
+        with self._library_lock(library_id).write_lock():
             with self._lock.write_lock():
-                self._indices[library_id] = index
-                self._index_meta[library_id] = {
-                    "algorithm": index.kind(),
-                    "metric": index.metric(),
-                }
+                for log in self._build_logs.get(library_id, []):
+                    log.append((change, store_change))
+                index = self._indices.get(library_id)
+                store = self._stores.get(library_id)
+            if index is None:
+                return
+            if store is not None:
+                try:
+                    store_change(store)
+                except ValueError:
+                    # Rebuilt from the repository the next time it is needed
+                    with self._lock.write_lock():
+                        self._stores.pop(library_id, None)
+            try:
+                change(index)
+            except ValueError as e:
+                # An index that rejects the change would serve stale results,
+                # so rebuild it from the repository with its configuration
+                self.logger.warning(
+                    f"Incremental index update failed for library {library_id}, rebuilding: {e}"
+                )
+                self._schedule_compaction(library_id, index)
+            else:
+                if index.needs_compaction():
+                    self._schedule_compaction(library_id, index)
 
-        return index
+    def _library_lock(self, library_id: str) -> ReaderWriterLock:
+        """Return the lock guarding the library's index and store contents.
 
-    def _calculate_query_k(self, k: int, has_filters: bool = False) -> int:
-        multiplier = (
-            DEFAULT_SEARCH_MULTIPLIER * 2 if has_filters else DEFAULT_SEARCH_MULTIPLIER
+        Chunk writes change them in place under its write lock and searches
+        read them under its read lock, so a write only holds up searches of
+        its own library. Take it before self._lock, never while holding it.
+        """
+        with self._lock.read_lock():
+            lock = self._library_locks.get(library_id)
+        if lock is not None:
+            return lock
+        with self._lock.write_lock():
+            return self._library_locks.setdefault(library_id, ReaderWriterLock())
+
+    def _schedule_compaction(self, library_id: str, index: VectorIndex) -> None:
+        """Queue _compact for the index unless the library has one pending."""
+        with self._lock.write_lock():
+            if library_id in self._compacting:
+                return
+            self._compacting.add(library_id)
+        self._job_executor.submit(self._compact, library_id, index)
+
+    def _compact(self, library_id: str, index: VectorIndex) -> None:
+        """Rebuild an index that asked for it, or rejected a change, off the
+        write path.
+
+        The index keeps serving, and taking chunk changes, until the
+        rebuild replays the changes made meanwhile and replaces it.
+        """
+        try:
+            self.build_index(
+                library_id,
+                index.kind(),
+                index.metric(),
+                index.params(),
+                replacing=index,
+            )
+        except Exception as e:
+            self.logger.error(f"Compacting index of library {library_id} failed: {e}")
+        finally:
+            with self._lock.write_lock():
+                self._compacting.discard(library_id)
+
+    def _queue_job(
+        self,
+        job: IndexBuildJob,
+        work: Callable[[Callable[[int, int], None]], None],
+    ) -> dict[str, Any]:
+        """Register a job, run ``work`` on the job executor and describe it.
+
+        ``work`` is given a callback taking (vectors processed, total
+        vectors) that reports progress on the job.
+        """
+        with self._lock.write_lock():
+            self._jobs[job.id] = job
+            finished = [
+                job_id
+                for job_id, other in self._jobs.items()
+                if other.finished_at is not None
+            ]
+            # Jobs are kept in submission order, so the oldest go first
+            for job_id in finished[: max(0, len(finished) - MAX_RETAINED_INDEX_JOBS)]:
+                del self._jobs[job_id]
+
+        self._job_executor.submit(self._run_job, job, work)
+        self.logger.info(
+            f"Index {job.kind.value} job {job.id} queued for library {job.library_id}"
         )
-        buffer = MAX_SEARCH_BUFFER * 2 if has_filters else MAX_SEARCH_BUFFER
-        return max(k, min(k * multiplier, k + buffer))
+        return self._describe_job(job)
 
-    def _apply_metadata_filters(
+    def _run_job(
         self,
-        results: list[tuple[str, float]],
+        job: IndexBuildJob,
+        work: Callable[[Callable[[int, int], None]], None],
+    ) -> None:
+        def report(processed: int, total: int) -> None:
+            job.processed_vectors, job.total_vectors = processed, total
+
+        job.status = IndexJobStatus.RUNNING
+        job.started_at = datetime.now(timezone.utc)
+        try:
+            work(report)
+        except Exception as e:
+            job.error = str(e)
+            job.status = IndexJobStatus.FAILED
+            self.logger.error(f"Index {job.kind.value} job {job.id} failed: {e}")
+        else:
+            job.status = IndexJobStatus.SUCCEEDED
+        job.finished_at = datetime.now(timezone.utc)
+
+    def _describe_job(self, job: IndexBuildJob) -> dict[str, Any]:
+        """Return the job's fields plus an ETA extrapolated from its progress."""
+        eta = None
+        if job.finished_at is not None:
+            eta = 0.0
+        elif job.started_at is not None and job.processed_vectors:
+            elapsed = (datetime.now(timezone.utc) - job.started_at).total_seconds()
+            remaining = job.total_vectors - job.processed_vectors
+            eta = elapsed * remaining / job.processed_vectors
+        return {**job.model_dump(), "eta_seconds": eta}
+
+    def _install(
+        self, library_id: str, index: VectorIndex, store: Optional[VectorStore]
+    ) -> None:
+        """Make a built index the library's; needs the write lock."""
+        self._indices[library_id] = index
+        self._index_meta[library_id] = self._describe(index)
+        if store is not None:
+            self._stores[library_id] = store
+        else:
+            # Indices that do not re-rank only need one on request
+            self._stores.pop(library_id, None)
+
+    @staticmethod
+    def _autotune_metric(metric: str) -> DistanceMetric:
+        try:
+            return DistanceMetric(metric)
+        except ValueError:
+            raise InvalidMetricException(
+                "autotune", metric, [m.value for m in DistanceMetric]
+            )
+
+    @staticmethod
+    def _autotune_queries(
+        library_id: str, available: int, k: int, sample_size: int, num_queries: int
+    ) -> int:
+        """Return how many vectors autotune holds out as queries, at least one."""
+        num_queries = min(num_queries, min(available, sample_size + num_queries) - k)
+        if num_queries < 1:
+            raise ValueError(
+                f"Library {library_id} needs more than {k} vectors to autotune"
+            )
+        return num_queries
+
+    def _end_build_log(
+        self, library_id: str, log: list[tuple[Callable, Callable]]
+    ) -> None:
+        """Stop recording changes for one build; needs the write lock."""
+        logs = [
+            other for other in self._build_logs.get(library_id, []) if other is not log
+        ]
+        if logs:
+            self._build_logs[library_id] = logs
+        else:
+            self._build_logs.pop(library_id, None)
+
+    def _replay(
+        self,
+        library_id: str,
+        index: VectorIndex,
+        store: Optional[VectorStore],
+        log: list[tuple[Callable, Callable]],
+    ) -> Optional[VectorStore]:
+        """Apply changes logged during a build to its result.
+
+        Needs the library's write lock, so no more changes can be logged.
+
+        Returns the store, or None if a change could not be applied to it
+        and it has to be rebuilt from the repository on demand.
+        """
+        for change, store_change in log:
+            if store is not None:
+                try:
+                    store_change(store)
+                except ValueError:
+                    store = None
+            try:
+                change(index)
+            except ValueError as e:
+                self.logger.warning(
+                    f"Could not replay a change onto the new index of library {library_id}: {e}"
+                )
+        return store
+
+    @staticmethod
+    def _chunk_digest(chunks: list[tuple[str, Optional[list[float]]]]) -> str:
+        """SHA-256 over the (id, embedding) pairs with embeddings, in id order."""
+        digest = hashlib.sha256()
+        for chunk_id, embedding in sorted(chunks, key=lambda chunk: chunk[0]):
+            if embedding:
+                digest.update(f"{chunk_id}\0{len(embedding)}\0".encode("utf-8"))
+                digest.update(np.asarray(embedding, dtype=np.float64).tobytes())
+        return digest.hexdigest()
+
+    def _describe(self, index: VectorIndex) -> dict[str, Any]:
+        return {
+            "algorithm": index.kind(),
+            "metric": index.metric(),
+            "params": index.params(),
+        }
+
+    def _min_score(
+        self, metric: str, min_score: Optional[float], max_distance: Optional[float]
+    ) -> float:
+        """Translate a distance threshold into the equivalent minimum score."""
+        if min_score is not None:
+            return min_score
+        if max_distance is None:
+            raise ValueError("Either min_score or max_distance is required")
+        if metric == DistanceMetric.COSINE.value:
+            return 1.0 - max_distance
+        if metric == DistanceMetric.EUCLIDEAN.value:
+            return 1.0 / (1.0 + max_distance)
+        raise ValueError(f"max_distance is not defined for the {metric} metric")
+
+    def _query_params(
+        self,
+        index: VectorIndex,
+        search_params: Optional[dict[str, int]],
+        deadline: Optional[float],
+    ) -> dict[str, Any]:
+        """Check per-query knobs against the index kind and add the deadline."""
+        algorithm = IndexAlgorithm(index.kind())
+        accepted = ALGORITHM_SEARCH_PARAMS.get(algorithm, {})
+        params = dict(search_params or {})
+        unknown = sorted(set(params) - set(accepted))
+        if unknown:
+            raise InvalidIndexParamsException(
+                algorithm.value, f"unknown search parameters {', '.join(unknown)}"
+            )
+        for name, value in params.items():
+            if value < accepted[name]:
+                raise InvalidIndexParamsException(
+                    algorithm.value, f"{name} must be at least {accepted[name]}"
+                )
+
+        if deadline is not None and algorithm in DEADLINE_ALGORITHMS:
+            params["deadline"] = deadline
+        return params
+
+    def _calculate_query_k(self, k: int) -> int:
+        return max(k, min(k * DEFAULT_SEARCH_MULTIPLIER, k + MAX_SEARCH_BUFFER))
+
+    def _rerank_k(
+        self, index: VectorIndex, k: int, rerank_factor: Optional[int]
+    ) -> int:
+        """Number of candidates to re-score exactly, 0 to keep index scores."""
+        if rerank_factor is None:
+            if not index.rerank_candidates():
+                return 0
+            rerank_factor = settings.rerank_factor
+        return max(index.rerank_candidates(), rerank_factor * k)
+
+    def _rerank_exact(
+        self,
+        library_id: str,
+        vectors: list[list[float]],
+        batch_results: list[list[tuple[str, float]]],
+        metric: str,
+    ) -> list[list[tuple[str, float]]]:
+        """Re-score approximate candidates with full-precision vectors.
+
+        With RERANK_STORE they come from the library's VectorStore,
+        otherwise every query's candidates are fetched from the repository
+        in one batch, so compressed indices keep their memory savings.
+        """
+        candidates = [
+            [chunk_id for chunk_id, _ in results] for results in batch_results
+        ]
+        if settings.rerank_store:
+            store = self._store(library_id)
+            with self._library_lock(library_id).read_lock():
+                return store.rerank(vectors, candidates, metric)
+
+        ids = list(dict.fromkeys(cid for batch in candidates for cid in batch))
+        chunks = self.repository.get_chunks(ids)
+        ids = [cid for cid in ids if cid in chunks and chunks[cid].embedding]
+        store = VectorStore()
+        store.build([chunks[cid].embedding for cid in ids], ids)
+        return store.rerank(vectors, candidates, metric)
+
+    def _store(self, library_id: str) -> VectorStore:
+        """Return the library's vector store, building it on first use."""
+        with self._lock.read_lock():
+            store = self._stores.get(library_id)
+        if store is not None:
+            return store
+
+        # Built under the library's write lock so no chunk write can slip in
+        # between reading the repository and publishing the store
+        with self._library_lock(library_id).write_lock():
+            with self._lock.read_lock():
+                store = self._stores.get(library_id)
+            if store is None:
+                chunks = self.repository.list_chunks(library_id)
+                pairs = [(c.embedding, c.id) for c in chunks if c.embedding]
+                store = VectorStore()
+                store.build([v for v, _ in pairs], [cid for _, cid in pairs])
+                with self._lock.write_lock():
+                    self._stores[library_id] = store
+        return store
+
+    def _query_index(
+        self,
+        library_id: str,
+        index: VectorIndex,
+        vectors: list[list[float]],
+        query_k: int,
+        allowed: Optional[set[str]] = None,
+        query_params: Optional[dict[str, Any]] = None,
+        rerank_k: int = 0,
+    ) -> list[list[tuple[str, float]]]:
+        # Chunk writes mutate the index in place under the library's write lock
+        with self._library_lock(library_id).read_lock():
+            batch_results = index.query_batch(
+                vectors, max(query_k, rerank_k), allowed=allowed, **(query_params or {})
+            )
+        if rerank_k:
+            batch_results = self._rerank_exact(
+                library_id, vectors, batch_results, index.metric()
+            )
+        return batch_results
+
+    def _search_post_filter(
+        self,
+        library_id: str,
+        index: VectorIndex,
+        vectors: list[list[float]],
+        k: int,
         filters: dict[str, str],
-    ) -> list[tuple[str, float]]:
-        filtered = []
-        for chunk_id, score in results:
-            chunk = self.repository.get_chunk(chunk_id)
-            if not chunk:
-                continue
+        plan: dict[str, Any],
+        query_params: Optional[dict[str, Any]] = None,
+        rerank_k: int = 0,
+    ) -> list[list[tuple[str, float]]]:
+        """Over-fetch from the index and filter, doubling the fetch until
+        every query keeps k results, the index has nothing more to give or
+        the search deadline has passed.
+        """
+        query_params = query_params or {}
+        fetch_k = plan["candidates"]
+        while True:
+            batch_results = self._query_index(
+                library_id, index, vectors, fetch_k, None, query_params, rerank_k
+            )
+            filtered = self._apply_metadata_filters(batch_results, filters)
+            exhausted = all(len(results) < fetch_k for results in batch_results)
+            satisfied = all(len(results) >= k for results in filtered)
+            if exhausted or satisfied or past_deadline(query_params.get("deadline")):
+                plan["candidates"] = fetch_k
+                return filtered
+            fetch_k *= 2
 
-            if all(chunk.metadata.get(key) == value for key, value in filters.items()):
-                filtered.append((chunk_id, score))
+    def _score_exact(
+        self, vectors: list[list[float]], allowed: set[str], metric: str, k: int
+    ) -> list[list[tuple[str, float]]]:
+        """Score the allowed chunks' stored embeddings directly."""
+        chunks = self.repository.get_chunks(allowed)
+        ids = [chunk_id for chunk_id, chunk in chunks.items() if chunk.embedding]
+        if not ids:
+            return [[] for _ in vectors]
 
-        return filtered
+        matrix = np.asarray([chunks[chunk_id].embedding for chunk_id in ids])
+        queries = np.asarray(vectors, dtype=np.float32)
+        if queries.shape[1] != matrix.shape[1]:
+            raise ValueError("Query vector dimensionality mismatch")
+        scores = similarity_scores(queries, matrix.astype(np.float32), metric)
+        return [
+            [(ids[i], float(row[i])) for i in top_k_indices(row, k)] for row in scores
+        ]
+
+    def _apply_metadata_filters(
+        self,
+        batch_results: list[list[tuple[str, float]]],
+        filters: dict[str, str],
+    ) -> list[list[tuple[str, float]]]:
+        candidate_ids = {
+            chunk_id for results in batch_results for chunk_id, _ in results
+        }
+        chunks = self.repository.get_chunks(candidate_ids)
+        return [
+            [
+                (chunk_id, score)
+                for chunk_id, score in results
+                if chunk_id in chunks
+                and all(
+                    chunks[chunk_id].metadata.get(key) == value
+                    for key, value in filters.items()
+                )
+            ]
+            for results in batch_results
+        ]
@@ -5,9 +5,13 @@ from pathlib import Path
 from typing import Any, Optional
 
 from app.core import settings
+from app.core.exceptions import VectorDBException
 from app.repositories.base import VectorRepository
 from app.services.index_service import IndexService
 
+# Built indices are saved next to a snapshot as <snapshot stem>.<library id>.index
+INDEX_FILE_SUFFIX = ".index"
+
 
 class SnapshotService:
     """Service for handling database snapshots (save/load operations)."""
@@ -23,7 +27,9 @@ class SnapshotService:
     def save(self, path: Optional[Path] = None) -> Path:
         """Save database snapshot to disk.
 
-        Saves both data and index metadata to a JSON file.
+        Saves both data and index metadata to a JSON file, and every built
+        index to a binary sidecar file next to it, so loading does not have
+        to rebuild them.
 
         Args:
             path: Optional path for the snapshot file.
@@ -37,8 +43,15 @@ class SnapshotService:
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             path = self._data_dir / f"snapshot_{timestamp}.json"
 
-        snapshot_data = self.repository.snapshot()
-        index_metadata = self.index_service.get_index_metadata()
+        # Read the data and the indices with chunk writes held back, so
+        # every sidecar matches the chunks saved next to it
+        with self.index_service.snapshot_barrier():
+            snapshot_data = self.repository.snapshot()
+            index_metadata = self.index_service.get_index_metadata()
+            payloads = {
+                library_id: self.index_service.serialize_index(library_id)
+                for library_id in index_metadata
+            }
 
         data: dict[str, Any] = {
             **snapshot_data,
@@ -49,6 +62,14 @@ class SnapshotService:
         # Ensure the directory exists
         path.parent.mkdir(parents=True, exist_ok=True)
 
+        for library_id, payload in payloads.items():
+            if payload is None:
+                continue
+            meta = index_metadata[library_id]
+            index_path = path.with_name(f"{path.stem}.{library_id}{INDEX_FILE_SUFFIX}")
+            index_path.write_bytes(payload)
+            index_metadata[library_id] = {**meta, "index_file": index_path.name}
+
         path.write_text(json.dumps(data, indent=2, sort_keys=True))
         self.logger.info(f"Database saved to {path}")
         return path
@@ -56,7 +77,10 @@ class SnapshotService:
     def load(self, path: Optional[Path] = None) -> None:
         """Load database snapshot from disk.
 
-        Restores both data and rebuilds indices from saved metadata.
+        Restores the data, then loads each index from its sidecar file.
+        Indices without a usable sidecar (missing, corrupt, from another
+        format version, or not matching the restored chunks) are rebuilt
+        from the saved metadata instead.
 
         Args:
             path: Optional path to the snapshot file.
@@ -73,9 +97,48 @@ class SnapshotService:
             self.repository.load_snapshot(data)
 
             index_metadata = data.get("indices", {})
-            self.index_service.rebuild_indices(index_metadata)
+            rebuild = {
+                library_id: meta
+                for library_id, meta in index_metadata.items()
+                if not self._restore_index(path, library_id, meta)
+            }
+            self.index_service.rebuild_indices(rebuild)
 
             self.logger.info(f"Database loaded from {path}")
         except Exception as e:
             self.logger.error(f"Failed to load database: {e}")
             raise
+
+    def delete(self, path: Path) -> None:
+        """Delete a snapshot file together with its index sidecar files."""
+        try:
+            indices = json.loads(path.read_text()).get("indices", {})
+        except ValueError:
+            indices = {}
+        path.unlink()
+        for meta in indices.values():
+            if meta.get("index_file"):
+                (path.parent / Path(meta["index_file"]).name).unlink(missing_ok=True)
+
+    def _restore_index(self, path: Path, library_id: str, meta: dict[str, Any]) -> bool:
+        """Load one library's index sidecar, returning whether it worked."""
+        index_file = meta.get("index_file")
+        if not index_file:
+            return False
+
+        try:
+            # Only ever read files next to the snapshot
+            payload = (path.parent / Path(index_file).name).read_bytes()
+            self.index_service.restore_index(
+                library_id,
+                meta.get("algorithm", settings.default_index),
+                meta.get("metric", settings.default_metric),
+                meta.get("params"),
+                payload,
+            )
+        except (OSError, ValueError, VectorDBException) as e:
+            self.logger.warning(
+                f"Could not load index file {index_file} for library {library_id}, rebuilding: {e}"
+            )
+            return False
+        return True
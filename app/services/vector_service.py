@@ -18,6 +18,6 @@ class VectorDBService:
         # Initialize services as public attributes
         self.indices = IndexService(self.repository)
         self.libraries = LibraryService(self.repository, self.indices)
-        self.documents = DocumentService(self.repository)
-        self.chunks = ChunkService(self.repository)
+        self.documents = DocumentService(self.repository, self.indices)
+        self.chunks = ChunkService(self.repository, self.indices)
         self.snapshots = SnapshotService(self.repository, self.indices)
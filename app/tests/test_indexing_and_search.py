@@ -1,6 +1,13 @@
+import random
+import threading
+import time
+
+import pytest
 from fastapi.testclient import TestClient
 
+from app.core import settings
 from app.main import app
+from app.services import get_service
 
 client = TestClient(app)
 
@@ -107,3 +114,852 @@ def test_search_with_metadata_filters(auth_headers):
     assert len(res) == 1
     assert res[0]["metadata"]["lang"] == "en"
     assert res[0]["metadata"]["topic"] == "a"
+
+
+def test_batch_search_returns_results_per_vector(auth_headers):
+    lib_id, c1, c2 = _seed_vectors("cosine", auth_headers)
+    r = client.put(
+        f"/libraries/{lib_id}/index", json={"algorithm": "lsh", "metric": "cosine"}, headers=auth_headers
+    )
+    assert r.status_code == 200
+
+    r = client.post(
+        f"/libraries/{lib_id}/chunks/search/batch",
+        json={"vectors": [[0.0, 1.0, 0.0], [1.0, 0.0, 0.0]], "k": 1},
+        headers=auth_headers,
+    )
+    assert r.status_code == 200
+    body = r.json()
+    assert body["algorithm"] == "lsh"
+    assert [res[0]["chunk_id"] for res in body["results"]] == [c1, c2]
+
+    r = client.post(
+        f"/libraries/{lib_id}/chunks/search/batch",
+        json={"vectors": [[0.0, 1.0, 0.0], [1.0, 0.0]], "k": 1},
+        headers=auth_headers,
+    )
+    assert r.status_code == 400
+
+
+def test_build_hnsw_index_with_params(auth_headers):
+    lib_id, c1, _ = _seed_vectors("cosine", auth_headers)
+    r = client.put(
+        f"/libraries/{lib_id}/index",
+        json={"algorithm": "hnsw", "metric": "cosine", "params": {"m": 8, "ef_search": 32}},
+        headers=auth_headers,
+    )
+    assert r.status_code == 200
+    assert r.json()["algorithm"] == "hnsw"
+    assert r.json()["params"]["m"] == 8
+    assert r.json()["params"]["ef_search"] == 32
+
+    r = client.post(
+        f"/libraries/{lib_id}/chunks/search",
+        json={"vector": [0.0, 1.0, 0.0], "k": 1},
+        headers=auth_headers,
+    )
+    assert r.status_code == 200
+    assert r.json()["results"][0]["chunk_id"] == c1
+
+    r = client.put(
+        f"/libraries/{lib_id}/index",
+        json={"algorithm": "hnsw", "metric": "cosine", "params": {"nlist": 8}},
+        headers=auth_headers,
+    )
+    assert r.status_code == 400
+
+    r = client.put(
+        f"/libraries/{lib_id}/index",
+        json={"algorithm": "hnsw", "metric": "cosine", "params": {"m": 1}},
+        headers=auth_headers,
+    )
+    assert r.status_code == 400
+
+    # Integer parameters given as fractional numbers are rejected up front
+    for algorithm, metric, params in [
+        ("hnsw", "cosine", {"m": 8.5}),
+        ("lsh", "cosine", {"num_planes": 8.5}),
+        ("ivf", "cosine", {"nlist": 2.5}),
+        ("kdtree", "euclidean", {"num_trees": 2.5}),
+        ("binary", "cosine", {"rerank": 2.5}),
+    ]:
+        r = client.put(
+            f"/libraries/{lib_id}/index",
+            json={"algorithm": algorithm, "metric": metric, "params": params},
+            headers=auth_headers,
+        )
+        assert r.status_code == 400
+        assert "must be an integer" in r.json()["detail"]
+
+
+def test_build_ivf_index_with_params(auth_headers):
+    lib_id, _, c2 = _seed_vectors("euclidean", auth_headers)
+    r = client.put(
+        f"/libraries/{lib_id}/index",
+        json={"algorithm": "ivf", "metric": "euclidean", "params": {"nlist": 2, "nprobe": 2}},
+        headers=auth_headers,
+    )
+    assert r.status_code == 200
+    assert r.json()["params"] == {"nlist": 2, "nprobe": 2, "seed": 42}
+
+    r = client.post(
+        f"/libraries/{lib_id}/chunks/search",
+        json={"vector": [1.0, 0.0, 0.0], "k": 1},
+        headers=auth_headers,
+    )
+    assert r.status_code == 200
+    assert r.json()["results"][0]["chunk_id"] == c2
+
+
+def test_build_sharded_index(auth_headers):
+    lib_id, c1, c2 = _seed_vectors("cosine", auth_headers)
+    r = client.put(
+        f"/libraries/{lib_id}/index",
+        json={"algorithm": "hnsw", "metric": "cosine", "params": {"m": 8, "shards": 2}},
+        headers=auth_headers,
+    )
+    assert r.status_code == 200
+    assert r.json()["params"]["shards"] == 2
+
+    r = client.post(
+        f"/libraries/{lib_id}/chunks/search",
+        json={"vector": [0.0, 1.0, 0.0], "k": 2},
+        headers=auth_headers,
+    )
+    assert r.status_code == 200
+    assert [res["chunk_id"] for res in r.json()["results"]] == [c1, c2]
+
+    for shards in (0, 1000, "2"):
+        r = client.put(
+            f"/libraries/{lib_id}/index",
+            json={"algorithm": "hnsw", "metric": "cosine", "params": {"shards": shards}},
+            headers=auth_headers,
+        )
+        assert r.status_code == 400
+
+
+def test_ivfpq_search_reranks_with_exact_scores(auth_headers):
+    lib_id, c1, _ = _seed_vectors("cosine", auth_headers)
+    r = client.put(
+        f"/libraries/{lib_id}/index",
+        json={"algorithm": "ivfpq", "metric": "cosine", "params": {"nlist": 1, "m": 1}},
+        headers=auth_headers,
+    )
+    assert r.status_code == 200
+    assert r.json()["params"]["rerank"] > 0
+
+    r = client.post(
+        f"/libraries/{lib_id}/chunks/search",
+        json={"vector": [0.0, 1.0, 0.0], "k": 2},
+        headers=auth_headers,
+    )
+    assert r.status_code == 200
+    results = r.json()["results"]
+    assert results[0]["chunk_id"] == c1
+    assert results[0]["score"] == 1.0
+    assert results[1]["score"] == 0.0
+
+    r = client.put(
+        f"/libraries/{lib_id}/index",
+        json={"algorithm": "ivfpq", "metric": "cosine", "params": {"m": 2}},
+        headers=auth_headers,
+    )
+    assert r.status_code == 400
+
+
+def test_build_linear_index_with_int8_storage(auth_headers):
+    lib_id, c1, _ = _seed_vectors("cosine", auth_headers)
+    r = client.put(
+        f"/libraries/{lib_id}/index",
+        json={"algorithm": "linear", "metric": "cosine", "params": {"storage": "int8", "rerank": 10}},
+        headers=auth_headers,
+    )
+    assert r.status_code == 200
+    assert r.json()["params"] == {"storage": "int8", "rerank": 10}
+
+    r = client.post(
+        f"/libraries/{lib_id}/chunks/search",
+        json={"vector": [0.0, 1.0, 0.0], "k": 1},
+        headers=auth_headers,
+    )
+    assert r.status_code == 200
+    assert r.json()["results"][0]["chunk_id"] == c1
+    assert r.json()["results"][0]["score"] == 1.0
+
+    r = client.put(
+        f"/libraries/{lib_id}/index",
+        json={"algorithm": "linear", "metric": "cosine", "params": {"storage": "int4"}},
+        headers=auth_headers,
+    )
+    assert r.status_code == 400
+
+
+def test_binary_index_reranks_with_exact_scores(auth_headers):
+    lib_id, c1, _ = _seed_vectors("cosine", auth_headers)
+    r = client.put(
+        f"/libraries/{lib_id}/index",
+        json={"algorithm": "binary", "metric": "cosine", "params": {"rotation": "random"}},
+        headers=auth_headers,
+    )
+    assert r.status_code == 200
+    assert r.json()["params"]["rerank"] > 0
+
+    r = client.post(
+        f"/libraries/{lib_id}/chunks/search",
+        json={"vector": [0.0, 1.0, 0.0], "k": 2},
+        headers=auth_headers,
+    )
+    assert r.status_code == 200
+    results = r.json()["results"]
+    assert results[0]["chunk_id"] == c1
+    assert results[0]["score"] == 1.0
+    assert results[1]["score"] == 0.0
+
+    r = client.put(
+        f"/libraries/{lib_id}/index",
+        json={"algorithm": "binary", "metric": "euclidean"},
+        headers=auth_headers,
+    )
+    assert r.status_code == 400
+
+
+def test_chunk_writes_update_built_index(auth_headers):
+    lib_id, c1, c2 = _seed_vectors("cosine", auth_headers)
+    r = client.put(
+        f"/libraries/{lib_id}/index",
+        json={"algorithm": "hnsw", "metric": "cosine"},
+        headers=auth_headers,
+    )
+    assert r.status_code == 200
+
+    doc_id = client.get(f"/libraries/{lib_id}/documents", headers=auth_headers).json()[0]["id"]
+    r = client.post(
+        f"/libraries/{lib_id}/chunks",
+        json={"document_id": doc_id, "text": "c", "embedding": [0.0, 0.0, 1.0]},
+        headers=auth_headers,
+    )
+    c3 = r.json()["id"]
+
+    def top(vector):
+        r = client.post(
+            f"/libraries/{lib_id}/chunks/search",
+            json={"vector": vector, "k": 1},
+            headers=auth_headers,
+        )
+        assert r.status_code == 200
+        return [item["chunk_id"] for item in r.json()["results"]]
+
+    # New chunks are searchable without rebuilding the index
+    assert top([0.0, 0.0, 1.0]) == [c3]
+
+    client.patch(
+        f"/libraries/{lib_id}/chunks/{c3}",
+        json={"embedding": [0.0, 1.0, 0.1]},
+        headers=auth_headers,
+    )
+    assert top([0.0, 0.0, 1.0]) == [c3]
+    assert top([1.0, 0.0, 0.0]) == [c2]
+
+    client.delete(f"/libraries/{lib_id}/chunks/{c2}", headers=auth_headers)
+    assert c2 not in top([1.0, 0.0, 0.0])
+    assert client.get(f"/libraries/{lib_id}/index", headers=auth_headers).json()["algorithm"] == "hnsw"
+
+    client.delete(f"/libraries/{lib_id}/documents/{doc_id}", headers=auth_headers)
+    assert top([1.0, 0.0, 0.0]) == []
+
+
+def test_build_kdtree_forest_with_params(auth_headers):
+    lib_id, _, c2 = _seed_vectors("euclidean", auth_headers)
+    r = client.put(
+        f"/libraries/{lib_id}/index",
+        json={"algorithm": "kdtree", "metric": "euclidean", "params": {"num_trees": 4, "max_checks": 64}},
+        headers=auth_headers,
+    )
+    assert r.status_code == 200
+    assert r.json()["params"] == {"num_trees": 4, "max_checks": 64, "seed": 42}
+
+    r = client.post(
+        f"/libraries/{lib_id}/chunks/search",
+        json={"vector": [1.0, 0.0, 0.0], "k": 1},
+        headers=auth_headers,
+    )
+    assert r.json()["results"][0]["chunk_id"] == c2
+
+    r = client.put(
+        f"/libraries/{lib_id}/index",
+        json={"algorithm": "kdtree", "metric": "euclidean", "params": {"max_checks": -1}},
+        headers=auth_headers,
+    )
+    assert r.status_code == 400
+
+
+def test_inner_product_metric_scores_raw_dot_products(auth_headers):
+    lib_id, _, c2 = _seed_vectors("inner_product", auth_headers)
+    r = client.put(
+        f"/libraries/{lib_id}/index",
+        json={"algorithm": "hnsw", "metric": "inner_product"},
+        headers=auth_headers,
+    )
+    assert r.status_code == 200
+    assert r.json()["metric"] == "inner_product"
+
+    r = client.post(
+        f"/libraries/{lib_id}/chunks/search",
+        json={"vector": [3.0, 1.0, 0.0], "k": 2},
+        headers=auth_headers,
+    )
+    results = r.json()["results"]
+    assert results[0]["chunk_id"] == c2
+    assert [hit["score"] for hit in results] == [3.0, 1.0]
+
+    r = client.put(
+        f"/libraries/{lib_id}/index",
+        json={"algorithm": "ivfpq", "metric": "inner_product"},
+        headers=auth_headers,
+    )
+    assert r.status_code == 400
+
+
+def test_selective_filter_still_returns_k_results(auth_headers):
+    r = client.post("/libraries/", json={"name": "lib-selective"}, headers=auth_headers)
+    lib_id = r.json()["id"]
+    r = client.post(f"/libraries/{lib_id}/documents", json={"title": "doc"}, headers=auth_headers)
+    doc_id = r.json()["id"]
+    for i in range(40):
+        client.post(
+            f"/libraries/{lib_id}/chunks",
+            json={
+                "document_id": doc_id,
+                "text": f"t{i}",
+                "embedding": [1.0, i / 40, 0.0],
+                # The rare chunks are the ones farthest from the query
+                "metadata": {"tier": "rare" if i >= 36 else "common"},
+            },
+            headers=auth_headers,
+        )
+    client.put(
+        f"/libraries/{lib_id}/index", json={"algorithm": "hnsw", "metric": "euclidean"}, headers=auth_headers
+    )
+
+    r = client.post(
+        f"/libraries/{lib_id}/chunks/search",
+        json={"vector": [1.0, 0.0, 0.0], "k": 3, "metadata_filters": {"tier": "rare"}},
+        headers=auth_headers,
+    )
+    results = r.json()["results"]
+    assert [hit["text"] for hit in results] == ["t36", "t37", "t38"]
+
+
+def test_metadata_filters_follow_chunk_updates_and_deletes(auth_headers):
+    r = client.post("/libraries/", json={"name": "lib-meta-index"}, headers=auth_headers)
+    lib_id = r.json()["id"]
+    r = client.post(f"/libraries/{lib_id}/documents", json={"title": "doc"}, headers=auth_headers)
+    doc_id = r.json()["id"]
+    chunk_ids = []
+    for i, lang in enumerate(["en", "en", "tr"]):
+        r = client.post(
+            f"/libraries/{lib_id}/chunks",
+            json={
+                "document_id": doc_id,
+                "text": f"t{i}",
+                "embedding": [1.0, float(i), 0.0],
+                "metadata": {"lang": lang, "topic": "a"},
+            },
+            headers=auth_headers,
+        )
+        chunk_ids.append(r.json()["id"])
+
+    def search(filters):
+        r = client.post(
+            f"/libraries/{lib_id}/chunks/search",
+            json={"vector": [1.0, 0.0, 0.0], "k": 5, "metadata_filters": filters},
+            headers=auth_headers,
+        )
+        return sorted(hit["chunk_id"] for hit in r.json()["results"])
+
+    assert search({"lang": "en", "topic": "a"}) == sorted(chunk_ids[:2])
+
+    client.patch(
+        f"/libraries/{lib_id}/chunks/{chunk_ids[0]}",
+        json={"metadata": {"lang": "tr", "topic": "a"}},
+        headers=auth_headers,
+    )
+    assert search({"lang": "en"}) == [chunk_ids[1]]
+    assert search({"lang": "tr", "topic": "a"}) == sorted([chunk_ids[0], chunk_ids[2]])
+
+    client.delete(f"/libraries/{lib_id}/chunks/{chunk_ids[2]}", headers=auth_headers)
+    assert search({"lang": "tr"}) == [chunk_ids[0]]
+    assert search({"lang": "de"}) == []
+
+
+def test_search_planner_picks_strategy_by_selectivity(auth_headers):
+    r = client.post("/libraries/", json={"name": "lib-planner"}, headers=auth_headers)
+    lib_id = r.json()["id"]
+    r = client.post(f"/libraries/{lib_id}/documents", json={"title": "doc"}, headers=auth_headers)
+    doc_id = r.json()["id"]
+    for i in range(40):
+        bucket = "rare" if i < 4 else "mid" if i < 16 else "common"
+        client.post(
+            f"/libraries/{lib_id}/chunks",
+            json={
+                "document_id": doc_id,
+                "text": f"t{i}",
+                "embedding": [1.0, i / 40, 0.0],
+                "metadata": {"bucket": bucket},
+            },
+            headers=auth_headers,
+        )
+    client.put(
+        f"/libraries/{lib_id}/index", json={"algorithm": "hnsw", "metric": "euclidean"}, headers=auth_headers
+    )
+
+    def search(filters):
+        r = client.post(
+            f"/libraries/{lib_id}/chunks/search",
+            json={"vector": [1.0, 0.0, 0.0], "k": 1, "metadata_filters": filters},
+            headers=auth_headers,
+        )
+        body = r.json()
+        return body["results"][0]["text"], body["plan"]
+
+    text, plan = search({})
+    assert text == "t0"
+    assert plan == {"strategy": "index", "estimated_matches": None, "candidates": 3}
+
+    text, plan = search({"bucket": "rare"})
+    assert (text, plan["strategy"], plan["estimated_matches"]) == ("t0", "exact", 4)
+
+    text, plan = search({"bucket": "mid"})
+    assert (text, plan["strategy"]) == ("t4", "filtered")
+
+    # The closest common chunk is 17th overall, so the fetch has to grow
+    text, plan = search({"bucket": "common"})
+    assert (text, plan["strategy"], plan["candidates"]) == ("t16", "post_filter", 20)
+
+
+def test_range_search_pages_through_threshold_matches(auth_headers):
+    r = client.post("/libraries/", json={"name": "lib-range"}, headers=auth_headers)
+    lib_id = r.json()["id"]
+    r = client.post(f"/libraries/{lib_id}/documents", json={"title": "doc"}, headers=auth_headers)
+    doc_id = r.json()["id"]
+    for i in range(10):
+        client.post(
+            f"/libraries/{lib_id}/chunks",
+            json={
+                "document_id": doc_id,
+                "text": f"t{i}",
+                "embedding": [float(i), 0.0],
+                "metadata": {"parity": "even" if i % 2 == 0 else "odd"},
+            },
+            headers=auth_headers,
+        )
+    r = client.put(
+        f"/libraries/{lib_id}/index", json={"algorithm": "kdtree", "metric": "euclidean"}, headers=auth_headers
+    )
+    assert r.status_code == 200
+
+    def search(**body):
+        r = client.post(
+            f"/libraries/{lib_id}/chunks/search",
+            json={"vector": [0.0, 0.0], **body},
+            headers=auth_headers,
+        )
+        return r
+
+    # Chunks t0..t6 lie within distance 6.5
+    r = search(k=3, max_distance=6.5)
+    assert r.status_code == 200
+    body = r.json()
+    assert [item["text"] for item in body["results"]] == ["t0", "t1", "t2"]
+    assert body["next_offset"] == 3
+
+    r = search(k=3, max_distance=6.5, offset=6)
+    body = r.json()
+    assert [item["text"] for item in body["results"]] == ["t6"]
+    assert body["next_offset"] is None
+
+    r = search(k=10, min_score=0.2, metadata_filters={"parity": "even"})
+    assert [item["text"] for item in r.json()["results"]] == ["t0", "t2", "t4"]
+
+    assert search(k=3).json()["next_offset"] is None
+    assert search(k=3, min_score=0.5, max_distance=1.0).status_code == 422
+    assert search(k=3, offset=3).status_code == 422
+
+
+def test_range_search_widens_reranked_fetch_past_approximate_misses(auth_headers):
+    r = client.post("/libraries/", json={"name": "lib-range-rerank"}, headers=auth_headers)
+    lib_id = r.json()["id"]
+    r = client.post(f"/libraries/{lib_id}/documents", json={"title": "doc"}, headers=auth_headers)
+    doc_id = r.json()["id"]
+    embeddings = [
+        [-0.6, -0.4, -1.1],
+        [-1.3, 0.6, 0.6],
+        [1.3, -0.8, 1.7],
+        [-0.3, 1.6, -0.4],
+        [-0.7, 0.2, 1.0],
+        [0.2, -0.6, -1.3],
+        [-1.4, 0.5, 1.0],
+        [-0.2, -1.1, 0.9],
+    ]
+    for i, embedding in enumerate(embeddings):
+        client.post(
+            f"/libraries/{lib_id}/chunks",
+            json={"document_id": doc_id, "text": f"t{i}", "embedding": embedding},
+            headers=auth_headers,
+        )
+    r = client.put(
+        f"/libraries/{lib_id}/index",
+        json={"algorithm": "binary", "metric": "cosine", "params": {"rotation": "none", "rerank": 1}},
+        headers=auth_headers,
+    )
+    assert r.status_code == 200
+
+    def search(**body):
+        r = client.post(
+            f"/libraries/{lib_id}/chunks/search",
+            json={"vector": [-1.3, -0.7, 0.6], "min_score": 0.5, "k": 2, **body},
+            headers=auth_headers,
+        )
+        assert r.status_code == 200
+        return r.json()
+
+    # The sign-bit codes rank t0 and t2 (below the threshold) ahead of every
+    # match but t1, so the first fetch of 3 candidates holds a single match
+    body = search()
+    assert [item["text"] for item in body["results"]] == ["t6", "t4"]
+    assert body["next_offset"] == 2
+    body = search(offset=2)
+    assert [item["text"] for item in body["results"]] == ["t7", "t1"]
+    assert body["next_offset"] is None
+
+
+def test_search_params_are_validated_against_index_kind(auth_headers):
+    lib_id, _, _ = _seed_vectors("cosine", auth_headers)
+    r = client.put(
+        f"/libraries/{lib_id}/index", json={"algorithm": "hnsw", "metric": "cosine"}, headers=auth_headers
+    )
+    assert r.status_code == 200
+
+    def search(**body):
+        return client.post(
+            f"/libraries/{lib_id}/chunks/search",
+            json={"vector": [1.0, 0.0, 0.0], "k": 2, **body},
+            headers=auth_headers,
+        )
+
+    r = search(search_params={"ef": 64}, deadline_ms=50)
+    assert r.status_code == 200
+    assert len(r.json()["results"]) == 2
+
+    r = client.post(
+        f"/libraries/{lib_id}/chunks/search/batch",
+        json={"vectors": [[1.0, 0.0, 0.0]], "k": 2, "search_params": {"ef": 8}},
+        headers=auth_headers,
+    )
+    assert r.status_code == 200
+
+    assert search(search_params={"nprobe": 4}).status_code == 400
+    assert search(search_params={"ef": 0}).status_code == 400
+    assert search(deadline_ms=0).status_code == 422
+    assert search(min_score=0.5, search_params={"ef": 8}).status_code == 422
+
+
+@pytest.mark.parametrize("rerank_store", [False, True])
+def test_rerank_factor_rescores_with_current_vectors(auth_headers, monkeypatch, rerank_store):
+    monkeypatch.setattr(settings, "rerank_store", rerank_store)
+    lib_id, c1, c2 = _seed_vectors("cosine", auth_headers)
+    r = client.put(
+        f"/libraries/{lib_id}/index",
+        json={"algorithm": "linear", "metric": "cosine", "params": {"storage": "int8"}},
+        headers=auth_headers,
+    )
+    assert r.status_code == 200
+
+    def search(**body):
+        r = client.post(
+            f"/libraries/{lib_id}/chunks/search",
+            json={"vector": [0.6, 0.8, 0.0], "k": 2, **body},
+            headers=auth_headers,
+        )
+        assert r.status_code == 200
+        return {item["chunk_id"]: item["score"] for item in r.json()["results"]}
+
+    scores = search(rerank_factor=2)
+    assert round(scores[c1], 5) == 0.8
+    assert round(scores[c2], 5) == 0.6
+    # Without RERANK_STORE the candidates are read from the repository
+    assert (lib_id in get_service().indices._stores) == rerank_store
+
+    # Re-ranking follows chunk updates
+    r = client.patch(
+        f"/libraries/{lib_id}/chunks/{c2}", json={"embedding": [0.0, 0.0, 1.0]}, headers=auth_headers
+    )
+    assert r.status_code == 200
+    assert round(search(rerank_factor=1)[c2], 5) == 0.0
+
+    r = client.post(
+        f"/libraries/{lib_id}/chunks/search",
+        json={"vector": [0.6, 0.8, 0.0], "k": 2, "rerank_factor": 0},
+        headers=auth_headers,
+    )
+    assert r.status_code == 422
+
+
+def test_autotune_installs_cheapest_configuration_meeting_target(auth_headers):
+    r = client.post("/libraries/", json={"name": "lib-autotune"}, headers=auth_headers)
+    lib_id = r.json()["id"]
+    r = client.post(f"/libraries/{lib_id}/documents", json={"title": "doc"}, headers=auth_headers)
+    doc_id = r.json()["id"]
+    rng = random.Random(3)
+    for i in range(150):
+        client.post(
+            f"/libraries/{lib_id}/chunks",
+            json={"document_id": doc_id, "text": f"t{i}", "embedding": [rng.gauss(0, 1) for _ in range(8)]},
+            headers=auth_headers,
+        )
+
+    def wait(job):
+        deadline = time.monotonic() + 60
+        while job["status"] in ("queued", "running") and time.monotonic() < deadline:
+            time.sleep(0.01)
+            job = client.get(f"/libraries/{lib_id}/index/jobs/{job['id']}", headers=auth_headers).json()
+        assert job["status"] == "succeeded"
+        return job
+
+    r = client.post(
+        f"/libraries/{lib_id}/index/autotune",
+        json={"metric": "euclidean", "k": 5, "target_recall": 0.95, "sample_size": 120, "num_queries": 10},
+        headers=auth_headers,
+    )
+    assert r.status_code == 202
+    assert r.json()["kind"] == "autotune"
+    job = wait(r.json())
+    report = job["autotune"]
+    assert (report["sample_size"], report["num_queries"]) == (120, 10)
+    rows = report["candidates"]
+    assert {"linear", "kdtree", "hnsw", "ivf"} <= {row["algorithm"] for row in rows}
+    assert all(row["algorithm"] not in ("lsh", "binary") for row in rows)
+    exact = next(row for row in rows if row["algorithm"] == "linear" and row["params"] == {})
+    assert exact["recall"] == 1.0 and exact["meets_target"]
+
+    qualified = [row for row in rows if row["meets_target"]]
+    cheapest = min(row["memory_bytes"] for row in qualified)
+    selected = report["selected"]
+    assert selected["algorithm"] in {row["algorithm"] for row in qualified if row["memory_bytes"] == cheapest}
+    assert (job["algorithm"], job["params"]) == (selected["algorithm"], selected["params"])
+    assert job["processed_vectors"] == job["total_vectors"] == 150
+    assert client.get(f"/libraries/{lib_id}/index", headers=auth_headers).json() == selected
+
+    # An unreachable latency target installs nothing
+    r = client.post(
+        f"/libraries/{lib_id}/index/autotune",
+        json={"metric": "euclidean", "k": 5, "max_latency_ms": 1e-9, "sample_size": 50, "num_queries": 5},
+        headers=auth_headers,
+    )
+    assert r.status_code == 202
+    job = wait(r.json())
+    assert job["autotune"]["selected"] is None and job["algorithm"] is None
+    assert client.get(f"/libraries/{lib_id}/index", headers=auth_headers).json() == selected
+
+    r = client.post(f"/libraries/{lib_id}/index/autotune", json={"metric": "hamming"}, headers=auth_headers)
+    assert r.status_code == 400
+    r = client.post(f"/libraries/{lib_id}/index/autotune", json={"metric": "cosine", "k": 100, "sample_size": 50}, headers=auth_headers)
+    assert r.status_code == 400
+    r = client.post("/libraries/missing/index/autotune", json={"metric": "cosine"}, headers=auth_headers)
+    assert r.status_code == 404
+
+
+def test_background_build_job_reports_progress_and_swaps_in(auth_headers):
+    lib_id, c1, _ = _seed_vectors("cosine", auth_headers)
+    client.put(f"/libraries/{lib_id}/index", json={"algorithm": "linear", "metric": "cosine"}, headers=auth_headers)
+
+    r = client.post(
+        f"/libraries/{lib_id}/index/jobs",
+        json={"algorithm": "hnsw", "metric": "cosine", "params": {"m": 4}},
+        headers=auth_headers,
+    )
+    assert r.status_code == 202
+    job = r.json()
+    assert job["status"] in ("queued", "running", "succeeded")
+    deadline = time.monotonic() + 10
+    while job["status"] in ("queued", "running") and time.monotonic() < deadline:
+        time.sleep(0.01)
+        job = client.get(f"/libraries/{lib_id}/index/jobs/{job['id']}", headers=auth_headers).json()
+    assert job["status"] == "succeeded"
+    assert job["processed_vectors"] == job["total_vectors"] == 2
+    assert job["eta_seconds"] == 0 and job["error"] is None
+    assert client.get(f"/libraries/{lib_id}/index", headers=auth_headers).json()["algorithm"] == "hnsw"
+
+    r = client.post(
+        f"/libraries/{lib_id}/index/jobs", json={"algorithm": "kdtree", "metric": "cosine"}, headers=auth_headers
+    )
+    assert r.status_code == 400
+    r = client.post("/libraries/missing/index/jobs", json={"algorithm": "linear", "metric": "cosine"}, headers=auth_headers)
+    assert r.status_code == 404
+    assert client.get(f"/libraries/{lib_id}/index/jobs/missing", headers=auth_headers).status_code == 404
+    assert client.get(f"/libraries/{c1}/index/jobs/{job['id']}", headers=auth_headers).status_code == 404
+
+
+def test_hnsw_compacts_tombstones_in_the_background(auth_headers):
+    lib_id, _, _ = _seed_vectors("cosine", auth_headers)
+    doc_id = client.get(f"/libraries/{lib_id}/chunks", headers=auth_headers).json()[0]["document_id"]
+    rng = random.Random(5)
+    for i in range(18):
+        client.post(
+            f"/libraries/{lib_id}/chunks",
+            json={"document_id": doc_id, "text": f"c{i}", "embedding": [rng.uniform(-1, 1) for _ in range(3)]},
+            headers=auth_headers,
+        )
+    client.put(
+        f"/libraries/{lib_id}/index", json={"algorithm": "hnsw", "metric": "cosine", "params": {"m": 4}}, headers=auth_headers
+    )
+    service = get_service().indices
+    graph = service._indices[lib_id]
+    chunk_ids = [c["id"] for c in client.get(f"/libraries/{lib_id}/chunks", headers=auth_headers).json()]
+
+    # Removals only tombstone nodes; the graph is rebuilt off the write path
+    removed = chunk_ids[:6]
+    for chunk_id in removed:
+        client.delete(f"/libraries/{lib_id}/chunks/{chunk_id}", headers=auth_headers)
+    assert len(graph._ids) == 20
+    deadline = time.monotonic() + 10
+    while service._indices[lib_id] is graph and time.monotonic() < deadline:
+        time.sleep(0.01)
+    compacted = service._indices[lib_id]
+    assert compacted is not graph and not compacted.needs_compaction()
+    assert sorted(compacted.ids()) == sorted(chunk_ids[6:])
+    assert service.get_index_info(lib_id)["params"]["m"] == 4
+
+    # A compaction finishing after the index was replaced does not undo that
+    client.put(f"/libraries/{lib_id}/index", json={"algorithm": "linear", "metric": "cosine"}, headers=auth_headers)
+    service._compact(lib_id, compacted)
+    assert service.get_index_info(lib_id)["algorithm"] == "linear"
+
+
+def test_chunk_writes_only_lock_their_own_library(auth_headers):
+    busy_id, _, _ = _seed_vectors("cosine", auth_headers)
+    lib_id, c1, _ = _seed_vectors("cosine", auth_headers)
+    for library_id in (busy_id, lib_id):
+        client.put(f"/libraries/{library_id}/index", json={"algorithm": "linear", "metric": "cosine"}, headers=auth_headers)
+    service = get_service().indices
+
+    results = []
+
+    def search():
+        results.extend(service.search(lib_id, [0.0, 1.0, 0.0], 1))
+
+    # A write holding one library's index does not hold up searches of another
+    with service._library_lock(busy_id).write_lock():
+        thread = threading.Thread(target=search)
+        thread.start()
+        thread.join(5)
+        assert [chunk_id for chunk_id, _ in results] == [c1]
+
+
+def test_rejected_chunk_change_rebuilds_off_the_write_path(auth_headers, monkeypatch):
+    lib_id, _, _ = _seed_vectors("cosine", auth_headers)
+    doc_id = client.get(f"/libraries/{lib_id}/chunks", headers=auth_headers).json()[0]["document_id"]
+    client.put(f"/libraries/{lib_id}/index", json={"algorithm": "linear", "metric": "cosine"}, headers=auth_headers)
+    service = get_service().indices
+    index = service._indices[lib_id]
+
+    def reject(ids, vectors):
+        raise ValueError("rejected")
+
+    monkeypatch.setattr(index, "add", reject)
+    build_index = service.build_index
+    threads = []
+
+    def record_thread(*args, **kwargs):
+        threads.append(threading.current_thread().name)
+        build_index(*args, **kwargs)
+
+    monkeypatch.setattr(service, "build_index", record_thread)
+    r = client.post(
+        f"/libraries/{lib_id}/chunks",
+        json={"document_id": doc_id, "text": "late", "embedding": [0.0, 0.0, 1.0]},
+        headers=auth_headers,
+    )
+    deadline = time.monotonic() + 10
+    while service._indices[lib_id] is index and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert r.json()["id"] in service._indices[lib_id].ids()
+    assert len(threads) == 1 and threads[0].startswith("index-job")
+
+
+@pytest.mark.parametrize("algorithm,metric", [("kdtree", "euclidean"), ("lsh", "cosine")])
+def test_kd_tree_and_lsh_rebuild_in_the_background(auth_headers, algorithm, metric):
+    lib_id, _, _ = _seed_vectors(metric, auth_headers)
+    doc_id = client.get(f"/libraries/{lib_id}/chunks", headers=auth_headers).json()[0]["document_id"]
+    r = client.put(f"/libraries/{lib_id}/index", json={"algorithm": algorithm, "metric": metric}, headers=auth_headers)
+    assert r.status_code == 200
+    service = get_service().indices
+    index = service._indices[lib_id]
+
+    # Writes never rebuild inline; past the threshold a job replaces the index
+    rng = random.Random(6)
+    for i in range(4):
+        client.post(
+            f"/libraries/{lib_id}/chunks",
+            json={"document_id": doc_id, "text": f"c{i}", "embedding": [rng.uniform(-1, 1) for _ in range(3)]},
+            headers=auth_headers,
+        )
+    deadline = time.monotonic() + 10
+    while service._indices[lib_id] is index and time.monotonic() < deadline:
+        time.sleep(0.01)
+    rebuilt = service._indices[lib_id]
+    assert rebuilt is not index and not rebuilt.needs_compaction()
+    assert rebuilt.size() == 6
+
+
+def test_chunks_written_during_a_build_reach_the_new_index(auth_headers):
+    lib_id, _, _ = _seed_vectors("cosine", auth_headers)
+    doc_id = client.get(f"/libraries/{lib_id}/chunks", headers=auth_headers).json()[0]["document_id"]
+    client.put(f"/libraries/{lib_id}/index", json={"algorithm": "linear", "metric": "cosine"}, headers=auth_headers)
+
+    added = []
+
+    def write_during_build(processed, total):
+        # Runs after the build has read the library's chunks
+        if not added:
+            r = client.post(
+                f"/libraries/{lib_id}/chunks",
+                json={"document_id": doc_id, "text": "late", "embedding": [0.0, 0.0, 1.0]},
+                headers=auth_headers,
+            )
+            added.append(r.json()["id"])
+
+    get_service().indices.build_index(lib_id, "hnsw", "cosine", progress=write_during_build)
+    r = client.post(
+        f"/libraries/{lib_id}/chunks/search", json={"vector": [0.0, 0.0, 1.0], "k": 1}, headers=auth_headers
+    )
+    assert [item["chunk_id"] for item in r.json()["results"]] == added
+
+
+def test_chunks_written_during_a_fallback_build_reach_the_index(auth_headers, monkeypatch):
+    lib_id, _, _ = _seed_vectors("cosine", auth_headers)
+    doc_id = client.get(f"/libraries/{lib_id}/chunks", headers=auth_headers).json()[0]["document_id"]
+    service = get_service().indices
+    assert lib_id not in service._indices
+
+    list_chunks = service.repository.list_chunks
+    added = []
+
+    def write_during_build(library_id):
+        chunks = list_chunks(library_id)
+        # Only the fallback build's listing, after it has started its log
+        if service._build_logs.get(lib_id) and not added:
+            r = client.post(
+                f"/libraries/{lib_id}/chunks",
+                json={"document_id": doc_id, "text": "late", "embedding": [0.0, 0.0, 1.0]},
+                headers=auth_headers,
+            )
+            added.append(r.json()["id"])
+        return chunks
+
+    monkeypatch.setattr(service.repository, "list_chunks", write_during_build)
+    r = client.post(
+        f"/libraries/{lib_id}/chunks/search", json={"vector": [0.0, 0.0, 1.0], "k": 1}, headers=auth_headers
+    )
+    assert added
+    assert [item["chunk_id"] for item in r.json()["results"]] == added
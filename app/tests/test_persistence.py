@@ -1,10 +1,12 @@
 from __future__ import annotations
 
+import json
 from pathlib import Path
 
 from fastapi.testclient import TestClient
 
 from app.main import app
+from app.services import get_service
 
 client = TestClient(app)
 
@@ -82,3 +84,108 @@ def test_persistence_save_load_and_search_restored(tmp_path: Path, auth_headers)
     info2 = r.json()
     assert info2["algorithm"] == "kdtree"
     assert info2["metric"] == "euclidean"
+
+
+def test_snapshot_restores_indices_from_sidecar_files(tmp_path: Path, auth_headers, monkeypatch) -> None:
+    r = client.post("/libraries/", json={"name": "lib-sidecar"}, headers=auth_headers)
+    lib_id = r.json()["id"]
+    r = client.post(f"/libraries/{lib_id}/documents", json={"title": "doc"}, headers=auth_headers)
+    doc_id = r.json()["id"]
+    for i in range(20):
+        r = client.post(
+            f"/libraries/{lib_id}/chunks",
+            json={"document_id": doc_id, "text": f"t{i}", "embedding": [float(i), 1.0, -float(i % 3)]},
+            headers=auth_headers,
+        )
+        assert r.status_code == 201
+    r = client.put(
+        f"/libraries/{lib_id}/index",
+        json={"algorithm": "hnsw", "metric": "cosine", "params": {"m": 4}},
+        headers=auth_headers,
+    )
+    assert r.status_code == 200
+
+    def search() -> list[str]:
+        r = client.post(
+            f"/libraries/{lib_id}/chunks/search",
+            json={"vector": [3.0, 1.0, 0.0], "k": 5},
+            headers=auth_headers,
+        )
+        assert r.status_code == 200
+        return [res["chunk_id"] for res in r.json()["results"]]
+
+    before = search()
+    service = get_service()
+    path = service.snapshots.save(tmp_path / "snapshot.json")
+    index_file = json.loads(path.read_text())["indices"][lib_id]["index_file"]
+    assert (tmp_path / index_file).exists()
+
+    rebuilt = []
+    build_index = service.indices.build_index
+
+    def recording_build(library_id, *args, **kwargs):
+        rebuilt.append(library_id)
+        return build_index(library_id, *args, **kwargs)
+
+    monkeypatch.setattr(service.indices, "build_index", recording_build)
+    service.snapshots.load(path)
+    assert lib_id not in rebuilt
+    assert search() == before
+    assert service.indices.get_index_info(lib_id)["params"]["m"] == 4
+
+    # A corrupted sidecar is ignored and the index rebuilt from the chunks
+    data = bytearray((tmp_path / index_file).read_bytes())
+    data[len(data) // 2] ^= 0xFF
+    (tmp_path / index_file).write_bytes(bytes(data))
+    service.snapshots.load(path)
+    assert lib_id in rebuilt
+    assert search() == before
+
+    service.snapshots.delete(path)
+    assert not path.exists()
+    assert not (tmp_path / index_file).exists()
+
+
+def test_snapshot_rejects_sidecar_for_other_embeddings(tmp_path: Path, auth_headers, monkeypatch) -> None:
+    r = client.post("/libraries/", json={"name": "lib-sidecar-digest"}, headers=auth_headers)
+    lib_id = r.json()["id"]
+    r = client.post(f"/libraries/{lib_id}/documents", json={"title": "doc"}, headers=auth_headers)
+    doc_id = r.json()["id"]
+    for i in range(10):
+        r = client.post(
+            f"/libraries/{lib_id}/chunks",
+            json={"document_id": doc_id, "text": f"t{i}", "embedding": [float(i), 1.0, 0.5]},
+            headers=auth_headers,
+        )
+        assert r.status_code == 201
+    r = client.put(f"/libraries/{lib_id}/index", json={"algorithm": "linear", "metric": "cosine"}, headers=auth_headers)
+    assert r.status_code == 200
+
+    service = get_service()
+    path = service.snapshots.save(tmp_path / "snapshot.json")
+
+    # Same chunk ids, but one embedding no longer matches the sidecar
+    data = json.loads(path.read_text())
+    chunk = next(c for c in data["chunks"] if c["document_id"] == doc_id and c["text"] == "t3")
+    chunk["embedding"] = [-3.0, 1.0, 0.5]
+    path.write_text(json.dumps(data))
+
+    rebuilt = []
+    build_index = service.indices.build_index
+
+    def recording_build(library_id, *args, **kwargs):
+        rebuilt.append(library_id)
+        return build_index(library_id, *args, **kwargs)
+
+    monkeypatch.setattr(service.indices, "build_index", recording_build)
+    service.snapshots.load(path)
+    assert lib_id in rebuilt
+
+    r = client.post(
+        f"/libraries/{lib_id}/chunks/search",
+        json={"vector": [-3.0, 1.0, 0.5], "k": 1},
+        headers=auth_headers,
+    )
+    assert r.status_code == 200
+    assert r.json()["results"][0]["chunk_id"] == chunk["id"]
+    service.snapshots.delete(path)
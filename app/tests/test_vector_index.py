@@ -0,0 +1,791 @@
+import random
+import time
+
+import numpy as np
+import pytest
+
+from app.core import settings
+from app.vector_index import (
+    BinaryIndex,
+    HNSWIndex,
+    IVFIndex,
+    IVFPQIndex,
+    KDTreeIndex,
+    LinearIndex,
+    LSHIndex,
+    ShardedIndex,
+    VectorStore,
+    cosine_similarity,
+    dot,
+    euclidean_distance,
+    parallel,
+    serialization,
+)
+from app.vector_index.evaluation import evaluate_index, exact_neighbors, memory_bytes
+from benchmarks.datasets import clustered_dataset
+from benchmarks.run import compare, format_table, run_suite
+
+
+def _random_vectors(n: int, dim: int, seed: int = 0) -> list[list[float]]:
+    rng = random.Random(seed)
+    return [[rng.gauss(0, 1) for _ in range(dim)] for _ in range(n)]
+
+
+def _brute_force(vectors, ids, query, k, metric):
+    if metric == "cosine":
+        scores = [(i, cosine_similarity(query, v)) for i, v in zip(ids, vectors)]
+    elif metric == "inner_product":
+        scores = [(i, dot(query, v)) for i, v in zip(ids, vectors)]
+    else:
+        scores = [
+            (i, 1.0 / (1.0 + euclidean_distance(query, v)))
+            for i, v in zip(ids, vectors)
+        ]
+    scores.sort(key=lambda x: x[1], reverse=True)
+    return scores[:k]
+
+
+@pytest.mark.parametrize("metric", ["cosine", "euclidean", "inner_product"])
+def test_linear_matches_brute_force(metric):
+    vectors = _random_vectors(300, 16)
+    ids = [f"c{i}" for i in range(len(vectors))]
+    index = LinearIndex(metric=metric)
+    index.build(vectors, ids)
+
+    for query in _random_vectors(5, 16, seed=1):
+        expected = _brute_force(vectors, ids, query, 10, metric)
+        got = index.query(query, 10)
+        assert [cid for cid, _ in got] == [cid for cid, _ in expected]
+        for (_, s1), (_, s2) in zip(got, expected):
+            assert s1 == pytest.approx(s2, abs=1e-4)
+
+
+@pytest.mark.parametrize("storage,ratio", [("float16", 2), ("int8", 4)])
+@pytest.mark.parametrize("metric", ["cosine", "euclidean"])
+def test_linear_compressed_storage(storage, ratio, metric):
+    vectors = _random_vectors(300, 16)
+    ids = [f"c{i}" for i in range(len(vectors))]
+    exact = LinearIndex(metric=metric)
+    exact.build(vectors, ids)
+    index = LinearIndex(metric=metric, storage=storage, rerank=20)
+    index.build(vectors, ids)
+
+    assert index._matrix.nbytes * ratio == exact._matrix.nbytes
+    assert index.rerank_candidates() == 20
+    assert exact.rerank_candidates() == 0
+
+    queries = _random_vectors(20, 16, seed=6)
+    assert _recall(index, vectors, ids, queries, 10, metric) >= 0.9
+    for query in queries:
+        for (_, s1), (_, s2) in zip(index.query(query, 10), exact.query(query, 10)):
+            assert s1 == pytest.approx(s2, abs=0.05)
+
+
+def test_linear_rejects_invalid_storage():
+    with pytest.raises(ValueError):
+        LinearIndex(storage="int4")
+    with pytest.raises(ValueError):
+        LinearIndex(rerank=-1)
+
+
+def test_linear_edge_cases():
+    index = LinearIndex(metric="cosine")
+    assert index.query([1.0, 0.0], 3) == []
+
+    index.build([[0.0, 0.0], [1.0, 0.0]], ["zero", "x"])
+    results = index.query([1.0, 0.0], 5)
+    assert [cid for cid, _ in results] == ["x", "zero"]
+    assert results[1][1] == 0.0
+    assert index.query([0.0, 0.0], 1)[0][1] == 0.0
+    assert index.query([1.0, 0.0], 0) == []
+
+    with pytest.raises(ValueError):
+        index.query([1.0, 0.0, 0.0], 1)
+
+
+def test_kdtree_matches_brute_force():
+    # Enough points for several levels of leaf buckets, plus duplicates
+    vectors = _random_vectors(600, 6) + [[0.5] * 6] * 100
+    ids = [f"c{i}" for i in range(len(vectors))]
+    index = KDTreeIndex()
+    index.build(vectors, ids)
+
+    for query in _random_vectors(10, 6, seed=10):
+        expected = _brute_force(vectors, ids, query, 15, "euclidean")
+        got = index.query(query, 15)
+        assert [cid for cid, _ in got] == [cid for cid, _ in expected]
+        assert [s for _, s in got] == pytest.approx([s for _, s in expected])
+
+    # Ties between duplicates may come back in any order
+    got = index.query([0.5] * 6, 100)
+    assert {cid for cid, _ in got} == {f"c{i}" for i in range(600, 700)}
+
+
+def test_kdtree_forest_trades_recall_for_checks():
+    vectors = _random_vectors(1000, 24)
+    ids = [f"c{i}" for i in range(len(vectors))]
+    queries = _random_vectors(10, 24, seed=11)
+
+    # Without a budget a forest is still exact
+    exact = KDTreeIndex(num_trees=4)
+    exact.build(vectors, ids)
+    assert _recall(exact, vectors, ids, queries, 10, "euclidean") == 1.0
+
+    index = KDTreeIndex(num_trees=4, max_checks=300)
+    index.build(vectors, ids)
+    assert index.params() == {"num_trees": 4, "max_checks": 300, "seed": 42}
+    assert 0.3 <= _recall(index, vectors, ids, queries, 10, "euclidean") < 1.0
+    for query in queries:
+        assert len(index.query(query, 10)) == 10
+        assert index.query(query, 10, max_checks=0) == exact.query(query, 10)
+
+    with pytest.raises(ValueError):
+        KDTreeIndex(num_trees=0)
+
+
+@pytest.mark.parametrize(
+    "index",
+    [
+        LinearIndex(metric="cosine"),
+        LinearIndex(metric="euclidean"),
+        LinearIndex(metric="cosine", storage="int8"),
+        KDTreeIndex(),
+        LSHIndex(),
+    ],
+)
+def test_query_batch_matches_single_queries(index):
+    vectors = _random_vectors(200, 8)
+    ids = [f"c{i}" for i in range(len(vectors))]
+    index.build(vectors, ids)
+
+    queries = _random_vectors(4, 8, seed=2)
+    batch = index.query_batch(queries, 5)
+    assert len(batch) == len(queries)
+    for query, results in zip(queries, batch):
+        single = index.query(query, 5)
+        assert [cid for cid, _ in results] == [cid for cid, _ in single]
+        for (_, s1), (_, s2) in zip(results, single):
+            assert s1 == pytest.approx(s2)
+
+    with pytest.raises(ValueError):
+        index.query_batch([queries[0], [1.0, 2.0]], 5)
+
+
+@pytest.mark.parametrize(
+    "make_index,exact",
+    [
+        (lambda: LinearIndex(metric="cosine"), True),
+        (lambda: BinaryIndex(rotation="none"), False),
+        (lambda: KDTreeIndex(), True),
+        (lambda: KDTreeIndex(num_trees=4, max_checks=32), False),
+        (lambda: LSHIndex(num_planes=6, probes=0), False),
+        (lambda: HNSWIndex(metric="cosine", m=8), False),
+        (lambda: IVFIndex(metric="cosine", nlist=16, nprobe=1), False),
+        (lambda: IVFPQIndex(metric="cosine", nlist=16, nprobe=1, m=4), False),
+    ],
+)
+@pytest.mark.parametrize("selectivity", [2, 25])
+def test_filtered_query_returns_k_allowed_results(make_index, exact, selectivity):
+    vectors = _random_vectors(1000, 16)
+    ids = [f"c{i}" for i in range(len(vectors))]
+    index = make_index()
+    index.build(vectors, ids)
+    # Only every selectivity-th id may be returned
+    allowed = set(ids[::selectivity])
+    metric = "euclidean" if isinstance(index, KDTreeIndex) else "cosine"
+
+    for query in _random_vectors(5, 16, seed=8):
+        got = index.query(query, 10, allowed=allowed)
+        assert len(got) == 10
+        assert {cid for cid, _ in got} <= allowed
+        if exact:
+            kept = [(v, cid) for v, cid in zip(vectors, ids) if cid in allowed]
+            expected = _brute_force(
+                [v for v, _ in kept], [cid for _, cid in kept], query, 10, metric
+            )
+            assert [cid for cid, _ in got] == [cid for cid, _ in expected]
+
+    assert index.query_batch([vectors[0]], 10, allowed=set())[0] == []
+    assert len(index.query(vectors[0], 10, allowed={"c3", "c5"})) == 2
+
+
+@pytest.mark.parametrize(
+    "make_index,metric",
+    [
+        (lambda: LinearIndex(metric="cosine"), "cosine"),
+        (lambda: LinearIndex(metric="euclidean"), "euclidean"),
+        (lambda: KDTreeIndex(num_trees=2), "euclidean"),
+        (lambda: HNSWIndex(metric="cosine", m=16, ef_search=200), "cosine"),
+    ],
+)
+def test_range_query_returns_everything_above_threshold(make_index, metric):
+    vectors = _random_vectors(500, 8)
+    ids = [f"c{i}" for i in range(len(vectors))]
+    index = make_index()
+    index.build(vectors, ids)
+    query = _random_vectors(1, 8, seed=9)[0]
+    ranked = _brute_force(vectors, ids, query, len(ids), metric)
+    # Threshold halfway between the 40th and 41st best scores
+    min_score = (ranked[39][1] + ranked[40][1]) / 2
+
+    got = index.range_query(query, min_score, 100)
+    assert [cid for cid, _ in got] == [cid for cid, _ in ranked[:40]]
+    assert [cid for cid, _ in index.range_query(query, min_score, 15)] == [
+        cid for cid, _ in ranked[:15]
+    ]
+
+    allowed = set(ids[::3])
+    expected = [cid for cid, _ in ranked[:40] if cid in allowed]
+    got = index.range_query(query, min_score, 100, allowed=allowed)
+    assert [cid for cid, _ in got] == expected
+    assert index.range_query(query, 2.0, 100) == []
+
+
+@pytest.mark.parametrize(
+    "make_index",
+    [
+        lambda: KDTreeIndex(num_trees=2, max_checks=0),
+        lambda: LSHIndex(num_planes=6, probes=8),
+        lambda: HNSWIndex(metric="cosine", m=8),
+        lambda: IVFIndex(metric="cosine", nlist=16, nprobe=16),
+        lambda: IVFPQIndex(metric="cosine", nlist=16, nprobe=16, m=4),
+    ],
+)
+def test_expired_deadline_returns_best_results_so_far(make_index):
+    vectors = _random_vectors(1000, 16)
+    ids = [f"c{i}" for i in range(len(vectors))]
+    index = make_index()
+    index.build(vectors, ids)
+    expired = time.monotonic() - 1.0
+
+    for query in _random_vectors(3, 16, seed=10):
+        got = index.query(query, 10, deadline=expired)
+        assert 0 < len(got) <= 10
+        assert len({cid for cid, _ in got}) == len(got)
+        assert index.query(query, 10, deadline=time.monotonic() + 60) == index.query(
+            query, 10
+        )
+
+    batch = index.query_batch(_random_vectors(2, 16, seed=11), 5, deadline=expired)
+    assert all(results for results in batch)
+
+
+@pytest.mark.parametrize("metric", ["cosine", "euclidean", "inner_product"])
+def test_vector_store_reranks_exactly_across_changes(metric):
+    vectors = _random_vectors(50, 8)
+    ids = [f"c{i}" for i in range(len(vectors))]
+    store = VectorStore()
+    store.build(vectors[:40], ids[:40])
+    store.put(ids[40:], vectors[40:])
+    # Overwrite one row and drop a few, including the last one
+    vectors[3] = _random_vectors(1, 8, seed=12)[0]
+    store.put([ids[3]], [vectors[3]])
+    store.remove([ids[0], ids[49], "missing"])
+    assert store.size() == 48
+    assert store._data[: store.size()].flags["C_CONTIGUOUS"]
+
+    live = [(v, cid) for v, cid in zip(vectors, ids) if cid not in ("c0", "c49")]
+    query = _random_vectors(1, 8, seed=13)[0]
+    expected = _brute_force(
+        [v for v, _ in live], [cid for _, cid in live], query, 48, metric
+    )
+    got = store.rerank([query], [list(reversed(ids))], metric)[0]
+    assert [cid for cid, _ in got] == [cid for cid, _ in expected]
+    assert [s for _, s in got] == pytest.approx([s for _, s in expected], abs=1e-5)
+
+    with pytest.raises(ValueError):
+        store.put(["x"], [[1.0, 2.0]])
+
+
+def test_evaluate_index_measures_recall_and_memory(monkeypatch):
+    vectors = np.asarray(_random_vectors(400, 16), dtype=np.float32)
+    queries = np.asarray(_random_vectors(10, 16, seed=14), dtype=np.float32)
+    truth = exact_neighbors(vectors, queries, 5, "cosine")
+    assert all(len(rows) == 5 for rows in truth)
+
+    exact = evaluate_index(
+        lambda: LinearIndex(metric="cosine"), vectors, queries, truth, 5
+    )
+    assert exact["recall"] == 1.0
+    assert 0 < exact["p50_ms"] <= exact["p99_ms"]
+    assert exact["memory_bytes"] >= vectors.nbytes
+
+    # Re-ranking reads the shared embeddings unless RERANK_STORE copies them
+    binary = evaluate_index(lambda: BinaryIndex(rerank=200), vectors, queries, truth, 5)
+    assert binary["recall"] >= 0.9
+    monkeypatch.setattr(settings, "rerank_store", True)
+    stored = evaluate_index(lambda: BinaryIndex(rerank=200), vectors, queries, truth, 5)
+    assert stored["memory_bytes"] >= binary["memory_bytes"] + vectors.nbytes
+    assert memory_bytes([np.zeros(4, dtype=np.float32)] * 2) == 16 + 16
+
+
+def _recall(index, vectors, ids, queries, k, metric):
+    hits = 0
+    for query in queries:
+        expected = {cid for cid, _ in _brute_force(vectors, ids, query, k, metric)}
+        hits += len(expected & {cid for cid, _ in index.query(query, k)})
+    return hits / (k * len(queries))
+
+
+@pytest.mark.parametrize("metric", ["cosine", "euclidean"])
+def test_hnsw_recall(metric):
+    vectors = _random_vectors(500, 16)
+    ids = [f"c{i}" for i in range(len(vectors))]
+    index = HNSWIndex(metric=metric, m=8, ef_construction=64, ef_search=64)
+    index.build(vectors, ids)
+
+    queries = _random_vectors(20, 16, seed=3)
+    assert _recall(index, vectors, ids, queries, 10, metric) >= 0.9
+
+    # Exact matches score like the brute-force metrics do
+    cid, score = index.query(vectors[7], 1)[0]
+    assert cid == "c7"
+    assert score == pytest.approx(1.0, abs=1e-4)
+
+
+def test_hnsw_rejects_invalid_params():
+    with pytest.raises(ValueError):
+        HNSWIndex(m=1)
+    with pytest.raises(ValueError):
+        HNSWIndex(ef_search=0)
+    with pytest.raises(ValueError, match="must be an integer"):
+        HNSWIndex(m=8.0)
+    with pytest.raises(ValueError, match="must be an integer"):
+        HNSWIndex(seed=True)
+
+
+@pytest.mark.parametrize("metric", ["cosine", "euclidean"])
+def test_ivf_recall_grows_with_nprobe(metric):
+    vectors = _random_vectors(400, 8)
+    ids = [f"c{i}" for i in range(len(vectors))]
+    index = IVFIndex(metric=metric, nlist=16, nprobe=4)
+    index.build(vectors, ids)
+    queries = _random_vectors(20, 8, seed=4)
+
+    assert _recall(index, vectors, ids, queries, 10, metric) >= 0.6
+
+    # Probing every list is an exact scan
+    for query in queries:
+        expected = _brute_force(vectors, ids, query, 10, metric)
+        got = index.query(query, 10, nprobe=16)
+        assert [cid for cid, _ in got] == [cid for cid, _ in expected]
+
+
+def test_inner_product_indexes_rank_by_dot_product():
+    # Varying norms make inner product rankings differ from cosine ones
+    vectors = [
+        [x * (1 + i % 5) for x in v]
+        for i, v in enumerate(_random_vectors(400, 8, seed=6))
+    ]
+    ids = [f"c{i}" for i in range(len(vectors))]
+    queries = _random_vectors(20, 8, seed=7)
+
+    hnsw = HNSWIndex(metric="inner_product", m=8, ef_construction=64)
+    hnsw.build(vectors, ids)
+    assert _recall(hnsw, vectors, ids, queries, 10, "inner_product") >= 0.8
+
+    ivf = IVFIndex(metric="inner_product", nlist=16)
+    ivf.build(vectors, ids)
+    for query in queries:
+        expected = _brute_force(vectors, ids, query, 10, "inner_product")
+        got = ivf.query(query, 10, nprobe=16)
+        assert [cid for cid, _ in got] == [cid for cid, _ in expected]
+        assert got[0][1] == pytest.approx(expected[0][1], abs=1e-4)
+
+    with pytest.raises(ValueError):
+        IVFPQIndex(metric="inner_product")
+
+
+def test_ivf_small_library_clamps_nlist():
+    index = IVFIndex(metric="cosine", nlist=64)
+    index.build([[1.0, 0.0], [0.0, 1.0]], ["x", "y"])
+    assert [cid for cid, _ in index.query([1.0, 0.1], 2, nprobe=64)] == ["x", "y"]
+
+
+@pytest.mark.parametrize("metric", ["cosine", "euclidean"])
+def test_ivfpq_compresses_and_ranks_neighbors(metric):
+    vectors = _random_vectors(600, 16)
+    ids = [f"c{i}" for i in range(len(vectors))]
+    index = IVFPQIndex(metric=metric, nlist=4, nprobe=4, m=8)
+    index.build(vectors, ids)
+
+    assert all(codes.dtype.name == "uint8" for codes in index._list_codes)
+    assert sum(codes.nbytes for codes in index._list_codes) == 600 * 8
+    assert index.rerank_candidates() == 100
+
+    # ADC scores are approximate, the true neighbors still rank near the top
+    queries = _random_vectors(20, 16, seed=5)
+    hits = 0
+    for query in queries:
+        expected = {cid for cid, _ in _brute_force(vectors, ids, query, 10, metric)}
+        hits += len(expected & {cid for cid, _ in index.query(query, 50)})
+    assert hits / 200 >= 0.8
+
+
+def test_ivfpq_rejects_m_not_dividing_dim():
+    index = IVFPQIndex(m=3)
+    with pytest.raises(ValueError):
+        index.build(_random_vectors(10, 8), [str(i) for i in range(10)])
+
+
+@pytest.mark.parametrize("rotation", ["none", "random", "itq"])
+def test_binary_packs_bits_and_prefilters_neighbors(rotation):
+    vectors = _random_vectors(500, 96)
+    ids = [f"c{i}" for i in range(len(vectors))]
+    index = BinaryIndex(rotation=rotation, rerank=50)
+    index.build(vectors, ids)
+
+    # 96 dims round up to two 64-bit words per vector
+    assert index._codes.dtype.name == "uint64"
+    assert index._codes.shape == (500, 2)
+    assert index.rerank_candidates() == 50
+
+    cid, score = index.query(vectors[3], 1)[0]
+    assert cid == "c3"
+    assert score == 1.0
+
+    queries = _random_vectors(20, 96, seed=7)
+    hits = 0
+    for query in queries:
+        expected = {cid for cid, _ in _brute_force(vectors, ids, query, 10, "cosine")}
+        hits += len(expected & {cid for cid, _ in index.query(query, 100)})
+    assert hits / 200 >= 0.7
+
+    batch = index.query_batch(queries[:3], 5)
+    assert batch == [index.query(query, 5) for query in queries[:3]]
+
+
+def test_binary_rejects_invalid_params():
+    with pytest.raises(ValueError):
+        BinaryIndex(metric="euclidean")
+    with pytest.raises(ValueError):
+        BinaryIndex(rotation="pca")
+
+
+@pytest.mark.parametrize(
+    "make_index",
+    [
+        lambda: LinearIndex(metric="cosine"),
+        lambda: LinearIndex(metric="euclidean", storage="int8"),
+        lambda: KDTreeIndex(),
+        lambda: LSHIndex(num_planes=4),
+        lambda: HNSWIndex(m=8, ef_construction=32),
+        lambda: IVFIndex(nlist=4, nprobe=4),
+        lambda: IVFPQIndex(nlist=4, nprobe=4, m=4),
+        lambda: BinaryIndex(),
+        lambda: ShardedIndex([HNSWIndex(m=8) for _ in range(3)]),
+    ],
+)
+def test_incremental_add_remove_update(make_index):
+    vectors = _random_vectors(120, 8)
+    ids = [f"c{i}" for i in range(len(vectors))]
+    index = make_index()
+    index.add(ids[:80], vectors[:80])
+    index.add(ids[80:], vectors[80:])
+    assert index.size() == 120
+
+    # Every stored vector is its own nearest neighbor
+    for i in (0, 79, 80, 119):
+        assert index.query(vectors[i], 1)[0][0] == ids[i]
+
+    removed = ids[::3]
+    index.remove(removed + ["missing"])
+    assert index.size() == 120 - len(removed)
+    for query in _random_vectors(5, 8, seed=8):
+        assert not set(removed) & {cid for cid, _ in index.query(query, 120)}
+
+    updated = [ids[1], ids[2], ids[4]]
+    moved = [vectors[i][::-1] for i in (1, 2, 4)]
+    index.update(updated, moved)
+    assert index.size() == 120 - len(removed)
+    for cid, vector in zip(updated, moved):
+        assert index.query(vector, 1)[0][0] == cid
+
+    with pytest.raises(ValueError):
+        index.add(["bad"], [[1.0, 2.0]])
+
+
+def test_hnsw_remove_leaves_compaction_to_the_owner():
+    vectors = _random_vectors(40, 8)
+    ids = [f"c{i}" for i in range(len(vectors))]
+    index = HNSWIndex(m=8)
+    index.build(vectors, ids)
+    index.remove(ids[:10])
+    assert not index.needs_compaction()
+    index.remove(ids[10:12])
+
+    # Past COMPACT_THRESHOLD the graph only asks to be rebuilt
+    assert index.needs_compaction()
+    assert len(index._ids) == 40 and index.size() == 28
+    assert {cid for cid, _ in index.query(vectors[20], 40)} == set(ids[12:])
+    sharded = ShardedIndex([HNSWIndex(m=8), HNSWIndex(m=8)])
+    sharded.build(vectors, ids)
+    sharded.remove(ids[:20])
+    assert sharded.needs_compaction()
+
+
+def test_ivf_single_row_inserts_grow_lists_geometrically():
+    vectors = _random_vectors(140, 8)
+    ids = [f"c{i}" for i in range(len(vectors))]
+    index = IVFIndex(metric="euclidean", nlist=1)
+    index.build(vectors[:40], ids[:40])
+    grown = set()
+    for cid, vector in zip(ids[40:], vectors[40:]):
+        index.add([cid], [vector])
+        grown.add(len(index._list_vectors[0]))
+    index.remove(ids[::2])
+
+    # 40 rows doubled to 160 in two reallocations, not one per insert
+    assert grown == {80, 160}
+    assert index._list_sizes == [70]
+    exact = LinearIndex(metric="euclidean")
+    exact.build(vectors[1::2], ids[1::2])
+    for query in _random_vectors(3, 8, seed=14):
+        found, expected = index.query(query, 5), exact.query(query, 5)
+        assert [cid for cid, _ in found] == [cid for cid, _ in expected]
+        assert [s for _, s in found] == pytest.approx([s for _, s in expected])
+
+
+def test_incremental_changes_match_fresh_build():
+    vectors = _random_vectors(200, 8)
+    ids = [f"c{i}" for i in range(len(vectors))]
+    live = {cid: vec for cid, vec in zip(ids, vectors) if int(cid[1:]) % 4}
+
+    for make_index in (lambda: LinearIndex(metric="euclidean"), KDTreeIndex):
+        index = make_index()
+        index.build(vectors[:100], ids[:100])
+        index.add(ids[100:], vectors[100:])
+        index.remove([cid for cid in ids if int(cid[1:]) % 4 == 0])
+
+        fresh = make_index()
+        fresh.build(list(live.values()), list(live))
+        for query in _random_vectors(5, 8, seed=9):
+            assert index.query(query, 10) == pytest.approx(fresh.query(query, 10))
+
+    # The KD-Tree leaves rebuilding to the owner, like HNSW
+    assert index.needs_compaction() and not fresh.needs_compaction()
+
+
+@pytest.mark.parametrize("metric", ["cosine", "euclidean"])
+def test_sharded_index_merges_shard_results_like_one_index(metric):
+    vectors = _random_vectors(300, 8)
+    ids = [f"c{i}" for i in range(len(vectors))]
+    whole = LinearIndex(metric=metric)
+    whole.build(vectors, ids)
+    sharded = ShardedIndex([LinearIndex(metric=metric) for _ in range(4)])
+    sharded.build(vectors, ids)
+
+    assert sharded.size() == 300
+    assert all(0 < shard.size() < 300 for shard in sharded._shards)
+    assert sharded.kind() == "linear"
+    assert sharded.metric() == metric
+    assert sharded.params()["shards"] == 4
+
+    def assert_same(results, expected):
+        assert [cid for cid, _ in results] == [cid for cid, _ in expected]
+        assert [s for _, s in results] == pytest.approx([s for _, s in expected])
+
+    queries = _random_vectors(5, 8, seed=11)
+    allowed = set(ids[::5])
+    for query, batched in zip(queries, sharded.query_batch(queries, 10)):
+        expected = whole.query(query, 10)
+        assert_same(sharded.query(query, 10), expected)
+        assert_same(batched, whole.query_batch([query], 10)[0])
+        assert_same(
+            sharded.query(query, 10, allowed=allowed),
+            whole.query(query, 10, allowed=allowed),
+        )
+        threshold = expected[4][1]
+        assert_same(
+            sharded.range_query(query, threshold, 100),
+            whole.range_query(query, threshold, 100),
+        )
+
+    with pytest.raises(ValueError):
+        ShardedIndex([LinearIndex()])
+
+
+@pytest.mark.parametrize(
+    "make_index",
+    [
+        lambda: LinearIndex(metric="euclidean", storage="int8", rerank=5),
+        lambda: KDTreeIndex(num_trees=3, max_checks=50),
+        lambda: LSHIndex(),
+        lambda: HNSWIndex(m=8),
+        lambda: IVFIndex(nlist=4),
+        lambda: IVFPQIndex(nlist=4, m=4),
+        lambda: BinaryIndex(rotation="itq"),
+        lambda: ShardedIndex([KDTreeIndex() for _ in range(3)]),
+    ],
+)
+def test_serialized_index_restores_identical_state(make_index):
+    vectors = _random_vectors(300, 8)
+    ids = [f"c{i}" for i in range(len(vectors))]
+    index = make_index()
+    index.build(vectors[:250], ids[:250])
+    # Leave tombstones and unpacked inserts behind
+    index.add(ids[250:], vectors[250:])
+    index.remove(ids[::7])
+
+    restored = make_index()
+    restored.deserialize(index.serialize())
+    assert restored.size() == index.size()
+    assert sorted(restored.ids()) == sorted(set(ids) - set(ids[::7]))
+    queries = _random_vectors(5, 8, seed=12)
+    assert restored.query_batch(queries, 10) == index.query_batch(queries, 10)
+
+    # Later changes land the same way, e.g. HNSW levels from the saved RNG
+    for target in (index, restored):
+        target.add([f"n{i}" for i in range(40)], _random_vectors(40, 8, seed=13))
+        target.remove(ids[1::5])
+    assert restored.query_batch(queries, 10) == index.query_batch(queries, 10)
+
+
+def test_deserialize_rejects_corrupt_or_mismatched_data(monkeypatch):
+    index = HNSWIndex(m=8)
+    index.build(_random_vectors(50, 4), [f"c{i}" for i in range(50)])
+    payload = index.serialize()
+
+    corrupt = bytearray(payload)
+    corrupt[len(corrupt) // 2] ^= 0xFF
+    for bad in (payload[:-1], bytes(corrupt), b"not an index"):
+        with pytest.raises(ValueError):
+            HNSWIndex(m=8).deserialize(bad)
+
+    for other in (HNSWIndex(m=16), HNSWIndex(metric="euclidean", m=8), IVFIndex()):
+        with pytest.raises(ValueError, match="does not match"):
+            other.deserialize(payload)
+
+    monkeypatch.setattr(
+        serialization, "FORMAT_VERSION", serialization.FORMAT_VERSION + 1
+    )
+    newer = index.serialize()
+    monkeypatch.undo()
+    with pytest.raises(ValueError, match="format version"):
+        HNSWIndex(m=8).deserialize(newer)
+
+
+def test_lsh_probes_raise_recall():
+    vectors = _random_vectors(1000, 32)
+    ids = [f"c{i}" for i in range(len(vectors))]
+    index = LSHIndex(num_planes=10, num_tables=2, probes=0)
+    index.build(vectors, ids)
+    queries = _random_vectors(20, 32, seed=12)
+
+    recalls = []
+    for probes in (0, 8, 64):
+        hits = 0
+        for query in queries:
+            expected = _brute_force(vectors, ids, query, 10, "cosine")
+            got = index.query(query, 10, probes=probes)
+            hits += len({cid for cid, _ in expected} & {cid for cid, _ in got})
+            # Candidates are scored exactly
+            scores = dict(expected)
+            for cid, score in got:
+                if cid in scores:
+                    assert score == pytest.approx(scores[cid], abs=1e-5)
+        recalls.append(hits / 200)
+    assert recalls[0] < recalls[1] < recalls[2]
+
+    # Probing every bucket of every table visits the whole library
+    got = index.query(queries[0], 10, probes=2 * 2**10)
+    expected = _brute_force(vectors, ids, queries[0], 10, "cosine")
+    assert [cid for cid, _ in got] == [cid for cid, _ in expected]
+    with pytest.raises(ValueError):
+        LSHIndex(probes=-1)
+
+
+def test_lsh_buckets_hold_each_row_once_across_changes():
+    vectors = _random_vectors(300, 16)
+    ids = [f"c{i}" for i in range(len(vectors))]
+    index = LSHIndex(num_planes=4, num_tables=3, probes=3 * 2**4)
+    index.build(vectors[:200], ids[:200])
+    for rows in index._bucket_rows:
+        assert rows.dtype.name == "int32"
+        assert sorted(rows.tolist()) == list(range(200))
+
+    # Changes stay pending; past REPACK_THRESHOLD the index only asks to be rebuilt
+    index.add(ids[200:210], vectors[200:210])
+    index.remove(ids[:5])
+    assert not index.needs_compaction()
+    index.add(ids[210:], vectors[210:])
+    index.remove(ids[5:40])
+    assert index.needs_compaction()
+    assert index._packed_rows == 200 and index.size() == 260
+
+    live_vectors, live_ids = vectors[40:], ids[40:]
+    for query in _random_vectors(3, 16, seed=5):
+        got = index.query(query, 300)
+        assert len(got) == len({cid for cid, _ in got}) == 260
+        expected = _brute_force(live_vectors, live_ids, query, 10, "cosine")
+        assert [cid for cid, _ in got[:10]] == [cid for cid, _ in expected]
+
+
+def test_parallel_builds_match_single_worker_builds(monkeypatch):
+    monkeypatch.setattr(parallel, "MIN_ROWS_PER_WORKER", 100)
+    vectors = _random_vectors(1200, 12)
+    ids = [f"c{i}" for i in range(len(vectors))]
+    queries = _random_vectors(5, 12, seed=9)
+
+    # A shard-and-merge KD-Tree holds every row once and searches exactly
+    serial, sharded = KDTreeIndex(workers=1), KDTreeIndex(workers=3)
+    serial.build(vectors, ids)
+    sharded.build(vectors, ids)
+    tree = sharded._trees[0]
+    assert sorted(tree.rows.tolist()) == list(range(len(vectors)))
+    leaves = np.flatnonzero(tree.split_dim < 0)
+    assert (tree.end[leaves] - tree.start[leaves]).sum() == len(vectors)
+    for query in queries:
+        assert sharded.query(query, 10) == serial.query(query, 10)
+    forest = KDTreeIndex(num_trees=2, workers=2)
+    forest.build(vectors, ids)
+    expected = _brute_force(vectors, ids, queries[0], 10, "euclidean")
+    assert [cid for cid, _ in forest.query(queries[0], 10)] == [
+        cid for cid, _ in expected
+    ]
+
+    # Thread-parallel builds produce the same structures as serial ones
+    serial, threaded = LSHIndex(workers=1), LSHIndex(workers=3)
+    serial.build(vectors, ids)
+    threaded.build(vectors, ids)
+    assert np.array_equal(threaded._row_signatures, serial._row_signatures)
+    for a, b in zip(threaded._bucket_rows, serial._bucket_rows):
+        assert np.array_equal(a, b)
+    serial, threaded = IVFPQIndex(metric="euclidean"), IVFPQIndex(
+        metric="euclidean", workers=3
+    )
+    serial.build(vectors, ids)
+    threaded.build(vectors, ids)
+    assert np.array_equal(threaded._centroids, serial._centroids)
+    assert np.array_equal(threaded._codebooks, serial._codebooks)
+    with pytest.raises(ValueError):
+        IVFIndex(workers=0)
+
+
+def test_benchmark_suite_is_reproducible_and_flags_regressions():
+    first = clustered_dataset(200, 8, 4, 10, seed=3)
+    second = clustered_dataset(200, 8, 4, 10, seed=3)
+    assert all(np.array_equal(a, b) for a, b in zip(first, second))
+
+    report = run_suite(300, 8, 4, 20, 5, algorithms=["linear", "kdtree"])
+    pairs = [(r["algorithm"], r["metric"]) for r in report["results"]]
+    assert pairs == [
+        ("linear", "cosine"),
+        ("linear", "euclidean"),
+        ("linear", "inner_product"),
+        ("kdtree", "euclidean"),
+    ]
+    for row in report["results"]:
+        assert row["recall"] == 1.0 and row["qps"] > 0
+        assert row["p50_ms"] <= row["p95_ms"] <= row["p99_ms"]
+    assert "kdtree" in format_table(report)
+    assert compare(report, report) == []
+
+    baseline = {**report, "results": [dict(r) for r in report["results"]]}
+    baseline["results"][0]["recall"] = 1.5
+    baseline["results"][1]["p50_ms"] = report["results"][1]["p50_ms"] / 10
+    regressions = compare(report, baseline, latency_factor=2.0)
+    assert len(regressions) == 2
+    assert regressions[0].startswith("linear/cosine: recall")
+    assert regressions[1].startswith("linear/euclidean: p50_ms")
+    assert compare(report, baseline, latency_factor=0) == regressions[:1]
@@ -5,19 +5,46 @@ from app.vector_index.base import (
     cosine_similarity,
     dot,
     euclidean_distance,
+    filter_prefers_scan,
     norm,
+    normalize_rows,
+    past_deadline,
+    require_ints,
+    reserve_rows,
+    scores_from_dots,
+    similarity_scores,
+    top_k_indices,
 )
+from app.vector_index.binary import BinaryIndex
+from app.vector_index.hnsw import HNSWIndex
+from app.vector_index.ivf import IVFIndex
+from app.vector_index.ivfpq import IVFPQIndex
 from app.vector_index.kdtree import KDTreeIndex
 from app.vector_index.linear import LinearIndex
 from app.vector_index.lsh import LSHIndex
+from app.vector_index.sharded import ShardedIndex
+from app.vector_index.store import VectorStore
 
 __all__ = [
     "VectorIndex",
     "LinearIndex",
     "KDTreeIndex",
     "LSHIndex",
+    "HNSWIndex",
+    "IVFIndex",
+    "IVFPQIndex",
+    "BinaryIndex",
+    "ShardedIndex",
+    "VectorStore",
     "cosine_similarity",
     "euclidean_distance",
+    "filter_prefers_scan",
     "dot",
     "norm",
+    "normalize_rows",
+    "past_deadline",
+    "reserve_rows",
+    "scores_from_dots",
+    "similarity_scores",
+    "top_k_indices",
 ]
@@ -1,7 +1,18 @@
 """Base classes and utilities for vector indices."""
 
 import math
+import time
 from abc import ABC, abstractmethod
+from typing import AbstractSet, Any, Callable, Optional
+
+import numpy as np
+
+from app.core.constants import DistanceMetric
+from app.vector_index.serialization import decode_state, encode_state
+
+# Neighbors fetched by the first round of a generic range query, doubled
+# each round while every result still clears the threshold
+RANGE_QUERY_INITIAL_K = 16
 
 
 def dot(a: list[float], b: list[float]) -> float:
@@ -34,19 +45,225 @@ def euclidean_distance(a: list[float], b: list[float]) -> float:
     return math.sqrt(sum((x - y) ** 2 for x, y in zip(a, b)))
 
 
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """Return positions of the k highest scores, best first.
+
+    Uses argpartition so only the selected k entries get sorted. Ties keep
+    their original order, matching a stable full sort.
+    """
+    if k >= scores.shape[0]:
+        return np.argsort(-scores, kind="stable")
+    selected = np.argpartition(-scores, k - 1)[:k]
+    selected.sort()
+    return selected[np.argsort(-scores[selected], kind="stable")]
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """Scale rows to unit length, leaving zero rows at zero.
+
+    Cosine indices store and query normalized vectors, so cosine
+    similarity becomes a plain dot product.
+    """
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+
+
+def similarity_scores(
+    queries: np.ndarray,
+    matrix: np.ndarray,
+    metric: str,
+    norms: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """Score every row of matrix against each query, higher is better.
+
+    Cosine scores are similarities in [-1, 1] (0.0 for zero vectors),
+    Euclidean scores are 1 / (1 + distance), the same values that
+    cosine_similarity and euclidean_distance give, and inner product
+    scores are the raw dot products. Pass precomputed row norms to skip
+    recomputing them.
+
+    Returns:
+        Array of shape (len(queries), len(matrix))
+    """
+    if norms is None and metric != DistanceMetric.INNER_PRODUCT.value:
+        norms = np.linalg.norm(matrix, axis=1).astype(np.float64)
+    dots = (queries @ matrix.T).astype(np.float64)
+    return scores_from_dots(dots, queries, norms, metric)
+
+
+def scores_from_dots(
+    dots: np.ndarray,
+    queries: np.ndarray,
+    norms: Optional[np.ndarray],
+    metric: str,
+) -> np.ndarray:
+    """Turn (queries x rows) dot products into similarity scores.
+
+    Split out of similarity_scores for callers that compute the dot
+    products themselves, e.g. from a compressed representation. ``norms``
+    are the row norms; pass None for cosine when both the rows and the
+    queries are already normalized, and for inner product, which needs
+    none.
+    """
+    if metric == DistanceMetric.INNER_PRODUCT.value:
+        return dots
+
+    if metric == DistanceMetric.COSINE.value and norms is None:
+        return np.clip(dots, -1.0, 1.0)
+
+    query_norms = np.linalg.norm(queries.astype(np.float64), axis=1)[:, None]
+    if metric == DistanceMetric.COSINE.value:
+        denom = norms * query_norms
+        scores = np.divide(dots, denom, out=np.zeros_like(dots), where=denom > 0)
+        return np.clip(scores, -1.0, 1.0)
+
+    # ||a - b||^2 = ||a||^2 + ||b||^2 - 2 a.b, clipped against rounding
+    sq_dist = norms**2 + query_norms**2 - 2.0 * dots
+    return 1.0 / (1.0 + np.sqrt(np.maximum(sq_dist, 0.0)))
+
+
+def reserve_rows(array: np.ndarray, used: int, extra: int) -> np.ndarray:
+    """Return an array with room for ``extra`` rows after the first ``used``.
+
+    Capacity doubles when it runs out, so appending one row at a time costs
+    amortized O(1) copies. Rows past ``used`` are uninitialized.
+    """
+    needed = used + extra
+    if needed <= len(array):
+        return array
+    grown = np.empty((max(needed, 2 * len(array)),) + array.shape[1:], array.dtype)
+    grown[:used] = array[:used]
+    return grown
+
+
+def require_ints(**params: Any) -> None:
+    """Raise ValueError unless every keyword value is an integer.
+
+    Request bodies carry parameters as JSON numbers, so a float such as
+    ``8.5`` would otherwise reach an integer-only computation.
+    """
+    for name, value in params.items():
+        if isinstance(value, bool) or not isinstance(value, (int, np.integer)):
+            raise ValueError(f"{name} must be an integer")
+
+
+def filter_prefers_scan(matches: int, total: int, width: int) -> bool:
+    """Whether scoring the allowed rows directly beats a filtered traversal.
+
+    A traversal that only keeps allowed rows visits about
+    ``width * total / matches`` rows before it has collected ``width`` of
+    them, while a direct scan scores exactly ``matches`` rows.
+    """
+    return matches * matches <= width * total
+
+
+def past_deadline(deadline: Optional[float]) -> bool:
+    """Whether a ``time.monotonic()`` deadline has passed; None never does."""
+    return deadline is not None and time.monotonic() >= deadline
+
+
 class VectorIndex(ABC):
     """Abstract base class for vector indices."""
 
+    # Called with the number of vectors inserted so far by builds that
+    # insert them one at a time, so long builds can report progress
+    progress_callback: Optional[Callable[[int], None]] = None
+
     @abstractmethod
     def build(self, vectors: list[list[float]], ids: list[str]) -> None:
         """Build the index from vectors and IDs."""
         ...
 
     @abstractmethod
-    def query(self, vector: list[float], k: int) -> list[tuple[str, float]]:
-        """Query the index for k nearest neighbors."""
+    def query(
+        self,
+        vector: list[float],
+        k: int,
+        allowed: Optional[AbstractSet[str]] = None,
+    ) -> list[tuple[str, float]]:
+        """Query the index for k nearest neighbors.
+
+        When ``allowed`` is given only those ids can be returned, and the
+        index keeps searching until it has k of them (or runs out).
+        """
+        ...
+
+    def add(self, ids: list[str], vectors: list[list[float]]) -> None:
+        """Insert vectors without rebuilding the index.
+
+        Ids already in the index are replaced. Adding to an empty index
+        builds it from the given vectors.
+        """
+        self._validate_inputs(vectors, ids)
+        if not ids:
+            return
+        if not self.size():
+            self.build(vectors, ids)
+            return
+        self.remove(ids)
+        self._append(ids, vectors)
+
+    @abstractmethod
+    def remove(self, ids: list[str]) -> None:
+        """Drop vectors from the index, ids not in the index are ignored."""
+        ...
+
+    def update(self, ids: list[str], vectors: list[list[float]]) -> None:
+        """Replace the vectors stored under the given ids."""
+        self.add(ids, vectors)
+
+    @abstractmethod
+    def size(self) -> int:
+        """Return the number of vectors in the index."""
         ...
 
+    @abstractmethod
+    def _append(self, ids: list[str], vectors: list[list[float]]) -> None:
+        """Insert vectors whose ids are not in the (non-empty) index yet."""
+        ...
+
+    def query_batch(
+        self,
+        vectors: list[list[float]],
+        k: int,
+        allowed: Optional[AbstractSet[str]] = None,
+        **search_params: Any,
+    ) -> list[list[tuple[str, float]]]:
+        """Query the index for k nearest neighbors of each vector.
+
+        ``search_params`` are the per-query knobs of the index, such as HNSW
+        ``ef``, and are passed on to every query. Subclasses override this
+        when they can share work across queries.
+        """
+        return [
+            self.query(vector, k, allowed=allowed, **search_params)
+            for vector in vectors
+        ]
+
+    def range_query(
+        self,
+        vector: list[float],
+        min_score: float,
+        limit: int,
+        allowed: Optional[AbstractSet[str]] = None,
+    ) -> list[tuple[str, float]]:
+        """Return up to ``limit`` neighbors scoring at least ``min_score``.
+
+        Results are ordered best first. This generic version repeats a
+        k-nearest query with a doubling k until the worst result falls
+        below the threshold; indices that can prune by the radius directly
+        override it.
+        """
+        if limit <= 0:
+            return []
+
+        k = min(limit, RANGE_QUERY_INITIAL_K)
+        while True:
+            results = self.query(vector, k, allowed=allowed)
+            if len(results) < k or results[-1][1] < min_score or k == limit:
+                return [(cid, score) for cid, score in results if score >= min_score]
+            k = min(2 * k, limit)
+
     @abstractmethod
     def metric(self) -> str:
         """Return the distance metric used."""
@@ -57,6 +274,88 @@ class VectorIndex(ABC):
         """Return the index algorithm name."""
         ...
 
+    def params(self) -> dict[str, Any]:
+        """Return the tunable build parameters of the index."""
+        return {}
+
+    def rerank_candidates(self) -> int:
+        """Return how many top candidates should be re-scored exactly.
+
+        Indices that score on a compressed representation return a positive
+        number so callers can re-rank with the full-precision vectors.
+        """
+        return 0
+
+    def needs_compaction(self) -> bool:
+        """Return whether changes have degraded the index enough to rebuild it.
+
+        Indices that only mark removed vectors dead, or park added ones
+        outside their main structure, return True once those hurt search,
+        and leave the rebuild to the caller so it can run off the write path.
+        """
+        return False
+
+    @abstractmethod
+    def ids(self) -> list[str]:
+        """Return the ids of the vectors in the index."""
+        ...
+
+    def serialize(self, metadata: Optional[dict[str, Any]] = None) -> bytes:
+        """Encode the built index as a versioned, checksummed binary blob.
+
+        deserialize restores it into a new index with the same kind,
+        metric and params, which skips the build. ``metadata`` (JSON
+        values) is stored alongside and handed back by deserialize.
+        """
+        descriptor = {
+            "kind": self.kind(),
+            "metric": self.metric(),
+            "params": self.params(),
+            "metadata": metadata or {},
+        }
+        return encode_state(descriptor, self._state())
+
+    def deserialize(self, payload: bytes) -> dict[str, Any]:
+        """Replace the index's contents with a blob from serialize.
+
+        Returns the metadata given to serialize. Raises ValueError if the
+        blob is corrupt, has another format version, or was written by an
+        index of another kind, metric or params.
+        """
+        descriptor, state = decode_state(payload)
+        metadata = descriptor.pop("metadata", {})
+        expected = {
+            "kind": self.kind(),
+            "metric": self.metric(),
+            "params": self.params(),
+        }
+        if descriptor != expected:
+            raise ValueError(
+                f"Serialized index {descriptor} does not match this index {expected}"
+            )
+        self._load_state(state)
+        return metadata
+
+    @abstractmethod
+    def _state(self) -> dict[str, Any]:
+        """Return the built state that serialize stores."""
+        ...
+
+    @abstractmethod
+    def _load_state(self, state: dict[str, Any]) -> None:
+        """Restore the built state returned by _state."""
+        ...
+
+    def _allowed_rows(
+        self, allowed: AbstractSet[str], positions: dict[str, int]
+    ) -> np.ndarray:
+        """Return the sorted rows of the allowed ids present in the index."""
+        rows = np.fromiter(
+            (positions[cid] for cid in allowed if cid in positions), dtype=np.int64
+        )
+        rows.sort()
+        return rows
+
     def _validate_inputs(self, vectors: list[list[float]], ids: list[str]) -> None:
         """Validate input vectors and IDs."""
         if len(vectors) != len(ids):
@@ -64,6 +363,11 @@ class VectorIndex(ABC):
         if vectors and any(len(vec) != len(vectors[0]) for vec in vectors):
             raise ValueError("All vectors must have the same dimensionality")
 
+    def _validate_dim(self, vectors: list[list[float]], dim: int) -> None:
+        """Validate that vectors match the dimensionality of the index."""
+        if any(len(vector) != dim for vector in vectors):
+            raise ValueError("Vector dimensionality mismatch")
+
     def _validate_query_dim(
         self, vector: list[float], vectors: list[list[float]]
     ) -> None:
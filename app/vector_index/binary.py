@@ -0,0 +1,244 @@
+"""Binary (sign-bit) quantized index with a Hamming-distance scan."""
+
+from __future__ import annotations
+
+import math
+from typing import AbstractSet, Any, Optional
+
+import numpy as np
+
+from app.core import settings
+from app.core.constants import DistanceMetric, IndexAlgorithm
+from app.vector_index import (
+    VectorIndex,
+    require_ints,
+    reserve_rows,
+    top_k_indices,
+)
+
+# Rotations applied before taking sign bits
+BINARY_ROTATIONS = ("none", "random", "itq")
+# Alternating optimization rounds for the learned (ITQ) rotation
+ITQ_ITERATIONS = 10
+# Rows used to learn the ITQ rotation, more rarely changes it
+ITQ_SAMPLE_SIZE = 10000
+# Rows scanned per block, bounds the (rows x words) XOR temporary
+SCAN_BLOCK_ROWS = 65536
+
+
+class BinaryIndex(VectorIndex):
+    """Cosine index that keeps one bit per dimension.
+
+    Vectors are mean-centered, optionally rotated, and reduced to the signs
+    of their coordinates, packed 64 to a ``uint64`` word. A query scans the
+    whole library with XOR and popcount, and the Hamming distance ``h`` is
+    reported as the angle estimate ``cos(pi * h / dim)``.
+
+    ``rotation`` picks how the sign bits are taken: ``none`` uses the raw
+    coordinates, ``random`` a random orthogonal rotation, and ``itq`` a
+    rotation learned with iterative quantization so the bits lose less of
+    the geometry. Scores are coarse, so the top ``rerank`` candidates
+    should be re-scored at full precision by the caller through
+    rerank_candidates. Added vectors reuse the build-time centering and
+    rotation.
+    """
+
+    def __init__(
+        self,
+        metric: str = "cosine",
+        rotation: Optional[str] = None,
+        rerank: Optional[int] = None,
+        seed: Optional[int] = None,
+    ) -> None:
+        self._metric = DistanceMetric(metric).value
+        if self._metric != DistanceMetric.COSINE.value:
+            raise ValueError("BinaryIndex only supports cosine similarity")
+        self._rotation = settings.binary_rotation if rotation is None else rotation
+        self._rerank = settings.binary_rerank if rerank is None else rerank
+        self._seed = settings.binary_seed if seed is None else seed
+        require_ints(rerank=self._rerank, seed=self._seed)
+        if self._rotation not in BINARY_ROTATIONS:
+            raise ValueError(f"rotation must be one of {', '.join(BINARY_ROTATIONS)}")
+        if self._rerank < 0:
+            raise ValueError("rerank must not be negative")
+        self._reset(0)
+
+    def _reset(self, dim: int) -> None:
+        self._dim = dim
+        self._mean = np.zeros(dim, dtype=np.float32)
+        self._rotation_matrix: Optional[np.ndarray] = None
+        self._buffer = np.empty((0, math.ceil(dim / 64)), dtype=np.uint64)
+        self._ids: list[str] = []
+        self._positions: dict[str, int] = {}
+
+    def build(self, vectors: list[list[float]], ids: list[str]) -> None:
+        """Learn the centering and rotation, then pack every vector's bits."""
+        self._validate_inputs(vectors, ids)
+
+        if not vectors:
+            self._reset(0)
+            return
+
+        data = np.asarray(vectors, dtype=np.float32)
+        self._reset(data.shape[1])
+        data = self._normalize(data)
+        self._mean = data.mean(axis=0)
+        centered = data - self._mean
+        self._rotation_matrix = self._train_rotation(centered)
+        self._buffer = self._encode(centered)
+        self._ids = list(ids)
+        self._positions = {cid: i for i, cid in enumerate(self._ids)}
+
+    def remove(self, ids: list[str]) -> None:
+        """Drop codes by moving the last code into each freed slot."""
+        for cid in ids:
+            pos = self._positions.pop(cid, None)
+            if pos is None:
+                continue
+            last = len(self._ids) - 1
+            if pos != last:
+                moved = self._ids[last]
+                self._buffer[pos] = self._buffer[last]
+                self._ids[pos] = moved
+                self._positions[moved] = pos
+            self._ids.pop()
+
+    def size(self) -> int:
+        return len(self._ids)
+
+    def _append(self, ids: list[str], vectors: list[list[float]]) -> None:
+        self._validate_dim(vectors, self._dim)
+        data = self._normalize(np.asarray(vectors, dtype=np.float32))
+        codes = self._encode(data - self._mean)
+        start = len(self._ids)
+        self._buffer = reserve_rows(self._buffer, start, len(ids))
+        self._buffer[start : start + len(ids)] = codes
+        for offset, cid in enumerate(ids):
+            self._positions[cid] = start + offset
+        self._ids.extend(ids)
+
+    @property
+    def _codes(self) -> np.ndarray:
+        """The packed codes currently in use."""
+        return self._buffer[: len(self._ids)]
+
+    def query(
+        self,
+        vector: list[float],
+        k: int,
+        allowed: Optional[AbstractSet[str]] = None,
+    ) -> list[tuple[str, float]]:
+        return self.query_batch([vector], k, allowed)[0]
+
+    def query_batch(
+        self,
+        vectors: list[list[float]],
+        k: int,
+        allowed: Optional[AbstractSet[str]] = None,
+    ) -> list[list[tuple[str, float]]]:
+        """Rank the library (or its allowed rows) by Hamming distance."""
+        if not self._ids or k <= 0 or not vectors:
+            return [[] for _ in vectors]
+
+        if any(len(vector) != self._dim for vector in vectors):
+            raise ValueError("Query vector dimensionality mismatch")
+
+        queries = self._normalize(np.asarray(vectors, dtype=np.float32))
+        query_codes = self._encode(queries - self._mean)
+        codes, ids = self._codes, self._ids
+        if allowed is not None:
+            rows = self._allowed_rows(allowed, self._positions)
+            codes, ids = codes[rows], [ids[row] for row in rows.tolist()]
+        results = []
+        for code in query_codes:
+            distances = self._hamming(code, codes)
+            top = top_k_indices(-distances, k)
+            results.append([(ids[i], self._similarity(int(distances[i]))) for i in top])
+        return results
+
+    def metric(self) -> str:
+        """Return the distance metric."""
+        return self._metric
+
+    def kind(self) -> str:
+        """Return the index type."""
+        return IndexAlgorithm.BINARY.value
+
+    def params(self) -> dict[str, Any]:
+        """Return the quantization parameters."""
+        return {"rotation": self._rotation, "rerank": self._rerank, "seed": self._seed}
+
+    def rerank_candidates(self) -> int:
+        """Return how many Hamming candidates should be re-scored exactly."""
+        return self._rerank
+
+    def ids(self) -> list[str]:
+        return list(self._ids)
+
+    def _state(self) -> dict[str, Any]:
+        return {
+            "dim": self._dim,
+            "mean": self._mean,
+            "rotation_matrix": self._rotation_matrix,
+            "codes": self._codes,
+            "ids": self._ids,
+        }
+
+    def _load_state(self, state: dict[str, Any]) -> None:
+        self._reset(state["dim"])
+        self._mean = state["mean"]
+        self._rotation_matrix = state["rotation_matrix"]
+        self._buffer = state["codes"]
+        self._ids = state["ids"]
+        self._positions = {cid: i for i, cid in enumerate(self._ids)}
+
+    def _normalize(self, vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+
+    def _train_rotation(self, centered: np.ndarray) -> Optional[np.ndarray]:
+        """Return the (dim, dim) rotation applied before taking signs."""
+        if self._rotation == "none":
+            return None
+
+        rng = np.random.default_rng(self._seed)
+        # QR of a Gaussian matrix gives a uniformly random orthogonal matrix
+        rotation, _ = np.linalg.qr(rng.standard_normal((self._dim, self._dim)))
+        if self._rotation == "random":
+            return rotation.astype(np.float32)
+
+        # ITQ: alternate between the binary codes B = sign(XR) and the
+        # orthogonal R minimizing ||B - XR|| (an orthogonal Procrustes step)
+        sample = centered
+        if len(sample) > ITQ_SAMPLE_SIZE:
+            sample = sample[rng.choice(len(sample), ITQ_SAMPLE_SIZE, replace=False)]
+        sample = sample.astype(np.float64)
+        for _ in range(ITQ_ITERATIONS):
+            signs = np.where(sample @ rotation >= 0, 1.0, -1.0)
+            u, _, vt = np.linalg.svd(sample.T @ signs)
+            rotation = u @ vt
+        return rotation.astype(np.float32)
+
+    def _encode(self, centered: np.ndarray) -> np.ndarray:
+        """Pack the sign bits of (rotated) rows into uint64 words."""
+        if self._rotation_matrix is not None:
+            centered = centered @ self._rotation_matrix
+        bits = np.packbits(centered >= 0, axis=1, bitorder="little")
+        words = self._codes.shape[1]
+        padded = np.zeros((len(bits), words * 8), dtype=np.uint8)
+        padded[:, : bits.shape[1]] = bits
+        return padded.view(np.uint64)
+
+    def _hamming(self, code: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        """Hamming distance from one packed code to each of codes."""
+        distances = np.empty(len(codes), dtype=np.int64)
+        for start in range(0, len(codes), SCAN_BLOCK_ROWS):
+            block = codes[start : start + SCAN_BLOCK_ROWS]
+            distances[start : start + len(block)] = np.bitwise_count(block ^ code).sum(
+                axis=1
+            )
+        return distances
+
+    def _similarity(self, distance: int) -> float:
+        """Estimate cosine from the fraction of differing bits."""
+        return math.cos(math.pi * distance / self._dim)
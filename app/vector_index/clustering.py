@@ -0,0 +1,90 @@
+"""K-means clustering used by the quantizing indices."""
+
+from __future__ import annotations
+
+from concurrent.futures import Executor
+from typing import Optional
+
+import numpy as np
+
+from app.vector_index.parallel import pool_map
+
+# Training on more points than this per centroid rarely moves the centroids
+MAX_POINTS_PER_CENTROID = 256
+# Rows scored per block when assigning, bounds the (rows x k) distance matrix
+ASSIGN_BLOCK_SIZE = 16384
+
+
+def nearest_centroids(
+    data: np.ndarray,
+    centroids: np.ndarray,
+    block_size: int = ASSIGN_BLOCK_SIZE,
+    pool: Optional[Executor] = None,
+) -> np.ndarray:
+    """Return the index of the closest centroid (squared L2) for every row.
+
+    Blocks are scored on ``pool``'s threads when given.
+    """
+    centroid_sq = np.einsum("ij,ij->i", centroids, centroids)
+    assignments = np.empty(data.shape[0], dtype=np.int64)
+
+    def assign(start: int) -> None:
+        block = data[start : start + block_size]
+        # ||x||^2 is constant per row and does not change the argmin
+        dists = centroid_sq[None, :] - 2.0 * (block @ centroids.T)
+        assignments[start : start + block_size] = np.argmin(dists, axis=1)
+
+    pool_map(pool, assign, range(0, data.shape[0], block_size))
+    return assignments
+
+
+def kmeans(
+    data: np.ndarray,
+    k: int,
+    n_iter: int = 20,
+    seed: int = 0,
+    spherical: bool = False,
+    pool: Optional[Executor] = None,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Cluster rows of data into k centroids with Lloyd's algorithm.
+
+    Centroids are trained on a random sample of at most
+    MAX_POINTS_PER_CENTROID * k rows, then every row is assigned. With
+    ``spherical`` the centroids are renormalized after each step, which
+    suits unit-length data compared by cosine. Assignment steps run on
+    ``pool``'s threads when given.
+
+    Returns:
+        (centroids, assignments) with shapes (k, dim) and (n,)
+    """
+    n = data.shape[0]
+    if not 1 <= k <= n:
+        raise ValueError(f"Cannot form {k} clusters from {n} vectors")
+
+    rng = np.random.default_rng(seed)
+    if n > MAX_POINTS_PER_CENTROID * k:
+        sample = data[rng.choice(n, MAX_POINTS_PER_CENTROID * k, replace=False)]
+    else:
+        sample = data
+
+    centroids = sample[rng.choice(sample.shape[0], k, replace=False)].astype(np.float32)
+    for _ in range(n_iter):
+        assignments = nearest_centroids(sample, centroids, pool=pool)
+        counts = np.bincount(assignments, minlength=k)
+        filled = counts > 0
+
+        # Sum each cluster's rows as contiguous segments of the sorted sample
+        order = np.argsort(assignments, kind="stable")
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        sums = np.add.reduceat(sample[order], starts[filled], axis=0, dtype=np.float64)
+        centroids[filled] = (sums / counts[filled, None]).astype(np.float32)
+        # Reseed empty clusters from random points so k stays meaningful
+        empty = np.flatnonzero(~filled)
+        if empty.size:
+            centroids[empty] = sample[rng.choice(sample.shape[0], empty.size)]
+
+        if spherical:
+            norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+            np.divide(centroids, norms, out=centroids, where=norms > 0)
+
+    return centroids, nearest_centroids(data, centroids, pool=pool)
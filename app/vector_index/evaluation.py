@@ -0,0 +1,105 @@
+"""Recall, latency, build time and memory measurements for index configurations."""
+
+from __future__ import annotations
+
+import time
+from typing import Any, Callable, Optional
+
+import numpy as np
+
+from app.core import settings
+from app.vector_index import VectorIndex, VectorStore, similarity_scores, top_k_indices
+
+
+def exact_neighbors(
+    vectors: np.ndarray, queries: np.ndarray, k: int, metric: str
+) -> list[set[int]]:
+    """Return the rows of each query's true k nearest neighbors."""
+    scores = similarity_scores(queries, vectors, metric)
+    return [set(top_k_indices(row, k).tolist()) for row in scores]
+
+
+def memory_bytes(obj: Any, _seen: Optional[set[int]] = None) -> int:
+    """Approximate the bytes an index holds in arrays and containers.
+
+    numpy buffers count in full, and lists, tuples, sets and dicts count one
+    pointer per slot (two per dict entry) plus what they hold. Strings and
+    numbers are not counted, since ids are shared with the repository.
+    """
+    seen = set() if _seen is None else _seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    if isinstance(obj, (list, tuple, set, frozenset)):
+        return 8 * len(obj) + sum(memory_bytes(item, seen) for item in obj)
+    if isinstance(obj, dict):
+        return 16 * len(obj) + sum(memory_bytes(value, seen) for value in obj.values())
+    if obj is None or isinstance(obj, (str, bytes, int, float, bool)):
+        return 0
+    try:
+        attributes = vars(obj)
+    except TypeError:
+        return 0
+    return sum(memory_bytes(value, seen) for value in attributes.values())
+
+
+def evaluate_index(
+    make_index: Callable[[], VectorIndex],
+    vectors: np.ndarray,
+    queries: np.ndarray,
+    truth: list[set[int]],
+    k: int,
+    rerank_factor: int = 1,
+) -> dict[str, Any]:
+    """Build one index configuration on vectors and measure it.
+
+    Indices that score on a compressed representation are measured the way
+    they are served: ``max(rerank, rerank_factor * k)`` candidates are
+    re-scored against the full-precision vectors. Those only count towards
+    the index's memory with RERANK_STORE, which keeps a copy of them;
+    otherwise they are the library's embeddings, which every index shares.
+
+    Returns:
+        recall (recall@k against ``truth``), p50_ms, p95_ms and p99_ms per
+        query, qps, build_ms and memory_bytes
+    """
+    ids = [str(row) for row in range(len(vectors))]
+    index = make_index()
+    started = time.perf_counter()
+    index.build(vectors.tolist(), ids)
+    build_ms = (time.perf_counter() - started) * 1000.0
+
+    store = None
+    fetch_k = k
+    if index.rerank_candidates():
+        store = VectorStore()
+        store.build(vectors.tolist(), ids)
+        fetch_k = max(k, index.rerank_candidates(), rerank_factor * k)
+
+    latencies = []
+    hits = 0
+    for query, expected in zip(queries.tolist(), truth):
+        started = time.perf_counter()
+        results = index.query(query, fetch_k)
+        if store is not None:
+            candidates = [[cid for cid, _ in results]]
+            results = store.rerank([query], candidates, index.metric())[0]
+        latencies.append((time.perf_counter() - started) * 1000.0)
+        hits += len({int(cid) for cid, _ in results[:k]} & expected)
+
+    memory = memory_bytes(index)
+    if store is not None and settings.rerank_store:
+        memory += memory_bytes(store)
+    total_ms = sum(latencies)
+    return {
+        "recall": hits / (k * len(truth)) if truth else 0.0,
+        "p50_ms": float(np.percentile(latencies, 50)) if latencies else 0.0,
+        "p95_ms": float(np.percentile(latencies, 95)) if latencies else 0.0,
+        "p99_ms": float(np.percentile(latencies, 99)) if latencies else 0.0,
+        "qps": len(latencies) * 1000.0 / total_ms if total_ms else 0.0,
+        "build_ms": build_ms,
+        "memory_bytes": memory,
+    }
@@ -0,0 +1,423 @@
+"""HNSW (Hierarchical Navigable Small World) graph index implementation."""
+
+from __future__ import annotations
+
+import math
+from heapq import heapify, heappop, heappush
+from typing import AbstractSet, Any, Optional
+
+import numpy as np
+
+from app.core import settings
+from app.core.constants import DistanceMetric, IndexAlgorithm
+from app.vector_index import (
+    VectorIndex,
+    filter_prefers_scan,
+    normalize_rows,
+    past_deadline,
+    require_ints,
+    reserve_rows,
+    top_k_indices,
+)
+
+# Ask for a rebuild once this fraction of the graph's nodes are removed
+COMPACT_THRESHOLD = 0.25
+# Inserts between two progress reports of a build
+BUILD_PROGRESS_INTERVAL = 1000
+
+
+class HNSWIndex(VectorIndex):
+    """HNSW graph index for cosine, Euclidean and inner product search.
+
+    Every vector is a node on layer 0 and, with exponentially decaying
+    probability, on the layers above it. Queries descend greedily through
+    the sparse upper layers and then run a beam search of width ``ef`` on
+    layer 0. Cosine vectors are stored normalized so distances are
+    ``1 - dot``, inner product distances are ``-dot``, and Euclidean
+    distances are squared L2 from cached squared norms.
+
+    Added vectors are linked in exactly like during the build. Removed
+    vectors stay in the graph as tombstones that searches traverse but
+    never return. Once COMPACT_THRESHOLD of the nodes are removed,
+    needs_compaction asks the owner to rebuild the graph from the live
+    ones; removing never rebuilds by itself.
+
+    Filtered queries walk the whole graph but only admit allowed nodes to
+    the beam, so the search keeps going until it holds ``ef`` of them.
+    Filters selective enough that the walk would visit more nodes than
+    they match are answered by scoring the allowed nodes directly.
+    """
+
+    def __init__(
+        self,
+        metric: str = "cosine",
+        m: Optional[int] = None,
+        ef_construction: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        seed: Optional[int] = None,
+    ) -> None:
+        self._metric = DistanceMetric(metric).value
+        self._cosine = self._metric == DistanceMetric.COSINE.value
+        self._inner = self._metric == DistanceMetric.INNER_PRODUCT.value
+        self._m = settings.hnsw_m if m is None else m
+        self._ef_construction = (
+            settings.hnsw_ef_construction
+            if ef_construction is None
+            else ef_construction
+        )
+        self._ef_search = settings.hnsw_ef_search if ef_search is None else ef_search
+        self._seed = settings.hnsw_seed if seed is None else seed
+        require_ints(
+            m=self._m,
+            ef_construction=self._ef_construction,
+            ef_search=self._ef_search,
+            seed=self._seed,
+        )
+        if self._m < 2:
+            raise ValueError("m must be at least 2")
+        if self._ef_construction < 1 or self._ef_search < 1:
+            raise ValueError("ef_construction and ef_search must be positive")
+        self._m0 = 2 * self._m
+        self._level_mult = 1.0 / math.log(max(self._m, 2))
+        self._reset(0)
+
+    def _reset(self, dim: int) -> None:
+        self._dim = dim
+        self._data = np.empty((0, dim), dtype=np.float32)
+        self._sq_norms = np.empty(0, dtype=np.float32)
+        self._ids: list[str] = []
+        self._node_of: dict[str, int] = {}
+        self._deleted: set[int] = set()
+        # _links[node][layer] holds the node's neighbors on that layer
+        self._links: list[list[list[int]]] = []
+        self._entry_point = -1
+        self._max_level = -1
+        self._rng = np.random.default_rng(self._seed)
+
+    def build(self, vectors: list[list[float]], ids: list[str]) -> None:
+        """Build the graph by inserting vectors one at a time."""
+        self._validate_inputs(vectors, ids)
+
+        if not vectors:
+            self._reset(0)
+            return
+
+        self._reset(len(vectors[0]))
+        self._data = self._prepare(np.asarray(vectors, dtype=np.float32))
+        self._sq_norms = np.einsum("ij,ij->i", self._data, self._data)
+        self._ids = list(ids)
+        self._node_of = {cid: node for node, cid in enumerate(self._ids)}
+        for node in range(len(self._ids)):
+            self._insert(node)
+            if self.progress_callback and (node + 1) % BUILD_PROGRESS_INTERVAL == 0:
+                self.progress_callback(node + 1)
+
+    def remove(self, ids: list[str]) -> None:
+        """Tombstone nodes; see needs_compaction."""
+        for cid in ids:
+            node = self._node_of.pop(cid, None)
+            if node is not None:
+                self._deleted.add(node)
+
+    def needs_compaction(self) -> bool:
+        """Return whether more than COMPACT_THRESHOLD of the nodes are dead."""
+        return len(self._deleted) > COMPACT_THRESHOLD * len(self._ids)
+
+    def size(self) -> int:
+        return len(self._node_of)
+
+    def _append(self, ids: list[str], vectors: list[list[float]]) -> None:
+        self._validate_dim(vectors, self._dim)
+        rows = self._prepare(np.asarray(vectors, dtype=np.float32))
+        start = len(self._ids)
+        self._data = reserve_rows(self._data, start, len(ids))
+        self._sq_norms = reserve_rows(self._sq_norms, start, len(ids))
+        self._data[start : start + len(ids)] = rows
+        self._sq_norms[start : start + len(ids)] = np.einsum("ij,ij->i", rows, rows)
+        for offset, cid in enumerate(ids):
+            node = start + offset
+            self._ids.append(cid)
+            self._node_of[cid] = node
+            self._insert(node)
+
+    def query(
+        self,
+        vector: list[float],
+        k: int,
+        ef: Optional[int] = None,
+        allowed: Optional[AbstractSet[str]] = None,
+        deadline: Optional[float] = None,
+    ) -> list[tuple[str, float]]:
+        """Query for k nearest neighbors.
+
+        Args:
+            vector: Query vector
+            k: Number of neighbors to return
+            ef: Beam width on layer 0, defaults to the index's ef_search.
+                Larger values trade latency for recall.
+            allowed: Ids that may be returned
+            deadline: ``time.monotonic()`` value at which the layer 0 beam
+                search stops and returns the best nodes found so far
+        """
+        if k <= 0 or not self._node_of:
+            return []
+
+        if len(vector) != self._dim:
+            raise ValueError("Query vector dimensionality mismatch")
+
+        query = self._prepare(np.asarray(vector, dtype=np.float32)[None, :])[0]
+        ef = max(ef or self._ef_search, k)
+        if allowed is not None:
+            return self._query_filtered(query, k, ef, allowed, deadline)
+
+        entry = [self._entry_point]
+        for layer in range(self._max_level, 0, -1):
+            entry = [node for _, node in self._search_layer(query, entry, 1, layer)]
+
+        if self._deleted:
+            # Widen the beam so tombstones do not crowd out live results
+            ef = math.ceil(ef * len(self._ids) / len(self._node_of))
+        found = self._search_layer(query, entry, ef, 0, deadline=deadline)
+        live = [(dist, node) for dist, node in found if node not in self._deleted]
+        return [(self._ids[node], self._similarity(dist)) for dist, node in live[:k]]
+
+    def metric(self) -> str:
+        """Return the distance metric."""
+        return self._metric
+
+    def kind(self) -> str:
+        """Return the index type."""
+        return IndexAlgorithm.HNSW.value
+
+    def params(self) -> dict[str, Any]:
+        """Return the graph construction parameters."""
+        return {
+            "m": self._m,
+            "ef_construction": self._ef_construction,
+            "ef_search": self._ef_search,
+            "seed": self._seed,
+        }
+
+    def ids(self) -> list[str]:
+        return list(self._node_of)
+
+    def _state(self) -> dict[str, Any]:
+        # Links are flattened to the layer count of every node, the
+        # neighbor count of every (node, layer) and all neighbors in order
+        layers = [neighbors for node_links in self._links for neighbors in node_links]
+        return {
+            "dim": self._dim,
+            "data": self._data[: len(self._ids)],
+            "sq_norms": self._sq_norms[: len(self._ids)],
+            "ids": self._ids,
+            "deleted": np.asarray(sorted(self._deleted), dtype=np.int64),
+            "levels": np.asarray([len(links) for links in self._links], np.int32),
+            "degrees": np.asarray([len(neighbors) for neighbors in layers], np.int32),
+            "neighbors": np.asarray(
+                [node for neighbors in layers for node in neighbors], np.int32
+            ),
+            "entry_point": self._entry_point,
+            "max_level": self._max_level,
+            "rng": self._rng.bit_generator.state,
+        }
+
+    def _load_state(self, state: dict[str, Any]) -> None:
+        self._reset(state["dim"])
+        self._data = state["data"]
+        self._sq_norms = state["sq_norms"]
+        self._ids = state["ids"]
+        self._deleted = set(state["deleted"].tolist())
+        self._node_of = {
+            cid: node for node, cid in enumerate(self._ids) if node not in self._deleted
+        }
+        neighbors = state["neighbors"].tolist()
+        bounds = np.concatenate([[0], np.cumsum(state["degrees"])]).tolist()
+        layer = 0
+        for level_count in state["levels"].tolist():
+            self._links.append(
+                [
+                    neighbors[bounds[i] : bounds[i + 1]]
+                    for i in range(layer, layer + level_count)
+                ]
+            )
+            layer += level_count
+        self._entry_point = state["entry_point"]
+        self._max_level = state["max_level"]
+        self._rng.bit_generator.state = state["rng"]
+
+    def _query_filtered(
+        self,
+        query: np.ndarray,
+        k: int,
+        ef: int,
+        allowed: AbstractSet[str],
+        deadline: Optional[float] = None,
+    ) -> list[tuple[str, float]]:
+        """Search for the k nearest nodes among the allowed ids."""
+        rows = self._allowed_rows(allowed, self._node_of)
+        if not len(rows):
+            return []
+
+        if filter_prefers_scan(len(rows), len(self._node_of), ef):
+            nodes = rows.tolist()
+            dists = self._distances(query, nodes, float(query @ query))
+            top = top_k_indices(-dists, k)
+            return [
+                (self._ids[nodes[i]], self._similarity(float(dists[i]))) for i in top
+            ]
+
+        entry = [self._entry_point]
+        for layer in range(self._max_level, 0, -1):
+            entry = [node for _, node in self._search_layer(query, entry, 1, layer)]
+        # Allowed nodes are all live, so tombstones need no special care
+        found = self._search_layer(query, entry, ef, 0, set(rows.tolist()), deadline)
+        return [(self._ids[node], self._similarity(dist)) for dist, node in found[:k]]
+
+    def _prepare(self, vectors: np.ndarray) -> np.ndarray:
+        """Normalize rows for cosine so the distance is 1 - dot."""
+        if self._cosine:
+            return normalize_rows(vectors)
+        return vectors
+
+    def _similarity(self, dist: float) -> float:
+        """Convert an internal distance into the score reported to callers."""
+        if self._cosine:
+            return 1.0 - dist
+        if self._inner:
+            return -dist
+        return 1.0 / (1.0 + math.sqrt(max(dist, 0.0)))
+
+    def _distances(
+        self, query: np.ndarray, nodes: list[int], query_sq: float = 0.0
+    ) -> np.ndarray:
+        """Distances from the query to the given nodes, in one product.
+
+        ``query_sq`` is the squared norm of the query, only used for
+        Euclidean distances.
+        """
+        dots = self._data[nodes] @ query
+        if self._cosine:
+            return 1.0 - dots
+        if self._inner:
+            return -dots
+        return self._sq_norms[nodes] + query_sq - 2.0 * dots
+
+    def _search_layer(
+        self,
+        query: np.ndarray,
+        entry: list[int],
+        ef: int,
+        layer: int,
+        accept: Optional[set[int]] = None,
+        deadline: Optional[float] = None,
+    ) -> list[tuple[float, int]]:
+        """Beam search on one layer, returning up to ef (distance, node) pairs.
+
+        With ``accept`` every node is still traversed, but only accepted
+        nodes count towards the ef results. Once ``deadline`` passes the
+        search stops expanding and returns what it has.
+        """
+        query_sq = float(query @ query)
+        visited = set(entry)
+        dists = self._distances(query, entry, query_sq).tolist()
+        candidates = list(zip(dists, entry))
+        heapify(candidates)
+        # Max-heap of the best ef results so far (negated distances)
+        results = [
+            (-d, node) for d, node in candidates if accept is None or node in accept
+        ]
+        heapify(results)
+        while len(results) > ef:
+            heappop(results)
+
+        while candidates:
+            dist, node = heappop(candidates)
+            if len(results) >= ef and dist > -results[0][0]:
+                break
+            if results and past_deadline(deadline):
+                break
+
+            neighbors = [n for n in self._links[node][layer] if n not in visited]
+            if not neighbors:
+                continue
+            visited.update(neighbors)
+
+            n_dists = self._distances(query, neighbors, query_sq).tolist()
+            for n_dist, neighbor in zip(n_dists, neighbors):
+                if len(results) < ef or n_dist < -results[0][0]:
+                    heappush(candidates, (n_dist, neighbor))
+                    if accept is None or neighbor in accept:
+                        heappush(results, (-n_dist, neighbor))
+                        if len(results) > ef:
+                            heappop(results)
+
+        return sorted((-d, node) for d, node in results)
+
+    def _select_neighbors(
+        self, candidates: list[tuple[float, int]], limit: int
+    ) -> list[int]:
+        """Pick diverse neighbors with the HNSW heuristic.
+
+        A candidate is kept only if it is closer to the base node than to
+        every neighbor already selected, which preserves links that bridge
+        clusters instead of spending them all on one dense region.
+        """
+        if len(candidates) <= limit:
+            return [node for _, node in candidates]
+
+        nodes = [node for _, node in candidates]
+        vectors = self._data[nodes]
+        if self._cosine:
+            pairwise = (1.0 - vectors @ vectors.T).tolist()
+        elif self._inner:
+            pairwise = (-(vectors @ vectors.T)).tolist()
+        else:
+            sq = self._sq_norms[nodes]
+            pairwise = (
+                sq[:, None] + sq[None, :] - 2.0 * (vectors @ vectors.T)
+            ).tolist()
+
+        selected: list[int] = []
+        for i, (dist, _) in enumerate(candidates):
+            row = pairwise[i]
+            if all(dist < row[j] for j in selected):
+                selected.append(i)
+                if len(selected) == limit:
+                    break
+        return [nodes[i] for i in selected]
+
+    def _insert(self, node: int) -> None:
+        """Link an already stored node into the graph."""
+        level = int(-math.log(1.0 - self._rng.random()) * self._level_mult)
+        self._links.append([[] for _ in range(level + 1)])
+
+        if self._entry_point < 0:
+            self._entry_point = node
+            self._max_level = level
+            return
+
+        query = self._data[node]
+        entry = [self._entry_point]
+        for layer in range(self._max_level, level, -1):
+            entry = [n for _, n in self._search_layer(query, entry, 1, layer)]
+
+        for layer in range(min(level, self._max_level), -1, -1):
+            found = self._search_layer(query, entry, self._ef_construction, layer)
+            limit = self._m0 if layer == 0 else self._m
+            neighbors = self._select_neighbors(found, self._m)
+            self._links[node][layer] = neighbors
+
+            for neighbor in neighbors:
+                links = self._links[neighbor][layer]
+                links.append(node)
+                if len(links) > limit:
+                    base = self._data[neighbor]
+                    dists = self._distances(base, links, float(base @ base)).tolist()
+                    ranked = sorted(zip(dists, links))
+                    self._links[neighbor][layer] = self._select_neighbors(ranked, limit)
+
+            entry = [n for _, n in found]
+
+        if level > self._max_level:
+            self._entry_point = node
+            self._max_level = level
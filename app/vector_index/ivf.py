@@ -0,0 +1,314 @@
+"""IVF (inverted file) index implementation with a k-means coarse quantizer."""
+
+from __future__ import annotations
+
+import math
+from typing import AbstractSet, Any, Optional
+
+import numpy as np
+
+from app.core import settings
+from app.core.constants import DistanceMetric, IndexAlgorithm
+from app.vector_index import (
+    VectorIndex,
+    normalize_rows,
+    past_deadline,
+    require_ints,
+    reserve_rows,
+    top_k_indices,
+)
+from app.vector_index.clustering import kmeans, nearest_centroids
+from app.vector_index.parallel import build_pool
+
+
+class IVFIndex(VectorIndex):
+    """Inverted file index for cosine, Euclidean and inner product search.
+
+    Vectors are clustered into ``nlist`` k-means centroids and stored in one
+    posting list per centroid. A query only scans the ``nprobe`` lists whose
+    centroids are closest to it, so ``nprobe`` trades recall for latency.
+    Cosine vectors are stored normalized, so scoring a list is one matrix
+    product; Euclidean scores come from cached squared norms. For inner
+    product the lists are probed by their centroids' dot product with the
+    query.
+
+    Added vectors join the list of their nearest trained centroid and
+    removed ones are swapped out of their list; the centroids themselves
+    only change on a rebuild. Lists grow by doubling their capacity, so
+    an append costs amortized O(1).
+
+    With ``workers`` > 1, builds run the k-means assignment steps on row
+    blocks in that many threads.
+    """
+
+    def __init__(
+        self,
+        metric: str = "cosine",
+        nlist: Optional[int] = None,
+        nprobe: Optional[int] = None,
+        seed: Optional[int] = None,
+        workers: Optional[int] = None,
+    ) -> None:
+        self._metric = DistanceMetric(metric).value
+        self._cosine = self._metric == DistanceMetric.COSINE.value
+        self._inner = self._metric == DistanceMetric.INNER_PRODUCT.value
+        # 0 means "pick from the library size at build time"
+        self._nlist_setting = settings.ivf_nlist if nlist is None else nlist
+        self._nprobe = settings.ivf_nprobe if nprobe is None else nprobe
+        self._seed = settings.ivf_seed if seed is None else seed
+        self._workers = settings.index_build_workers if workers is None else workers
+        require_ints(
+            nlist=self._nlist_setting,
+            nprobe=self._nprobe,
+            seed=self._seed,
+            workers=self._workers,
+        )
+        if self._nlist_setting < 0:
+            raise ValueError("nlist must not be negative")
+        if self._nprobe < 1:
+            raise ValueError("nprobe must be positive")
+        if self._workers < 1:
+            raise ValueError("workers must be positive")
+        self._reset(0)
+
+    def _reset(self, dim: int) -> None:
+        self._dim = dim
+        self._nlist = 0
+        self._centroids = np.empty((0, dim), dtype=np.float32)
+        self._centroid_sq = np.empty(0, dtype=np.float32)
+        # One (rows, dim) block of vectors and matching ids per centroid.
+        # Blocks grow like reserve_rows buffers, so only the first
+        # _list_sizes[list_no] rows of a list's arrays are in use
+        self._list_vectors: list[np.ndarray] = []
+        self._list_sq_norms: list[np.ndarray] = []
+        self._list_ids: list[list[str]] = []
+        self._list_sizes: list[int] = []
+        # (list number, row) of every stored id
+        self._locations: dict[str, tuple[int, int]] = {}
+
+    def build(self, vectors: list[list[float]], ids: list[str]) -> None:
+        """Train the coarse quantizer and fill the posting lists."""
+        self._validate_inputs(vectors, ids)
+
+        if not vectors:
+            self._reset(0)
+            return
+
+        self._reset(len(vectors[0]))
+        data = self._prepare(np.asarray(vectors, dtype=np.float32))
+        nlist = self._nlist_setting or int(math.sqrt(len(vectors)))
+        self._nlist = max(1, min(nlist, len(vectors)))
+        with build_pool(self._workers, len(vectors)) as pool:
+            self._centroids, assignments = kmeans(
+                data, self._nlist, seed=self._seed, spherical=self._cosine, pool=pool
+            )
+        self._centroid_sq = np.einsum("ij,ij->i", self._centroids, self._centroids)
+
+        order = np.argsort(assignments, kind="stable")
+        bounds = np.searchsorted(assignments[order], np.arange(self._nlist + 1))
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            rows = order[start:end]
+            block = np.ascontiguousarray(data[rows])
+            self._list_vectors.append(block)
+            self._list_sq_norms.append(np.einsum("ij,ij->i", block, block))
+            self._list_ids.append([ids[i] for i in rows])
+            self._list_sizes.append(len(rows))
+        self._index_locations()
+
+    def remove(self, ids: list[str]) -> None:
+        """Drop ids by moving the last row of their list into the freed slot."""
+        for cid in ids:
+            location = self._locations.pop(cid, None)
+            if location is None:
+                continue
+            list_no, row = location
+            list_ids = self._list_ids[list_no]
+            last = len(list_ids) - 1
+            if row != last:
+                self._move_row(list_no, last, row)
+                list_ids[row] = list_ids[last]
+                self._locations[list_ids[row]] = (list_no, row)
+            list_ids.pop()
+            self._truncate_list(list_no, last)
+
+    def size(self) -> int:
+        return len(self._locations)
+
+    def _append(self, ids: list[str], vectors: list[list[float]]) -> None:
+        self._validate_dim(vectors, self._dim)
+        data = self._prepare(np.asarray(vectors, dtype=np.float32))
+        assignments = nearest_centroids(data, self._centroids)
+        for list_no in np.unique(assignments).tolist():
+            rows = np.flatnonzero(assignments == list_no)
+            list_ids = self._list_ids[list_no]
+            for cid in (ids[i] for i in rows):
+                self._locations[cid] = (list_no, len(list_ids))
+                list_ids.append(cid)
+            self._extend_list(list_no, data[rows])
+
+    def query(
+        self,
+        vector: list[float],
+        k: int,
+        nprobe: Optional[int] = None,
+        allowed: Optional[AbstractSet[str]] = None,
+        deadline: Optional[float] = None,
+    ) -> list[tuple[str, float]]:
+        """Query for k nearest neighbors.
+
+        Args:
+            vector: Query vector
+            k: Number of neighbors to return
+            nprobe: Number of posting lists to scan, defaults to the
+                index's nprobe. Larger values trade latency for recall.
+            allowed: Ids that may be returned. Rows outside it are dropped
+                from each scanned list, and lists keep being scanned past
+                nprobe, nearest first, until k allowed rows are found.
+            deadline: ``time.monotonic()`` value after which no further
+                lists are scanned; the nearest list is always scanned.
+        """
+        if k <= 0 or not self._nlist:
+            return []
+
+        if len(vector) != self._dim:
+            raise ValueError("Query vector dimensionality mismatch")
+
+        query = self._prepare(np.asarray(vector, dtype=np.float32)[None, :])[0]
+        nprobe = nprobe or self._nprobe
+        if allowed is None:
+            list_scores, ids = [], []
+            for probed, list_no in enumerate(self._probe_lists(query, nprobe)):
+                if probed and past_deadline(deadline):
+                    break
+                list_scores.append(self._score(query, list_no))
+                ids.extend(self._list_ids[list_no])
+            scores = np.concatenate(list_scores)
+        else:
+            scores, ids = self._scan_allowed(query, k, nprobe, allowed, deadline)
+        top = top_k_indices(scores, k)
+        return [(ids[i], float(scores[i])) for i in top]
+
+    def metric(self) -> str:
+        """Return the distance metric."""
+        return self._metric
+
+    def kind(self) -> str:
+        """Return the index type."""
+        return IndexAlgorithm.IVF.value
+
+    def params(self) -> dict[str, Any]:
+        """Return the quantizer parameters."""
+        return {
+            "nlist": self._nlist_setting,
+            "nprobe": self._nprobe,
+            "seed": self._seed,
+        }
+
+    def ids(self) -> list[str]:
+        return list(self._locations)
+
+    def _state(self) -> dict[str, Any]:
+        return {
+            "dim": self._dim,
+            "nlist": self._nlist,
+            "centroids": self._centroids,
+            "list_vectors": self._used(self._list_vectors),
+            "list_sq_norms": self._used(self._list_sq_norms),
+            "list_ids": self._list_ids,
+        }
+
+    def _load_state(self, state: dict[str, Any]) -> None:
+        self._reset(state["dim"])
+        self._nlist = state["nlist"]
+        self._centroids = state["centroids"]
+        self._centroid_sq = np.einsum("ij,ij->i", self._centroids, self._centroids)
+        self._list_vectors = state["list_vectors"]
+        self._list_sq_norms = state["list_sq_norms"]
+        self._list_ids = state["list_ids"]
+        self._list_sizes = [len(list_ids) for list_ids in self._list_ids]
+        self._index_locations()
+
+    def _index_locations(self) -> None:
+        self._locations = {
+            cid: (list_no, row)
+            for list_no, list_ids in enumerate(self._list_ids)
+            for row, cid in enumerate(list_ids)
+        }
+
+    def _used(self, arrays: list[np.ndarray]) -> list[np.ndarray]:
+        """Return the in-use rows of one array per posting list."""
+        return [array[:size] for array, size in zip(arrays, self._list_sizes)]
+
+    def _extend_list(self, list_no: int, block: np.ndarray) -> None:
+        """Append prepared vectors to a posting list."""
+        size = self._list_sizes[list_no]
+        end = size + len(block)
+        vectors = reserve_rows(self._list_vectors[list_no], size, len(block))
+        sq_norms = reserve_rows(self._list_sq_norms[list_no], size, len(block))
+        vectors[size:end] = block
+        sq_norms[size:end] = np.einsum("ij,ij->i", block, block)
+        self._list_vectors[list_no] = vectors
+        self._list_sq_norms[list_no] = sq_norms
+        self._list_sizes[list_no] = end
+
+    def _move_row(self, list_no: int, src: int, dst: int) -> None:
+        self._list_vectors[list_no][dst] = self._list_vectors[list_no][src]
+        self._list_sq_norms[list_no][dst] = self._list_sq_norms[list_no][src]
+
+    def _truncate_list(self, list_no: int, length: int) -> None:
+        self._list_sizes[list_no] = length
+
+    def _prepare(self, vectors: np.ndarray) -> np.ndarray:
+        """Normalize rows for cosine so similarity is a plain dot product."""
+        if self._cosine:
+            return normalize_rows(vectors)
+        return vectors
+
+    def _probe_lists(self, query: np.ndarray, nprobe: int) -> list[int]:
+        """Return the posting lists whose centroids are closest to the query."""
+        if self._inner:
+            closeness = self._centroids @ query
+        else:
+            closeness = 2.0 * (self._centroids @ query) - self._centroid_sq
+        return top_k_indices(closeness, min(nprobe, self._nlist)).tolist()
+
+    def _scan_allowed(
+        self,
+        query: np.ndarray,
+        k: int,
+        nprobe: int,
+        allowed: AbstractSet[str],
+        deadline: Optional[float] = None,
+    ) -> tuple[np.ndarray, list[str]]:
+        """Score the allowed rows of at least nprobe lists, until k are found."""
+        all_scores, all_ids = [], []
+        found = 0
+        for probed, list_no in enumerate(self._probe_lists(query, self._nlist), 1):
+            if probed > nprobe and found >= k:
+                break
+            if found and past_deadline(deadline):
+                break
+            list_ids = self._list_ids[list_no]
+            keep = np.fromiter(
+                (cid in allowed for cid in list_ids), dtype=bool, count=len(list_ids)
+            )
+            if not keep.any():
+                continue
+            all_scores.append(self._score(query, list_no)[keep])
+            all_ids.extend(cid for cid, ok in zip(list_ids, keep.tolist()) if ok)
+            found += len(all_scores[-1])
+        if not all_scores:
+            return np.empty(0, dtype=np.float64), []
+        return np.concatenate(all_scores), all_ids
+
+    def _score(self, query: np.ndarray, list_no: int) -> np.ndarray:
+        """Score one posting list against the query, higher is better."""
+        size = self._list_sizes[list_no]
+        dots = (self._list_vectors[list_no][:size] @ query).astype(np.float64)
+        if self._cosine:
+            return np.clip(dots, -1.0, 1.0)
+        if self._inner:
+            return dots
+        sq_norms = self._list_sq_norms[list_no][:size]
+        sq_dist = sq_norms + float(query @ query) - 2.0 * dots
+        return 1.0 / (1.0 + np.sqrt(np.maximum(sq_dist, 0.0)))
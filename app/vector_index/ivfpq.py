@@ -0,0 +1,185 @@
+"""IVF-PQ index implementation: inverted file with product-quantized residuals."""
+
+from __future__ import annotations
+
+import math
+from concurrent.futures import Executor
+from typing import Any, Optional
+
+import numpy as np
+
+from app.core import settings
+from app.core.constants import IndexAlgorithm
+from app.vector_index import require_ints, reserve_rows
+from app.vector_index.clustering import kmeans, nearest_centroids
+from app.vector_index.ivf import IVFIndex
+from app.vector_index.parallel import build_pool, pool_map
+
+# One byte per sub-quantizer code
+PQ_CODEBOOK_SIZE = 256
+
+
+def default_pq_m(dim: int) -> int:
+    """Pick the largest divisor of dim that keeps sub-vectors >= 16 dims."""
+    target = max(1, dim // 16)
+    return max(m for m in range(1, target + 1) if dim % m == 0)
+
+
+class IVFPQIndex(IVFIndex):
+    """IVF index whose posting lists hold PQ codes instead of vectors.
+
+    Each vector's residual to its coarse centroid is split into ``m``
+    sub-vectors, and each sub-vector is replaced by the one-byte id of its
+    nearest sub-quantizer centroid. Queries use asymmetric distance
+    computation (ADC): per probed list, a (m, 256) table of distances from
+    the query residual to every sub-centroid turns scoring a code into m
+    lookups. Cosine vectors are normalized first, so the squared distance
+    between unit vectors maps back to cosine as ``1 - d / 2``.
+
+    Only codes and ids are kept, so full-precision re-ranking of the top
+    ``rerank`` candidates is left to the caller through rerank_candidates.
+    With ``workers`` > 1 the sub-quantizers also train on separate threads.
+    """
+
+    def __init__(
+        self,
+        metric: str = "cosine",
+        nlist: Optional[int] = None,
+        nprobe: Optional[int] = None,
+        m: Optional[int] = None,
+        rerank: Optional[int] = None,
+        seed: Optional[int] = None,
+        workers: Optional[int] = None,
+    ) -> None:
+        # 0 means "pick from the dimensionality at build time"
+        self._m_setting = settings.ivfpq_m if m is None else m
+        self._rerank = settings.ivfpq_rerank if rerank is None else rerank
+        require_ints(m=self._m_setting, rerank=self._rerank)
+        if self._m_setting < 0:
+            raise ValueError("m must not be negative")
+        if self._rerank < 0:
+            raise ValueError("rerank must not be negative")
+        super().__init__(
+            metric=metric, nlist=nlist, nprobe=nprobe, seed=seed, workers=workers
+        )
+        if self._inner:
+            raise ValueError("IVFPQIndex does not support inner product")
+
+    def _reset(self, dim: int) -> None:
+        super()._reset(dim)
+        self._m = 0
+        self._codebooks = np.empty((0, 0, 0), dtype=np.float32)
+        self._list_codes: list[np.ndarray] = []
+
+    def build(self, vectors: list[list[float]], ids: list[str]) -> None:
+        """Train the coarse quantizer and codebooks, then encode every vector."""
+        self._validate_inputs(vectors, ids)
+
+        if not vectors:
+            self._reset(0)
+            return
+
+        dim = len(vectors[0])
+        m = self._m_setting or default_pq_m(dim)
+        if dim % m:
+            raise ValueError(f"m={m} must divide the vector dimensionality {dim}")
+
+        self._reset(dim)
+        self._m = m
+        data = self._prepare(np.asarray(vectors, dtype=np.float32))
+        nlist = self._nlist_setting or int(math.sqrt(len(vectors)))
+        self._nlist = max(1, min(nlist, len(vectors)))
+        with build_pool(self._workers, len(vectors)) as pool:
+            self._centroids, assignments = kmeans(
+                data, self._nlist, seed=self._seed, spherical=self._cosine, pool=pool
+            )
+            residuals = data - self._centroids[assignments]
+            codes = self._train_and_encode(residuals, pool)
+        self._centroid_sq = np.einsum("ij,ij->i", self._centroids, self._centroids)
+
+        order = np.argsort(assignments, kind="stable")
+        bounds = np.searchsorted(assignments[order], np.arange(self._nlist + 1))
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            rows = order[start:end]
+            self._list_codes.append(np.ascontiguousarray(codes[rows]))
+            self._list_ids.append([ids[i] for i in rows])
+            self._list_sizes.append(len(rows))
+        self._index_locations()
+
+    def kind(self) -> str:
+        """Return the index type."""
+        return IndexAlgorithm.IVFPQ.value
+
+    def params(self) -> dict[str, Any]:
+        """Return the quantizer parameters."""
+        return {**super().params(), "m": self._m_setting, "rerank": self._rerank}
+
+    def rerank_candidates(self) -> int:
+        """Return how many ADC candidates should be re-scored exactly."""
+        return self._rerank
+
+    def _state(self) -> dict[str, Any]:
+        return {
+            **super()._state(),
+            "m": self._m,
+            "codebooks": self._codebooks,
+            "list_codes": self._used(self._list_codes),
+        }
+
+    def _load_state(self, state: dict[str, Any]) -> None:
+        super()._load_state(state)
+        self._m = state["m"]
+        self._codebooks = state["codebooks"]
+        self._list_codes = state["list_codes"]
+
+    def _train_and_encode(
+        self, residuals: np.ndarray, pool: Optional[Executor] = None
+    ) -> np.ndarray:
+        """Train one codebook per sub-space and return the (n, m) codes.
+
+        Sub-spaces are independent, so each is trained on one of ``pool``'s
+        threads when given.
+        """
+        n, dim = residuals.shape
+        dsub = dim // self._m
+        ksub = min(PQ_CODEBOOK_SIZE, n)
+        self._codebooks = np.empty((self._m, ksub, dsub), dtype=np.float32)
+        codes = np.empty((n, self._m), dtype=np.uint8)
+
+        def train(j: int) -> None:
+            sub = np.ascontiguousarray(residuals[:, j * dsub : (j + 1) * dsub])
+            self._codebooks[j], codes[:, j] = kmeans(sub, ksub, seed=self._seed + j)
+
+        pool_map(pool, train, range(self._m))
+        return codes
+
+    def _encode(self, residuals: np.ndarray) -> np.ndarray:
+        """Encode residuals with the trained codebooks."""
+        dsub = residuals.shape[1] // self._m
+        codes = np.empty((len(residuals), self._m), dtype=np.uint8)
+        for j in range(self._m):
+            sub = np.ascontiguousarray(residuals[:, j * dsub : (j + 1) * dsub])
+            codes[:, j] = nearest_centroids(sub, self._codebooks[j])
+        return codes
+
+    def _extend_list(self, list_no: int, block: np.ndarray) -> None:
+        """Encode prepared vectors and append their codes to a posting list."""
+        size = self._list_sizes[list_no]
+        codes = reserve_rows(self._list_codes[list_no], size, len(block))
+        codes[size : size + len(block)] = self._encode(block - self._centroids[list_no])
+        self._list_codes[list_no] = codes
+        self._list_sizes[list_no] = size + len(block)
+
+    def _move_row(self, list_no: int, src: int, dst: int) -> None:
+        self._list_codes[list_no][dst] = self._list_codes[list_no][src]
+
+    def _score(self, query: np.ndarray, list_no: int) -> np.ndarray:
+        """Score one posting list with ADC lookups, higher is better."""
+        codes = self._list_codes[list_no][: self._list_sizes[list_no]]
+        residual = (query - self._centroids[list_no]).reshape(self._m, 1, -1)
+        # tables[j, c] = ||residual_j - codebook_j[c]||^2
+        tables = np.sum((self._codebooks - residual) ** 2, axis=2)
+        sq_dist = tables[np.arange(self._m), codes].sum(axis=1, dtype=np.float64)
+        if self._cosine:
+            return np.clip(1.0 - sq_dist / 2.0, -1.0, 1.0)
+        return 1.0 / (1.0 + np.sqrt(sq_dist))
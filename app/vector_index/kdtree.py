@@ -2,131 +2,459 @@
 
 from __future__ import annotations
 
-from heapq import heappop, heappush
-from typing import Optional
-
-from app.core.constants import DistanceMetric, IndexAlgorithm
-from app.vector_index import VectorIndex, euclidean_distance
+import math
+from concurrent.futures import Executor
+from heapq import heappop, heappush, heapreplace
+from typing import AbstractSet, Any, Optional
 
+import numpy as np
 
-class KDNode:
-    """Node in a KD-Tree."""
+from app.core import settings
+from app.core.constants import DistanceMetric, IndexAlgorithm
+from app.vector_index import (
+    VectorIndex,
+    filter_prefers_scan,
+    past_deadline,
+    require_ints,
+    reserve_rows,
+    top_k_indices,
+)
+from app.vector_index.parallel import build_pool, effective_workers, pool_map
+from app.vector_index.serialization import pack_lists, unpack_lists
+
+# Points per leaf bucket, scored together with one vectorized distance
+LEAF_SIZE = 64
+# Rebuild once inserts and removals since the last build exceed this
+# fraction of the live points, which bounds how unbalanced the tree gets
+REBALANCE_THRESHOLD = 0.25
+# Randomized trees split on one of this many highest-variance dimensions
+RANDOM_SPLIT_DIMS = 5
+# Rows sampled per node to estimate those variances
+VARIANCE_SAMPLE_SIZE = 128
+# Subtrees handed out per build worker, so uneven ones balance out
+SUBTREES_PER_WORKER = 4
+
+
+class KDTree:
+    """Flat KD-tree over the row numbers of a shared point matrix.
+
+    Nodes are positions in parallel arrays. Node ``i`` is a leaf when
+    ``split_dim[i] < 0``; its bucket is ``rows[start[i]:end[i]]`` plus any
+    rows inserted into it later. Otherwise points whose ``split_dim[i]``
+    coordinate is below ``split_value[i]`` lie under ``left[i]``, points
+    above it under ``right[i]``, and ties may sit on either side.
+
+    Without ``rng`` every node splits on its widest dimension. With it,
+    the split dimension is drawn from the RANDOM_SPLIT_DIMS dimensions of
+    highest variance, so the trees of a forest partition space differently.
+
+    With a process ``pool``, only the top of the tree is split here: nodes
+    of at most ``1 / shards`` of the rows are built as independent subtrees
+    by the pool and grafted back in place.
+    """
 
     def __init__(
         self,
-        point: list[float],
-        point_id: str,
-        axis: int,
-        left: Optional["KDNode"],
-        right: Optional["KDNode"],
+        data: np.ndarray,
+        rows: np.ndarray,
+        leaf_size: int = LEAF_SIZE,
+        rng: Optional[np.random.Generator] = None,
+        pool: Optional[Executor] = None,
+        shards: int = 1,
     ) -> None:
-        self.point = point
-        self.point_id = point_id
-        self.axis = axis
-        self.left = left
-        self.right = right
-
-
-def build_kd(
-    points: list[list[float]], ids: list[str], depth: int = 0
-) -> Optional[KDNode]:
-    """Recursively build a KD-Tree."""
-    if not points:
-        return None
-
-    k = len(points[0])
-    axis = depth % k
-
-    # Sort points by the current axis
-    combined = list(zip(points, ids))
-    combined.sort(key=lambda x: x[0][axis])
-    median = len(combined) // 2
-
-    # Get median point
-    median_point, median_id = combined[median]
-
-    # Recursively build left and right subtrees
-    left_points = [p for p, _ in combined[:median]]
-    left_ids = [i for _, i in combined[:median]]
-    left = build_kd(left_points, left_ids, depth + 1)
-
-    right_points = [p for p, _ in combined[median + 1 :]]
-    right_ids = [i for _, i in combined[median + 1 :]]
-    right = build_kd(right_points, right_ids, depth + 1)
-
-    return KDNode(median_point, median_id, axis, left, right)
-
-
-def kd_query(
-    node: Optional[KDNode],
-    target: list[float],
-    k: int,
-    heap: list[tuple[float, str]],
-) -> None:
-    """Query a KD-Tree for k nearest neighbors."""
-    if node is None:
-        return
-
-    # Calculate distance to current node
-    dist = euclidean_distance(target, node.point)
-
-    # Use max-heap (negative distance for max-heap behavior)
-    heappush(heap, (-dist, node.point_id))
-    if len(heap) > k:
-        heappop(heap)
+        self.rows = np.array(rows, dtype=np.int64)
+        split_dim: list[int] = []
+        split_value: list[float] = []
+        left: list[int] = []
+        right: list[int] = []
+        start: list[int] = []
+        end: list[int] = []
+
+        def new_node(lo: int, hi: int) -> int:
+            split_dim.append(-1)
+            split_value.append(0.0)
+            left.append(-1)
+            right.append(-1)
+            start.append(lo)
+            end.append(hi)
+            return len(split_dim) - 1
+
+        shard_size = 0
+        if pool is not None and shards > 1:
+            shard_size = -(-len(self.rows) // shards)
+        deferred: list[tuple[int, int, int]] = []
+
+        stack = [new_node(0, len(self.rows))]
+        while stack:
+            node = stack.pop()
+            lo, hi = start[node], end[node]
+            if hi - lo <= leaf_size:
+                continue
+            if hi - lo <= shard_size:
+                deferred.append((node, lo, hi))
+                continue
+
+            block = data[self.rows[lo:hi]]
+            spread = block.max(axis=0) - block.min(axis=0)
+            dim = int(np.argmax(spread))
+            if spread[dim] <= 0:
+                # Identical points cannot be split further
+                continue
+            if rng is not None:
+                dim = self._random_split_dim(block, spread, rng)
+
+            # Median by partition, O(n) instead of a full sort per level
+            mid = (hi - lo) // 2
+            values = block[:, dim]
+            order = np.argpartition(values, mid)
+            self.rows[lo:hi] = self.rows[lo:hi][order]
+            split_dim[node] = dim
+            split_value[node] = float(values[order[mid]])
+            left[node] = new_node(lo, lo + mid)
+            right[node] = new_node(lo + mid, hi)
+            stack.extend((left[node], right[node]))
+
+        if deferred:
+            blocks = [data[self.rows[lo:hi]] for _, lo, hi in deferred]
+            seeds = [
+                None if rng is None else int(rng.integers(2**63)) for _ in deferred
+            ]
+            subtrees = pool_map(
+                pool, _build_subtree, blocks, [leaf_size] * len(blocks), seeds
+            )
+            for (node, lo, hi), subtree in zip(deferred, subtrees):
+                sub_dim, sub_value, sub_left, sub_right, sub_start, sub_end, order = (
+                    subtree
+                )
+                self.rows[lo:hi] = self.rows[lo:hi][order]
+                # The subtree's root takes the deferred node's place and its
+                # other nodes are appended, so child links shift by base
+                base = len(split_dim) - 1
+                sub_left = np.where(sub_left >= 0, sub_left + base, -1).tolist()
+                sub_right = np.where(sub_right >= 0, sub_right + base, -1).tolist()
+                split_dim[node] = int(sub_dim[0])
+                split_value[node] = float(sub_value[0])
+                left[node], right[node] = sub_left[0], sub_right[0]
+                split_dim.extend(sub_dim[1:].tolist())
+                split_value.extend(sub_value[1:].tolist())
+                left.extend(sub_left[1:])
+                right.extend(sub_right[1:])
+                start.extend((sub_start[1:] + lo).tolist())
+                end.extend((sub_end[1:] + lo).tolist())
+
+        self._set_nodes(split_dim, split_value, left, right, start, end)
+        # Rows inserted after the build, per leaf
+        self.extra: dict[int, list[int]] = {}
+
+    def _set_nodes(
+        self,
+        split_dim: Any,
+        split_value: Any,
+        left: Any,
+        right: Any,
+        start: Any,
+        end: Any,
+    ) -> None:
+        self.split_dim = np.asarray(split_dim, dtype=np.int32)
+        self.split_value = np.asarray(split_value, dtype=np.float32)
+        self.left = np.asarray(left, dtype=np.int32)
+        self.right = np.asarray(right, dtype=np.int32)
+        self.start = np.asarray(start, dtype=np.int64)
+        self.end = np.asarray(end, dtype=np.int64)
+        # Plain-list copies of the node arrays, whose scalar reads are much
+        # cheaper than numpy's during the per-node query loop
+        self.nodes = (
+            self.split_dim.tolist(),
+            self.split_value.tolist(),
+            self.left.tolist(),
+            self.right.tolist(),
+        )
+
+    def state(self) -> dict[str, Any]:
+        """Return the node arrays, bucket rows and inserted rows."""
+        return {
+            "rows": self.rows,
+            "split_dim": self.split_dim,
+            "split_value": self.split_value,
+            "left": self.left,
+            "right": self.right,
+            "start": self.start,
+            "end": self.end,
+            "extra": pack_lists(self.extra),
+        }
+
+    @classmethod
+    def from_state(cls, state: dict[str, Any]) -> KDTree:
+        """Recreate a tree from its state() without splitting any nodes."""
+        tree = cls.__new__(cls)
+        tree.rows = state["rows"]
+        tree._set_nodes(
+            state["split_dim"],
+            state["split_value"],
+            state["left"],
+            state["right"],
+            state["start"],
+            state["end"],
+        )
+        tree.extra = unpack_lists(state["extra"])
+        return tree
+
+    @staticmethod
+    def _random_split_dim(
+        block: np.ndarray, spread: np.ndarray, rng: np.random.Generator
+    ) -> int:
+        """Pick one of the highest-variance dimensions that can be split."""
+        sample = block
+        if len(block) > VARIANCE_SAMPLE_SIZE:
+            sample = block[rng.choice(len(block), VARIANCE_SAMPLE_SIZE, replace=False)]
+        variance = np.where(spread > 0, sample.var(axis=0), -1.0)
+        top = np.argsort(variance)[::-1][:RANDOM_SPLIT_DIMS]
+        top = top[variance[top] >= 0]
+        return int(rng.choice(top))
+
+    def leaf_for(self, point: np.ndarray) -> int:
+        """Return the leaf whose cell contains the point."""
+        node = 0
+        while self.split_dim[node] >= 0:
+            if point[self.split_dim[node]] < self.split_value[node]:
+                node = self.left[node]
+            else:
+                node = self.right[node]
+        return int(node)
+
+    def insert(self, row: int, point: np.ndarray) -> None:
+        """Add a row to the bucket of the leaf containing its point."""
+        self.extra.setdefault(self.leaf_for(point), []).append(row)
+
+    def bucket(self, leaf: int) -> np.ndarray:
+        """Return every row stored in a leaf."""
+        rows = self.rows[self.start[leaf] : self.end[leaf]]
+        extra = self.extra.get(leaf)
+        if extra:
+            rows = np.concatenate([rows, extra])
+        return rows
+
+
+def _build_subtree(
+    block: np.ndarray, leaf_size: int, seed: Optional[int]
+) -> tuple[np.ndarray, ...]:
+    """Build a KDTree over block in a worker process and return its arrays.
+
+    Row numbers are positions in block; ``rows`` is returned last.
+    """
+    rng = None if seed is None else np.random.default_rng(seed)
+    tree = KDTree(block, np.arange(len(block)), leaf_size, rng)
+    return (
+        tree.split_dim,
+        tree.split_value,
+        tree.left,
+        tree.right,
+        tree.start,
+        tree.end,
+        tree.rows,
+    )
 
-    # Determine which subtree to search first
-    axis = node.axis
-    diff = target[axis] - node.point[axis]
 
-    if diff < 0:
-        first, second = node.left, node.right
-    else:
-        first, second = node.right, node.left
+class KDTreeIndex(VectorIndex):
+    """KD-Tree index for Euclidean distance search.
 
-    # Search the closer subtree first
-    kd_query(first, target, k, heap)
+    Points are stored in one float32 matrix and the tree in flat arrays
+    (see KDTree), so the build is O(n log n) partitions and a query is an
+    iterative best-first descent that scores whole leaf buckets at once.
 
-    # Check if we need to search the other subtree
-    if len(heap) < k or abs(diff) < -heap[0][0]:
-        kd_query(second, target, k, heap)
+    By default the search is exact. In high dimensions it ends up scoring
+    most points, so ``num_trees`` > 1 builds a forest of randomized trees
+    searched together best-bin-first, and ``max_checks`` > 0 stops the
+    search after scoring that many points, capping latency at the cost of
+    recall.
 
+    Added points join the bucket of their leaf and removed points are
+    only marked dead. Once the changes since the last build pass
+    REBALANCE_THRESHOLD of the live points, needs_compaction asks the
+    owner to rebuild the tree from the live points; changes never rebuild
+    it by themselves.
 
-class KDTreeIndex(VectorIndex):
-    """KD-Tree index for Euclidean distance search."""
+    With ``workers`` > 1, builds split the top of each tree here and build
+    the subtrees below it in that many processes, since the node loop is
+    pure Python and would hold the GIL for the whole build.
+    """
 
-    def __init__(self) -> None:
-        self._root: Optional[KDNode] = None
-        self._dim: int = 0
+    def __init__(
+        self,
+        num_trees: Optional[int] = None,
+        max_checks: Optional[int] = None,
+        seed: Optional[int] = None,
+        workers: Optional[int] = None,
+    ) -> None:
+        self._num_trees = settings.kdtree_num_trees if num_trees is None else num_trees
+        # 0 means "no budget", an exact search
+        self._max_checks = (
+            settings.kdtree_max_checks if max_checks is None else max_checks
+        )
+        self._seed = settings.kdtree_seed if seed is None else seed
+        self._workers = settings.index_build_workers if workers is None else workers
+        require_ints(
+            num_trees=self._num_trees,
+            max_checks=self._max_checks,
+            seed=self._seed,
+            workers=self._workers,
+        )
+        if self._num_trees < 1:
+            raise ValueError("num_trees must be positive")
+        if self._max_checks < 0:
+            raise ValueError("max_checks must not be negative")
+        if self._workers < 1:
+            raise ValueError("workers must be positive")
+        self._reset(0)
+
+    def _reset(self, dim: int) -> None:
+        self._dim = dim
+        self._data = np.empty((0, dim), dtype=np.float32)
+        self._alive = np.empty(0, dtype=bool)
+        self._ids: list[str] = []
+        self._row_of: dict[str, int] = {}
+        self._trees: list[KDTree] = []
+        self._changes = 0
 
     def build(self, vectors: list[list[float]], ids: list[str]) -> None:
         """Build the KD-Tree from vectors."""
         self._validate_inputs(vectors, ids)
 
         if not vectors:
-            self._root = None
-            self._dim = 0
+            self._reset(0)
             return
 
-        self._dim = len(vectors[0])
-        self._root = build_kd(vectors, ids)
-
-    def query(self, vector: list[float], k: int) -> list[tuple[str, float]]:
-        """Query for k nearest neighbors."""
+        self._build(np.asarray(vectors, dtype=np.float32), list(ids))
+
+    def _build(self, data: np.ndarray, ids: list[str]) -> None:
+        self._reset(data.shape[1])
+        self._data = np.ascontiguousarray(data)
+        self._alive = np.ones(len(ids), dtype=bool)
+        self._ids = ids
+        self._row_of = {point_id: row for row, point_id in enumerate(ids)}
+        rows = np.arange(len(ids))
+        shards = effective_workers(self._workers, len(ids)) * SUBTREES_PER_WORKER
+        with build_pool(self._workers, len(ids), processes=True) as pool:
+            if self._num_trees == 1:
+                self._trees = [KDTree(self._data, rows, pool=pool, shards=shards)]
+            else:
+                rng = np.random.default_rng(self._seed)
+                self._trees = [
+                    KDTree(self._data, rows, rng=rng, pool=pool, shards=shards)
+                    for _ in range(self._num_trees)
+                ]
+
+    def query(
+        self,
+        vector: list[float],
+        k: int,
+        max_checks: Optional[int] = None,
+        allowed: Optional[AbstractSet[str]] = None,
+        deadline: Optional[float] = None,
+    ) -> list[tuple[str, float]]:
+        """Query for k nearest neighbors.
+
+        Args:
+            vector: Query vector
+            k: Number of neighbors to return
+            max_checks: Number of points to score before stopping, defaults
+                to the index's max_checks. 0 searches exactly.
+            allowed: Ids that may be returned. Other points are skipped
+                during the search, or the allowed points are scored
+                directly when too few match for the tree to help.
+            deadline: ``time.monotonic()`` value at which the search stops
+                opening cells and returns the best points found so far
+        """
         if k <= 0:
             return []
 
         if self._dim and len(vector) != self._dim:
             raise ValueError("Query vector dimensionality mismatch")
 
-        heap: list[tuple[float, str]] = []
-        kd_query(self._root, vector, k, heap)
-
-        # Sort by distance (remember we used negative distances)
-        heap.sort(reverse=True)
+        if not self._row_of:
+            return []
 
+        checks = self._max_checks if max_checks is None else max_checks
+        query = np.asarray(vector, dtype=np.float32)
+        live = None
+        if allowed is not None:
+            rows = self._allowed_rows(allowed, self._row_of)
+            if filter_prefers_scan(len(rows), len(self._row_of), k):
+                return self._scan(query, rows, k)
+            live = np.zeros(len(self._ids), dtype=bool)
+            live[rows] = True
+        found = self._search(query, k, checks, live, deadline=deadline)
         # Convert to similarity scores (inverse of distance)
-        return [(pid, 1.0 / (1.0 + (-d))) for d, pid in heap]
+        return [
+            (self._ids[row], 1.0 / (1.0 + math.sqrt(max(sq_dist, 0.0))))
+            for sq_dist, row in found
+        ]
+
+    def query_batch(
+        self,
+        vectors: list[list[float]],
+        k: int,
+        allowed: Optional[AbstractSet[str]] = None,
+        max_checks: Optional[int] = None,
+        deadline: Optional[float] = None,
+    ) -> list[list[tuple[str, float]]]:
+        """Query for k nearest neighbors of each vector."""
+        if self._dim and any(len(vector) != self._dim for vector in vectors):
+            raise ValueError("Query vector dimensionality mismatch")
+        return [
+            self.query(vector, k, max_checks, allowed, deadline) for vector in vectors
+        ]
+
+    def range_query(
+        self,
+        vector: list[float],
+        min_score: float,
+        limit: int,
+        allowed: Optional[AbstractSet[str]] = None,
+    ) -> list[tuple[str, float]]:
+        """Return up to limit points within the radius that min_score implies.
+
+        Scores are 1 / (1 + distance), so the threshold is a radius, and
+        cells farther than it are never opened. The search is exact and
+        ignores max_checks.
+        """
+        if limit <= 0 or min_score > 1.0:
+            return []
+
+        if self._dim and len(vector) != self._dim:
+            raise ValueError("Query vector dimensionality mismatch")
+
+        if not self._row_of:
+            return []
+
+        max_sq_dist = math.inf
+        if min_score > 0:
+            max_sq_dist = (1.0 / min_score - 1.0) ** 2
+        live = None
+        if allowed is not None:
+            live = np.zeros(len(self._ids), dtype=bool)
+            live[self._allowed_rows(allowed, self._row_of)] = True
+        query = np.asarray(vector, dtype=np.float32)
+        found = self._search(query, limit, 0, live, max_sq_dist)
+        return [
+            (self._ids[row], 1.0 / (1.0 + math.sqrt(max(sq_dist, 0.0))))
+            for sq_dist, row in found
+        ]
+
+    def remove(self, ids: list[str]) -> None:
+        """Mark points dead; see needs_compaction."""
+        for point_id in ids:
+            row = self._row_of.pop(point_id, None)
+            if row is not None:
+                self._alive[row] = False
+                self._changes += 1
+
+    def needs_compaction(self) -> bool:
+        """Return whether the changes since the build pass REBALANCE_THRESHOLD."""
+        return self._changes > REBALANCE_THRESHOLD * len(self._row_of)
+
+    def size(self) -> int:
+        return len(self._row_of)
 
     def metric(self) -> str:
         """Return the distance metric."""
@@ -135,3 +463,146 @@ class KDTreeIndex(VectorIndex):
     def kind(self) -> str:
         """Return the index type."""
         return IndexAlgorithm.KDTREE.value
+
+    def params(self) -> dict[str, Any]:
+        """Return the forest parameters."""
+        return {
+            "num_trees": self._num_trees,
+            "max_checks": self._max_checks,
+            "seed": self._seed,
+        }
+
+    def ids(self) -> list[str]:
+        return list(self._row_of)
+
+    def _state(self) -> dict[str, Any]:
+        return {
+            "dim": self._dim,
+            "data": self._data[: len(self._ids)],
+            "alive": self._alive[: len(self._ids)],
+            "ids": self._ids,
+            "trees": [tree.state() for tree in self._trees],
+            "changes": self._changes,
+        }
+
+    def _load_state(self, state: dict[str, Any]) -> None:
+        self._reset(state["dim"])
+        self._data = state["data"]
+        self._alive = state["alive"]
+        self._ids = state["ids"]
+        alive = self._alive.tolist()
+        self._row_of = {
+            point_id: row for row, point_id in enumerate(self._ids) if alive[row]
+        }
+        self._trees = [KDTree.from_state(tree) for tree in state["trees"]]
+        self._changes = state["changes"]
+
+    def _append(self, ids: list[str], vectors: list[list[float]]) -> None:
+        self._validate_dim(vectors, self._dim)
+        points = np.asarray(vectors, dtype=np.float32)
+        start = len(self._ids)
+        self._data = reserve_rows(self._data, start, len(ids))
+        self._alive = reserve_rows(self._alive, start, len(ids))
+        self._data[start : start + len(ids)] = points
+        self._alive[start : start + len(ids)] = True
+        for offset, (point_id, point) in enumerate(zip(ids, points)):
+            self._ids.append(point_id)
+            self._row_of[point_id] = start + offset
+            for tree in self._trees:
+                tree.insert(start + offset, point)
+        self._changes += len(ids)
+
+    def _scan(
+        self, query: np.ndarray, rows: np.ndarray, k: int
+    ) -> list[tuple[str, float]]:
+        """Score the given rows directly and return the k nearest."""
+        diffs = self._data[rows] - query
+        sq_dists = np.einsum("ij,ij->i", diffs, diffs)
+        return [
+            (self._ids[rows[i]], 1.0 / (1.0 + math.sqrt(max(float(sq_dists[i]), 0.0))))
+            for i in top_k_indices(-sq_dists, k)
+        ]
+
+    def _search(
+        self,
+        query: np.ndarray,
+        k: int,
+        max_checks: int = 0,
+        live: Optional[np.ndarray] = None,
+        max_sq_dist: float = math.inf,
+        deadline: Optional[float] = None,
+    ) -> list[tuple[float, int]]:
+        """Best-first search returning up to k (squared distance, row) pairs.
+
+        Cells of every tree wait in one priority queue keyed by their
+        squared distance to the query, tracked incrementally from the
+        per-dimension offsets of the splits crossed to reach them. The
+        search stops as soon as the closest waiting cell cannot beat the
+        current k-th result, once max_checks points have been scored, or
+        once ``deadline`` passes with at least one result. Only rows set in
+        ``live`` (default: the undeleted ones) are scored, and only those
+        within ``max_sq_dist`` are returned.
+        """
+        live = self._alive if live is None else live
+        query_values = query.tolist()
+        trees = [tree.nodes for tree in self._trees]
+        # Rows already scored through another tree of the forest
+        seen = np.zeros(len(self._ids), dtype=bool) if len(trees) > 1 else None
+        checks = 0
+
+        # Max-heap of the best k results so far (negated distances)
+        results: list[tuple[float, int]] = []
+        # (cell distance, tree, node, squared offset per crossed split dimension)
+        cells: list[tuple[float, int, int, dict[int, float]]] = [
+            (0.0, tree_no, 0, {}) for tree_no in range(len(trees))
+        ]
+        while cells:
+            bound, tree_no, node, offsets = heappop(cells)
+            if len(results) == k and bound >= -results[0][0]:
+                break
+            # Cells come out nearest first, so the rest are outside the radius
+            if bound > max_sq_dist:
+                break
+            if max_checks and checks >= max_checks and len(results) == k:
+                break
+            if results and past_deadline(deadline):
+                break
+
+            # Descend to the query's leaf, queueing the far side of each split
+            split_dim, split_value, left, right = trees[tree_no]
+            while split_dim[node] >= 0:
+                dim = split_dim[node]
+                diff = query_values[dim] - split_value[node]
+                near, far = (
+                    (left[node], right[node]) if diff < 0 else (right[node], left[node])
+                )
+                far_bound = bound - offsets.get(dim, 0.0) + diff * diff
+                if far_bound <= max_sq_dist and (
+                    len(results) < k or far_bound < -results[0][0]
+                ):
+                    far_offsets = dict(offsets)
+                    far_offsets[dim] = diff * diff
+                    heappush(cells, (far_bound, tree_no, far, far_offsets))
+                node = near
+
+            rows = self._trees[tree_no].bucket(node)
+            if seen is not None:
+                rows = rows[~seen[rows]]
+                seen[rows] = True
+            rows = rows[live[rows]]
+            checks += len(rows)
+            diffs = self._data[rows] - query
+            sq_dists = np.einsum("ij,ij->i", diffs, diffs)
+            if max_sq_dist < math.inf:
+                inside = sq_dists <= max_sq_dist
+                rows, sq_dists = rows[inside], sq_dists[inside]
+            if len(results) == k:
+                closer = sq_dists < -results[0][0]
+                rows, sq_dists = rows[closer], sq_dists[closer]
+            for sq_dist, row in zip(sq_dists.tolist(), rows.tolist()):
+                if len(results) < k:
+                    heappush(results, (-sq_dist, row))
+                elif sq_dist < -results[0][0]:
+                    heapreplace(results, (-sq_dist, row))
+
+        return sorted((-neg, row) for neg, row in results)
@@ -1,43 +1,293 @@
 """Linear search index implementation."""
 
-from app.core.constants import DistanceMetric, IndexAlgorithm
-from app.vector_index import VectorIndex, cosine_similarity, euclidean_distance
+from typing import AbstractSet, Any, Optional
+
+import numpy as np
+
+from app.core.constants import DistanceMetric, IndexAlgorithm, VectorStorage
+from app.vector_index import (
+    VectorIndex,
+    normalize_rows,
+    require_ints,
+    reserve_rows,
+    scores_from_dots,
+    top_k_indices,
+)
+
+# Rows decoded per block when scanning compressed storage, bounds the
+# temporary float32 copy to a few MB regardless of library size
+SCAN_BLOCK_ROWS = 8192
+# Number of int8 quantization levels per dimension
+INT8_LEVELS = 255
 
 
 class LinearIndex(VectorIndex):
-    """Linear search index supporting multiple metrics."""
+    """Linear search index supporting multiple metrics.
+
+    Embeddings are kept in one contiguous matrix together with their
+    precomputed row norms, so a batch of queries is a single matrix product.
+    For cosine the rows and queries are normalized up front, so scores are
+    the dot products themselves.
+
+    ``storage`` selects the in-memory encoding: ``float32`` (exact),
+    ``float16`` (2x smaller) or ``int8`` (4x smaller, one byte per dimension
+    scaled between that dimension's min and max). Compressed rows are
+    decoded block by block during the scan, and the top ``rerank``
+    candidates can be re-scored at full precision by the caller through
+    rerank_candidates.
 
-    def __init__(self, metric: str = "cosine") -> None:
+    Rows live in a buffer that doubles when full, so add appends in
+    amortized O(1), and remove moves the last row into the freed slot.
+    Rows added after the build reuse the int8 ranges seen at build time.
+    """
+
+    def __init__(
+        self,
+        metric: str = "cosine",
+        storage: str = VectorStorage.FLOAT32.value,
+        rerank: Optional[int] = None,
+    ) -> None:
         # Store as enum value for consistency
         self._metric = DistanceMetric(metric).value
-        self._vectors: list[list[float]] = []
+        self._storage = VectorStorage(storage).value
+        self._rerank = 0 if rerank is None else rerank
+        require_ints(rerank=self._rerank)
+        if self._rerank < 0:
+            raise ValueError("rerank must not be negative")
+        self._reset(0)
+
+    def _reset(self, dim: int) -> None:
+        dtype = {
+            VectorStorage.FLOAT32.value: np.float32,
+            VectorStorage.FLOAT16.value: np.float16,
+            VectorStorage.INT8.value: np.uint8,
+        }[self._storage]
+        self._buffer = np.empty((0, dim), dtype=dtype)
+        self._norm_buffer = np.empty(0, dtype=np.float64)
         self._ids: list[str] = []
+        self._positions: dict[str, int] = {}
+        # int8 decoding: value = offset + scale * code, per dimension
+        self._offset = np.zeros(dim, dtype=np.float32)
+        self._scale = np.ones(dim, dtype=np.float32)
 
     def build(self, vectors: list[list[float]], ids: list[str]) -> None:
         self._validate_inputs(vectors, ids)
-        self._vectors = vectors
-        self._ids = ids
+        if not vectors:
+            self._reset(0)
+            return
+
+        data = self._prepare(np.ascontiguousarray(vectors, dtype=np.float32))
+        self._reset(data.shape[1])
+        if self._storage == VectorStorage.INT8.value:
+            self._fit_int8(data)
+        self._buffer = self._encode(data)
+        self._ids = list(ids)
+        self._positions = {cid: i for i, cid in enumerate(self._ids)}
+        self._norm_buffer = np.concatenate(
+            [self._row_norms(block) for block in self._blocks()]
+        )
+
+    def remove(self, ids: list[str]) -> None:
+        """Drop rows by moving the last row into each freed slot."""
+        for cid in ids:
+            pos = self._positions.pop(cid, None)
+            if pos is None:
+                continue
+            last = len(self._ids) - 1
+            if pos != last:
+                moved = self._ids[last]
+                self._buffer[pos] = self._buffer[last]
+                self._norm_buffer[pos] = self._norm_buffer[last]
+                self._ids[pos] = moved
+                self._positions[moved] = pos
+            self._ids.pop()
+
+    def size(self) -> int:
+        return len(self._ids)
 
-    def query(self, vector: list[float], k: int) -> list[tuple[str, float]]:
-        if not self._vectors or k <= 0:
+    def _append(self, ids: list[str], vectors: list[list[float]]) -> None:
+        self._validate_dim(vectors, self._buffer.shape[1])
+        rows = self._encode(self._prepare(np.asarray(vectors, dtype=np.float32)))
+        start = len(self._ids)
+        self._buffer = reserve_rows(self._buffer, start, len(ids))
+        self._norm_buffer = reserve_rows(self._norm_buffer, start, len(ids))
+        self._buffer[start : start + len(ids)] = rows
+        self._norm_buffer[start : start + len(ids)] = self._row_norms(rows)
+        for offset, cid in enumerate(ids):
+            self._positions[cid] = start + offset
+        self._ids.extend(ids)
+
+    @property
+    def _matrix(self) -> np.ndarray:
+        """The stored rows currently in use."""
+        return self._buffer[: len(self._ids)]
+
+    @property
+    def _norms(self) -> np.ndarray:
+        """Norms of the decoded rows currently in use."""
+        return self._norm_buffer[: len(self._ids)]
+
+    def query(
+        self,
+        vector: list[float],
+        k: int,
+        allowed: Optional[AbstractSet[str]] = None,
+    ) -> list[tuple[str, float]]:
+        return self.query_batch([vector], k, allowed)[0]
+
+    def query_batch(
+        self,
+        vectors: list[list[float]],
+        k: int,
+        allowed: Optional[AbstractSet[str]] = None,
+    ) -> list[list[tuple[str, float]]]:
+        """Score all queries with one matrix-matrix product.
+
+        With ``allowed`` only the allowed rows are gathered and scored.
+        """
+        if not self._ids or k <= 0 or not vectors:
+            return [[] for _ in vectors]
+
+        if any(len(vector) != self._matrix.shape[1] for vector in vectors):
+            raise ValueError("Query vector dimensionality mismatch")
+
+        rows = None if allowed is None else self._allowed_rows(allowed, self._positions)
+        queries = self._prepare(np.asarray(vectors, dtype=np.float32))
+        scores = self._score(queries, rows)
+        ids = self._ids if rows is None else [self._ids[row] for row in rows.tolist()]
+        results = []
+        for row in scores:
+            top = top_k_indices(row, k)
+            results.append([(ids[i], float(row[i])) for i in top])
+        return results
+
+    def range_query(
+        self,
+        vector: list[float],
+        min_score: float,
+        limit: int,
+        allowed: Optional[AbstractSet[str]] = None,
+    ) -> list[tuple[str, float]]:
+        """Score every (allowed) row once and keep those above min_score."""
+        if not self._ids or limit <= 0:
             return []
 
-        self._validate_query_dim(vector, self._vectors)
-        scores: list[tuple[str, float]] = []
-        if self._metric == DistanceMetric.COSINE.value:
-            for cid, vec in zip(self._ids, self._vectors):
-                scores.append((cid, cosine_similarity(vector, vec)))
-            scores.sort(key=lambda x: x[1], reverse=True)
-        else:
-            for cid, vec in zip(self._ids, self._vectors):
-                dist = euclidean_distance(vector, vec)
-                sim = 1.0 / (1.0 + dist)
-                scores.append((cid, sim))
-            scores.sort(key=lambda x: x[1], reverse=True)
-        return scores[:k]
+        if len(vector) != self._matrix.shape[1]:
+            raise ValueError("Query vector dimensionality mismatch")
+
+        rows = None if allowed is None else self._allowed_rows(allowed, self._positions)
+        query = self._prepare(np.asarray([vector], dtype=np.float32))
+        scores = self._score(query, rows)[0]
+        hits = np.flatnonzero(scores >= min_score)
+        top = hits[top_k_indices(scores[hits], limit)]
+        if rows is not None:
+            return [(self._ids[rows[i]], float(scores[i])) for i in top]
+        return [(self._ids[i], float(scores[i])) for i in top]
 
     def metric(self) -> str:
         return self._metric
 
     def kind(self) -> str:
         return IndexAlgorithm.LINEAR.value
+
+    def params(self) -> dict[str, Any]:
+        """Return the storage parameters."""
+        return {"storage": self._storage, "rerank": self._rerank}
+
+    def rerank_candidates(self) -> int:
+        """Return how many candidates should be re-scored exactly."""
+        if self._storage == VectorStorage.FLOAT32.value:
+            return 0
+        return self._rerank
+
+    def ids(self) -> list[str]:
+        return list(self._ids)
+
+    def _state(self) -> dict[str, Any]:
+        return {
+            "rows": self._matrix,
+            "norms": self._norms,
+            "ids": self._ids,
+            "offset": self._offset,
+            "scale": self._scale,
+        }
+
+    def _load_state(self, state: dict[str, Any]) -> None:
+        self._reset(state["rows"].shape[1])
+        self._buffer = state["rows"]
+        self._norm_buffer = state["norms"]
+        self._ids = state["ids"]
+        self._positions = {cid: i for i, cid in enumerate(self._ids)}
+        self._offset = state["offset"]
+        self._scale = state["scale"]
+
+    def _prepare(self, vectors: np.ndarray) -> np.ndarray:
+        """Normalize rows for cosine so similarity is a plain dot product."""
+        if self._metric == DistanceMetric.COSINE.value:
+            return normalize_rows(vectors)
+        return vectors
+
+    def _fit_int8(self, data: np.ndarray) -> None:
+        """Pick each dimension's int8 range from the data being built."""
+        low = data.min(axis=0)
+        span = data.max(axis=0) - low
+        self._offset = low
+        self._scale = np.where(span > 0, span / INT8_LEVELS, 1.0).astype(np.float32)
+
+    def _encode(self, data: np.ndarray) -> np.ndarray:
+        """Convert float32 rows into the configured storage format."""
+        if self._storage == VectorStorage.FLOAT32.value:
+            return data
+        if self._storage == VectorStorage.FLOAT16.value:
+            return data.astype(np.float16)
+
+        # Values outside the build-time range saturate
+        codes = np.rint((data - self._offset) / self._scale)
+        return np.clip(codes, 0, INT8_LEVELS).astype(np.uint8)
+
+    def _decode(self, block: np.ndarray) -> np.ndarray:
+        """Convert stored rows back to approximate float32 vectors."""
+        if self._storage == VectorStorage.INT8.value:
+            return self._offset + self._scale * block.astype(np.float32)
+        return block.astype(np.float32, copy=False)
+
+    def _row_norms(self, rows: np.ndarray) -> np.ndarray:
+        return np.linalg.norm(self._decode(rows), axis=1).astype(np.float64)
+
+    def _blocks(self, matrix: Optional[np.ndarray] = None):
+        """Yield the stored matrix in SCAN_BLOCK_ROWS-sized row blocks."""
+        matrix = self._matrix if matrix is None else matrix
+        for start in range(0, matrix.shape[0], SCAN_BLOCK_ROWS):
+            yield matrix[start : start + SCAN_BLOCK_ROWS]
+
+    def _score(
+        self, queries: np.ndarray, rows: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """Score the stored rows (all, or the given ones) against each query."""
+        matrix = self._matrix if rows is None else self._matrix[rows]
+        if not len(matrix):
+            return np.empty((len(queries), 0), dtype=np.float64)
+
+        if self._storage == VectorStorage.FLOAT32.value:
+            dots = queries @ matrix.T
+        elif self._storage == VectorStorage.FLOAT16.value:
+            dots = np.concatenate(
+                [
+                    queries @ block.astype(np.float32).T
+                    for block in self._blocks(matrix)
+                ],
+                axis=1,
+            )
+        else:
+            # q . (offset + scale * c) = q . offset + (q * scale) . c
+            scaled = queries * self._scale
+            dots = np.concatenate(
+                [scaled @ block.astype(np.float32).T for block in self._blocks(matrix)],
+                axis=1,
+            )
+            dots += (queries @ self._offset)[:, None]
+        # Cosine rows and queries are unit length, no norms needed
+        norms = None
+        if self._metric != DistanceMetric.COSINE.value:
+            norms = self._norms if rows is None else self._norms[rows]
+        return scores_from_dots(dots.astype(np.float64), queries, norms, self._metric)
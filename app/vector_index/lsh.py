@@ -1,111 +1,204 @@
 """LSH (Locality Sensitive Hashing) index implementation for cosine similarity."""
 
-import random
+from __future__ import annotations
+
+import threading
+from concurrent.futures import Executor
+from heapq import heappop, heappush
+from typing import AbstractSet, Any, Iterator, Optional
+
+import numpy as np
 
 from app.core import settings
 from app.core.constants import DistanceMetric, IndexAlgorithm
-from app.vector_index import VectorIndex, cosine_similarity
+from app.vector_index import (
+    VectorIndex,
+    normalize_rows,
+    past_deadline,
+    require_ints,
+    reserve_rows,
+    top_k_indices,
+)
+from app.vector_index.parallel import build_pool, effective_workers, pool_map
+from app.vector_index.serialization import pack_lists, unpack_lists
+
+# Repack the bucket arrays once rows added or removed since the last pack
+# exceed this fraction of the packed rows
+REPACK_THRESHOLD = 0.25
 
 
 class LSHIndex(VectorIndex):
-    """LSH index using random hyperplanes for cosine similarity."""
+    """LSH index using random hyperplanes for cosine similarity.
+
+    The hyperplanes of all tables form one (num_tables * num_planes, dim)
+    projection matrix, so hashing any number of vectors is a single matrix
+    product. Vectors live normalized in one shared float32 matrix, so
+    candidates are scored with plain dot products, and each table
+    stores its buckets CSR-style: int32 row numbers sorted by signature,
+    plus the sorted distinct signatures and their offsets into the rows.
+
+    Besides its own bucket, a query probes up to ``probes`` neighboring
+    buckets across all tables, cheapest first: flipping a bit costs the
+    squared margin between the query and that bit's hyperplane, so the
+    buckets on the other side of the nearest hyperplanes come first.
+
+    Rows added after a pack wait in small per-table dicts and removed rows
+    are only marked dead. Once both together pass REPACK_THRESHOLD of the
+    packed rows, needs_compaction asks the owner to rebuild the index so
+    they are packed; changes never repack by themselves.
+
+    With ``workers`` > 1, builds hash row partitions and sort the tables
+    on that many threads; both run in numpy kernels that release the GIL.
+    """
 
     def __init__(
         self,
-        num_planes: int = settings.lsh_num_planes,
-        num_tables: int = settings.lsh_num_tables,
-        seed: int = settings.lsh_seed,
+        num_planes: Optional[int] = None,
+        num_tables: Optional[int] = None,
+        probes: Optional[int] = None,
+        seed: Optional[int] = None,
+        workers: Optional[int] = None,
     ) -> None:
-        self._num_planes = num_planes
-        self._num_tables = num_tables
-        self._tables: list[dict[int, list[tuple[str, list[float]]]]] = []
-        self._planes: list[list[list[float]]] = []
-        self._seed = seed
-        self._dim: int = 0
+        self._num_planes = settings.lsh_num_planes if num_planes is None else num_planes
+        self._num_tables = settings.lsh_num_tables if num_tables is None else num_tables
+        self._probes = settings.lsh_probes if probes is None else probes
+        self._seed = settings.lsh_seed if seed is None else seed
+        self._workers = settings.index_build_workers if workers is None else workers
+        require_ints(
+            num_planes=self._num_planes,
+            num_tables=self._num_tables,
+            probes=self._probes,
+            seed=self._seed,
+            workers=self._workers,
+        )
+        if not 1 <= self._num_planes <= 62:
+            raise ValueError("num_planes must be between 1 and 62")
+        if self._num_tables < 1:
+            raise ValueError("num_tables must be positive")
+        if self._probes < 0:
+            raise ValueError("probes must not be negative")
+        if self._workers < 1:
+            raise ValueError("workers must be positive")
+        self._weights = np.left_shift(1, np.arange(self._num_planes, dtype=np.int64))
+        # Per-thread dedup scratch array, reused across queries
+        self._local = threading.local()
+        self._reset(0)
 
-    def _hash(self, vec: list[float], planes: list[list[float]]) -> int:
-        """Compute hash signature for a vector using hyperplanes.
-
-        Uses bitwise operations for efficiency instead of string concatenation.
-        """
-        signature = 0
-        for i, plane in enumerate(planes):
-            if sum(v * p for v, p in zip(vec, plane)) >= 0:
-                signature |= 1 << i
-        return signature
+    def _reset(self, dim: int) -> None:
+        self._dim = dim
+        self._planes = np.empty((0, dim), dtype=np.float32)
+        self._data = np.empty((0, dim), dtype=np.float32)
+        self._alive = np.empty(0, dtype=bool)
+        # Signature of every row in every table, used when repacking
+        self._row_signatures = np.empty((0, self._num_tables), dtype=np.int64)
+        self._ids: list[str] = []
+        self._row_of: dict[str, int] = {}
+        # CSR buckets per table: sorted signatures, offsets, rows
+        self._bucket_keys = [np.empty(0, dtype=np.int64)] * self._num_tables
+        self._bucket_offsets = [np.zeros(1, dtype=np.int64)] * self._num_tables
+        self._bucket_rows = [np.empty(0, dtype=np.int32)] * self._num_tables
+        self._pending: list[dict[int, list[int]]] = [
+            {} for _ in range(self._num_tables)
+        ]
+        self._packed_rows = 0
+        self._dead_rows = 0
 
     def build(self, vectors: list[list[float]], ids: list[str]) -> None:
         """Build LSH tables from vectors."""
         self._validate_inputs(vectors, ids)
 
         if not vectors:
-            self._tables = []
-            self._planes = []
-            self._dim = 0
+            self._reset(0)
             return
 
-        dim = len(vectors[0])
-        self._dim = dim
-        rng = random.Random(self._seed)
-
-        # Generate random hyperplanes for each table
-        self._planes = []
-        for _ in range(self._num_tables):
-            table_planes = []
-            for _ in range(self._num_planes):
-                # Generate random unit vector as hyperplane normal
-                plane = [rng.gauss(0, 1) for _ in range(dim)]
-                norm = sum(x * x for x in plane) ** 0.5
-                plane = [x / norm for x in plane]
-                table_planes.append(plane)
-            self._planes.append(table_planes)
-
-        # Build hash tables
-        self._tables = [{} for _ in range(self._num_tables)]
-        for vec, vec_id in zip(vectors, ids):
-            for i, planes in enumerate(self._planes):
-                signature = self._hash(vec, planes)
-                if signature not in self._tables[i]:
-                    self._tables[i][signature] = []
-                self._tables[i][signature].append((vec_id, vec))
-
-    def query(self, vector: list[float], k: int) -> list[tuple[str, float]]:
-        """Query for k nearest neighbors with multi-probe."""
-        if k <= 0:
-            return []
+        data = np.asarray(vectors, dtype=np.float32)
+        self._reset(data.shape[1])
+        rng = np.random.default_rng(self._seed)
+        planes = rng.standard_normal(
+            (self._num_tables * self._num_planes, self._dim)
+        ).astype(np.float32)
+        self._planes = planes / np.linalg.norm(planes, axis=1, keepdims=True)
+        with build_pool(self._workers, len(ids)) as pool:
+            self._store(list(ids), data, pool)
+            self._pack(pool)
+
+    def query(
+        self,
+        vector: list[float],
+        k: int,
+        probes: Optional[int] = None,
+        allowed: Optional[AbstractSet[str]] = None,
+        deadline: Optional[float] = None,
+    ) -> list[tuple[str, float]]:
+        """Query for k nearest neighbors with multi-probe.
+
+        Args:
+            vector: Query vector
+            k: Number of neighbors to return
+            probes: Extra buckets to visit across all tables, defaults to
+                the index's probes. Larger values trade latency for recall.
+            allowed: Ids that may be returned. Candidates outside it are
+                dropped, and when fewer than k allowed candidates turn up
+                all allowed rows are scored exactly.
+            deadline: ``time.monotonic()`` value after which queries only
+                visit their own bucket in each table, skipping the probes
+        """
+        return self.query_batch([vector], k, probes, allowed, deadline)[0]
 
-        if self._dim and len(vector) != self._dim:
+    def query_batch(
+        self,
+        vectors: list[list[float]],
+        k: int,
+        probes: Optional[int] = None,
+        allowed: Optional[AbstractSet[str]] = None,
+        deadline: Optional[float] = None,
+    ) -> list[list[tuple[str, float]]]:
+        """Query many vectors, hashing all of them in one product."""
+        if k <= 0 or not vectors:
+            return [[] for _ in vectors]
+
+        if self._dim and any(len(vector) != self._dim for vector in vectors):
             raise ValueError("Query vector dimensionality mismatch")
 
-        # Collect candidates from all tables with multi-probe
-        candidates: dict[str, list[float]] = {}
-        for i, planes in enumerate(self._planes):
-            signature = self._hash(vector, planes)
-
-            # Query exact signature
-            if signature in self._tables[i]:
-                for vec_id, vec in self._tables[i][signature]:
-                    if vec_id not in candidates:
-                        candidates[vec_id] = vec
-
-            # Multi-probe: flip 1-2 bits for better recall
-            for bit_flip in range(min(2, self._num_planes)):
-                # Flip bit at position bit_flip
-                probed_sig = signature ^ (1 << bit_flip)
-                if probed_sig in self._tables[i]:
-                    for vec_id, vec in self._tables[i][probed_sig]:
-                        if vec_id not in candidates:
-                            candidates[vec_id] = vec
-
-        # Score all candidates
-        scores = [
-            (vec_id, cosine_similarity(vector, vec))
-            for vec_id, vec in candidates.items()
-        ]
+        if not self._row_of:
+            return [[] for _ in vectors]
+
+        queries = normalize_rows(np.asarray(vectors, dtype=np.float32))
+        projections = self._project(queries)
+        signatures = self._signatures(projections)
+        budget = self._probes if probes is None else probes
+        if allowed is not None:
+            allowed_rows = self._allowed_rows(allowed, self._row_of)
+            mask = np.zeros(len(self._ids), dtype=bool)
+            mask[allowed_rows] = True
 
-        # Sort by similarity and return top k
-        scores.sort(key=lambda x: x[1], reverse=True)
-        return scores[:k]
+        results = []
+        for query, proj, sigs in zip(queries, projections, signatures):
+            if budget and past_deadline(deadline):
+                budget = 0
+            rows = self._collect_candidates(proj, sigs, budget)
+            if allowed is not None:
+                rows = rows[mask[rows]]
+                if len(rows) < k:
+                    rows = allowed_rows
+            results.append(self._rank(query, rows, k))
+        return results
+
+    def remove(self, ids: list[str]) -> None:
+        """Mark rows dead; see needs_compaction."""
+        for vec_id in ids:
+            row = self._row_of.pop(vec_id, None)
+            if row is not None:
+                self._alive[row] = False
+                self._dead_rows += 1
+
+    def needs_compaction(self) -> bool:
+        """Return whether unpacked changes pass REPACK_THRESHOLD."""
+        changes = len(self._ids) - self._packed_rows + self._dead_rows
+        return changes > REPACK_THRESHOLD * self._packed_rows
+
+    def size(self) -> int:
+        return len(self._row_of)
 
     def metric(self) -> str:
         """Return the distance metric."""
@@ -114,3 +207,223 @@ class LSHIndex(VectorIndex):
     def kind(self) -> str:
         """Return the index type."""
         return IndexAlgorithm.LSH.value
+
+    def params(self) -> dict[str, Any]:
+        """Return the hashing parameters."""
+        return {
+            "num_planes": self._num_planes,
+            "num_tables": self._num_tables,
+            "probes": self._probes,
+            "seed": self._seed,
+        }
+
+    def ids(self) -> list[str]:
+        return list(self._row_of)
+
+    def _state(self) -> dict[str, Any]:
+        count = len(self._ids)
+        return {
+            "dim": self._dim,
+            "planes": self._planes,
+            "data": self._data[:count],
+            "alive": self._alive[:count],
+            "row_signatures": self._row_signatures[:count],
+            "ids": self._ids,
+            "bucket_keys": self._bucket_keys,
+            "bucket_offsets": self._bucket_offsets,
+            "bucket_rows": self._bucket_rows,
+            "pending": [pack_lists(pending) for pending in self._pending],
+            "packed_rows": self._packed_rows,
+            "dead_rows": self._dead_rows,
+        }
+
+    def _load_state(self, state: dict[str, Any]) -> None:
+        self._reset(state["dim"])
+        self._planes = state["planes"]
+        self._data = state["data"]
+        self._alive = state["alive"]
+        self._row_signatures = state["row_signatures"]
+        self._ids = state["ids"]
+        alive = self._alive.tolist()
+        self._row_of = {
+            vec_id: row for row, vec_id in enumerate(self._ids) if alive[row]
+        }
+        self._bucket_keys = state["bucket_keys"]
+        self._bucket_offsets = state["bucket_offsets"]
+        self._bucket_rows = state["bucket_rows"]
+        self._pending = [unpack_lists(pending) for pending in state["pending"]]
+        self._packed_rows = state["packed_rows"]
+        self._dead_rows = state["dead_rows"]
+
+    def _append(self, ids: list[str], vectors: list[list[float]]) -> None:
+        self._validate_dim(vectors, self._dim)
+        start = len(self._ids)
+        self._store(ids, np.asarray(vectors, dtype=np.float32))
+        for row in range(start, len(self._ids)):
+            for pending, signature in zip(
+                self._pending, self._row_signatures[row].tolist()
+            ):
+                pending.setdefault(signature, []).append(row)
+
+    def _store(
+        self, ids: list[str], data: np.ndarray, pool: Optional[Executor] = None
+    ) -> None:
+        """Normalize rows into the shared matrix and hash them."""
+        start, count = len(self._ids), len(ids)
+        self._data = reserve_rows(self._data, start, count)
+        self._alive = reserve_rows(self._alive, start, count)
+        self._row_signatures = reserve_rows(self._row_signatures, start, count)
+        self._alive[start : start + count] = True
+        parts = effective_workers(self._workers, count)
+        bounds = np.linspace(start, start + count, parts + 1).astype(int).tolist()
+
+        def hash_part(lo: int, hi: int) -> None:
+            block = normalize_rows(data[lo - start : hi - start])
+            self._data[lo:hi] = block
+            self._row_signatures[lo:hi] = self._signatures(self._project(block))
+
+        pool_map(pool, hash_part, bounds[:-1], bounds[1:])
+        for offset, vec_id in enumerate(ids):
+            self._row_of[vec_id] = start + offset
+        self._ids.extend(ids)
+
+    def _pack(self, pool: Optional[Executor] = None) -> None:
+        """Drop dead rows and rebuild every table's CSR bucket arrays."""
+        live = np.flatnonzero(self._alive[: len(self._ids)])
+        if len(live) < len(self._ids):
+            self._data = self._data[live]
+            self._alive = np.ones(len(live), dtype=bool)
+            self._row_signatures = self._row_signatures[live]
+            self._ids = [self._ids[row] for row in live.tolist()]
+            self._row_of = {vec_id: row for row, vec_id in enumerate(self._ids)}
+
+        count = len(self._ids)
+
+        def pack_table(table: int) -> None:
+            signatures = self._row_signatures[:count, table]
+            order = np.argsort(signatures, kind="stable")
+            keys, starts = np.unique(signatures[order], return_index=True)
+            self._bucket_keys[table] = keys
+            self._bucket_offsets[table] = np.append(starts, count).astype(np.int64)
+            self._bucket_rows[table] = order.astype(np.int32)
+
+        pool_map(pool, pack_table, range(self._num_tables))
+        self._pending = [{} for _ in range(self._num_tables)]
+        self._packed_rows = count
+        self._dead_rows = 0
+
+    def _project(self, vectors: np.ndarray) -> np.ndarray:
+        """Signed margins to every hyperplane, shape (n, tables, planes)."""
+        return (vectors @ self._planes.T).reshape(
+            len(vectors), self._num_tables, self._num_planes
+        )
+
+    def _signatures(self, projections: np.ndarray) -> np.ndarray:
+        """Pack the sign bits of projections into (n, tables) signatures."""
+        return (projections >= 0).astype(np.int64) @ self._weights
+
+    def _probe_sequence(
+        self, projection: np.ndarray, signatures: list[int]
+    ) -> Iterator[tuple[int, int]]:
+        """Yield (table, signature) pairs, cheapest perturbations first.
+
+        Each table's bits are ordered by squared margin, and flip sets are
+        generated best-first by the usual shift / expand steps over that
+        order, so every table's own bucket (the empty flip set) comes out
+        before any neighbor.
+        """
+        margins = projection.astype(np.float64) ** 2
+        order = np.argsort(margins, axis=1)
+        costs = np.take_along_axis(margins, order, axis=1).tolist()
+        order = order.tolist()
+
+        for table, signature in enumerate(signatures):
+            yield table, signature
+
+        # (cost, table, flip set as positions into the table's margin order)
+        heap: list[tuple[float, int, tuple[int, ...]]] = [
+            (costs[table][0], table, (0,)) for table in range(self._num_tables)
+        ]
+        while heap:
+            cost, table, flips = heappop(heap)
+            signature = signatures[table]
+            for pos in flips:
+                signature ^= 1 << order[table][pos]
+            yield table, signature
+
+            last = flips[-1]
+            if last + 1 < self._num_planes:
+                step = costs[table][last + 1]
+                # Expand: also flip the next bit
+                heappush(heap, (cost + step, table, flips + (last + 1,)))
+                # Shift: flip the next bit instead of the last one
+                shifted = flips[:-1] + (last + 1,)
+                heappush(heap, (cost - costs[table][last] + step, table, shifted))
+
+    def _buckets(self, table: int, signatures: list[int]) -> list[np.ndarray]:
+        """Return the rows stored under each signature of one table."""
+        keys = self._bucket_keys[table]
+        offsets = self._bucket_offsets[table]
+        rows = self._bucket_rows[table]
+        wanted = np.asarray(signatures, dtype=np.int64)
+        positions = np.minimum(np.searchsorted(keys, wanted), len(keys) - 1)
+        hits = positions[keys[positions] == wanted] if len(keys) else positions[:0]
+        buckets = [
+            rows[start:end]
+            for start, end in zip(offsets[hits].tolist(), offsets[hits + 1].tolist())
+        ]
+        pending = self._pending[table]
+        if pending:
+            for signature in signatures:
+                extra = pending.get(signature)
+                if extra:
+                    buckets.append(np.asarray(extra, dtype=np.int32))
+        return buckets
+
+    def _marks(self) -> np.ndarray:
+        """Return this thread's scratch array with a slot per row."""
+        marks = getattr(self._local, "marks", None)
+        if marks is None or len(marks) < len(self._ids):
+            marks = np.empty(max(len(self._ids), 1), dtype=np.int32)
+            self._local.marks = marks
+        return marks
+
+    def _collect_candidates(
+        self, projection: np.ndarray, signatures: np.ndarray, probes: int
+    ) -> np.ndarray:
+        """Collect distinct live rows from each table's bucket plus probes."""
+        visits = self._num_tables + probes
+        per_table: list[list[int]] = [[] for _ in range(self._num_tables)]
+        for (table, signature), _ in zip(
+            self._probe_sequence(projection, signatures.tolist()), range(visits)
+        ):
+            per_table[table].append(signature)
+
+        found = []
+        for table, table_signatures in enumerate(per_table):
+            if table_signatures:
+                found.extend(self._buckets(table, table_signatures))
+        if not found:
+            return np.empty(0, dtype=np.int32)
+
+        candidates = np.concatenate(found)
+        # Dedup without sorting or clearing: every candidate writes its
+        # position into its row's slot, and only the last writer of each
+        # row reads its own position back
+        marks = self._marks()
+        positions = np.arange(len(candidates), dtype=np.int32)
+        marks[candidates] = positions
+        candidates = candidates[marks[candidates] == positions]
+        return candidates[self._alive[candidates]]
+
+    def _rank(
+        self, query: np.ndarray, rows: np.ndarray, k: int
+    ) -> list[tuple[str, float]]:
+        """Score all candidates exactly and return the top k."""
+        if not len(rows):
+            return []
+        # Rows and query are unit length, so cosine is the dot product
+        scores = np.clip((self._data[rows] @ query).astype(np.float64), -1.0, 1.0)
+        return [
+            (self._ids[rows[i]], float(scores[i])) for i in top_k_indices(scores, k)
+        ]
@@ -0,0 +1,63 @@
+"""Worker pools for building an index's partitions in parallel."""
+
+from __future__ import annotations
+
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Iterable, Iterator, Optional
+
+# Fewer rows than this per worker cost more to hand out than to build inline
+MIN_ROWS_PER_WORKER = 5000
+
+
+def _process_context() -> multiprocessing.context.BaseContext:
+    """Start processes from a fork server where available, else spawn them.
+
+    Forking the server itself is unsafe while other threads hold locks; a
+    fork server is started once and forks clean, already-imported workers
+    after that.
+    """
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload(["app.vector_index"])
+        return context
+    return multiprocessing.get_context("spawn")
+
+
+def effective_workers(workers: int, rows: int) -> int:
+    """Cap workers so each gets at least MIN_ROWS_PER_WORKER rows."""
+    return max(1, min(workers, rows // MIN_ROWS_PER_WORKER))
+
+
+@contextmanager
+def build_pool(
+    workers: int, rows: int, processes: bool = False
+) -> Iterator[Optional[Executor]]:
+    """Yield an executor for a build over rows, or None to build inline.
+
+    Workers are capped by effective_workers. Threads suit builds whose
+    partitions run in numpy kernels that release the GIL; ``processes``
+    suits pure-Python partition builds.
+    """
+    workers = effective_workers(workers, rows)
+    if workers == 1:
+        yield None
+        return
+
+    executor: Executor
+    if processes:
+        executor = ProcessPoolExecutor(workers, mp_context=_process_context())
+    else:
+        executor = ThreadPoolExecutor(workers, thread_name_prefix="index-build")
+    with executor:
+        yield executor
+
+
+def pool_map(
+    pool: Optional[Executor], fn: Callable[..., Any], *iterables: Iterable[Any]
+) -> list[Any]:
+    """Map fn over iterables on pool, in order, or inline without one."""
+    if pool is None:
+        return list(map(fn, *iterables))
+    return list(pool.map(fn, *iterables))
@@ -0,0 +1,139 @@
+"""Versioned binary encoding of built index state.
+
+A blob is laid out as::
+
+    magic | format version | header length | JSON header | arrays | SHA-256
+
+The JSON header describes the index (kind, metric, params) and holds its
+state, with every numpy array replaced by a reference into the array
+section, where arrays are stored raw and 8-byte aligned. The trailing
+SHA-256 digest covers everything before it, so truncated or corrupted
+files are rejected instead of producing a broken index.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import struct
+from typing import Any
+
+import numpy as np
+
+MAGIC = b"VDBINDEX"
+# Bump when the layout or any index's state changes incompatibly
+FORMAT_VERSION = 1
+
+_PREFIX = struct.Struct("<8sHQ")
+_DIGEST_SIZE = hashlib.sha256().digest_size
+_ALIGNMENT = 8
+_ARRAY_KEY = "__array__"
+
+
+def encode_state(descriptor: dict[str, Any], state: dict[str, Any]) -> bytes:
+    """Encode an index descriptor and its state as one blob.
+
+    ``state`` may nest dicts with string keys, lists, tuples (decoded as
+    lists), JSON scalars and numpy arrays of non-object dtypes.
+    """
+    arrays: list[np.ndarray] = []
+    layout: list[dict[str, Any]] = []
+
+    def encode(value: Any) -> Any:
+        if isinstance(value, np.ndarray):
+            if value.dtype.hasobject:
+                raise ValueError("Object arrays cannot be serialized")
+            arrays.append(np.ascontiguousarray(value))
+            return {_ARRAY_KEY: len(arrays) - 1}
+        if isinstance(value, np.generic):
+            return value.item()
+        if isinstance(value, dict):
+            return {str(key): encode(item) for key, item in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [encode(item) for item in value]
+        return value
+
+    tree = encode(state)
+    offset = 0
+    for array in arrays:
+        layout.append(
+            {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+        )
+        offset += -(-array.nbytes // _ALIGNMENT) * _ALIGNMENT
+
+    header = json.dumps(
+        {"index": descriptor, "state": tree, "arrays": layout}, separators=(",", ":")
+    ).encode("utf-8")
+    header += b" " * (-(_PREFIX.size + len(header)) % _ALIGNMENT)
+
+    parts = [_PREFIX.pack(MAGIC, FORMAT_VERSION, len(header)), header]
+    for array in arrays:
+        parts.append(array.tobytes())
+        parts.append(b"\0" * (-array.nbytes % _ALIGNMENT))
+    body = b"".join(parts)
+    return body + hashlib.sha256(body).digest()
+
+
+def decode_state(payload: bytes) -> tuple[dict[str, Any], dict[str, Any]]:
+    """Decode a blob from encode_state into (descriptor, state).
+
+    Arrays come back as writable copies. Raises ValueError for a blob that
+    is not an index, fails its checksum or has another format version.
+    """
+    if len(payload) < _PREFIX.size + _DIGEST_SIZE:
+        raise ValueError("Index data is truncated")
+    body, digest = payload[:-_DIGEST_SIZE], payload[-_DIGEST_SIZE:]
+    magic, version, header_size = _PREFIX.unpack_from(body)
+    if magic != MAGIC:
+        raise ValueError("Not a serialized index")
+    if hashlib.sha256(body).digest() != digest:
+        raise ValueError("Index data failed its checksum")
+    if version != FORMAT_VERSION:
+        raise ValueError(
+            f"Unsupported index format version {version}, expected {FORMAT_VERSION}"
+        )
+
+    header = json.loads(body[_PREFIX.size : _PREFIX.size + header_size])
+    base = _PREFIX.size + header_size
+    arrays = []
+    for entry in header["arrays"]:
+        dtype = np.dtype(entry["dtype"])
+        count = int(np.prod(entry["shape"], dtype=np.int64))
+        start = base + entry["offset"]
+        if start + count * dtype.itemsize > len(body):
+            raise ValueError("Index data is truncated")
+        array = np.frombuffer(body, dtype=dtype, count=count, offset=start)
+        arrays.append(array.reshape(entry["shape"]).copy())
+
+    def decode(value: Any) -> Any:
+        if isinstance(value, dict):
+            if _ARRAY_KEY in value:
+                return arrays[value[_ARRAY_KEY]]
+            return {key: decode(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [decode(item) for item in value]
+        return value
+
+    return header["index"], decode(header["state"])
+
+
+def pack_lists(lists: dict[int, list[int]]) -> dict[str, np.ndarray]:
+    """Flatten an int -> list of ints mapping into CSR arrays."""
+    keys = np.fromiter(lists, dtype=np.int64, count=len(lists))
+    sizes = np.fromiter((len(values) for values in lists.values()), dtype=np.int64)
+    values = [value for values in lists.values() for value in values]
+    return {
+        "keys": keys,
+        "offsets": np.concatenate([[0], np.cumsum(sizes)]).astype(np.int64),
+        "values": np.asarray(values, dtype=np.int64),
+    }
+
+
+def unpack_lists(packed: dict[str, np.ndarray]) -> dict[int, list[int]]:
+    """Rebuild the mapping that pack_lists flattened."""
+    offsets = packed["offsets"].tolist()
+    values = packed["values"].tolist()
+    return {
+        key: values[start:end]
+        for key, start, end in zip(packed["keys"].tolist(), offsets, offsets[1:])
+    }
@@ -0,0 +1,169 @@
+"""Sharded index: one library split across several indices searched in parallel."""
+
+from __future__ import annotations
+
+import heapq
+import os
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from itertools import islice
+from typing import AbstractSet, Any, Optional
+
+from app.core import settings
+from app.vector_index import VectorIndex
+
+
+@lru_cache(maxsize=1)
+def search_pool() -> ThreadPoolExecutor:
+    """Thread pool shared by every sharded index's fan-out."""
+    workers = settings.shard_search_workers or os.cpu_count() or 1
+    return ThreadPoolExecutor(workers, thread_name_prefix="shard-search")
+
+
+def shard_of(vec_id: str, shards: int) -> int:
+    """Stable shard number of an id, so changes find their shard again."""
+    return zlib.crc32(vec_id.encode("utf-8")) % shards
+
+
+def merge_top(
+    ranked: list[list[tuple[str, float]]], limit: int
+) -> list[tuple[str, float]]:
+    """Merge best-first result lists into the overall best ``limit``."""
+    merged = heapq.merge(*ranked, key=lambda item: item[1], reverse=True)
+    return list(islice(merged, limit))
+
+
+class ShardedIndex(VectorIndex):
+    """Index over a library split by id hash across independent shards.
+
+    Every shard is a complete index of the same kind and metric over its
+    part of the vectors. Queries run on all shards at once on a shared
+    thread pool and their best-first lists are merged with a heap, so
+    scoring kernels that release the GIL (numpy matrix products in the
+    flat, IVF and binary indices) run in parallel. Per-query knobs such as
+    HNSW ``ef`` and deadlines are passed on to every shard.
+
+    Adds, updates and removals go to the shard that owns each id.
+    """
+
+    def __init__(self, shards: list[VectorIndex]) -> None:
+        if len(shards) < 2:
+            raise ValueError("A sharded index needs at least two shards")
+        self._shards = shards
+
+    def build(self, vectors: list[list[float]], ids: list[str]) -> None:
+        """Partition vectors by id and build every shard on its part."""
+        self._validate_inputs(vectors, ids)
+        for shard, (part_ids, part_vectors) in zip(
+            self._shards, self._partition(ids, vectors)
+        ):
+            shard.build(part_vectors, part_ids)
+
+    def query(
+        self,
+        vector: list[float],
+        k: int,
+        allowed: Optional[AbstractSet[str]] = None,
+        **search_params: Any,
+    ) -> list[tuple[str, float]]:
+        """Query every shard in parallel and merge their top k."""
+        return self.query_batch([vector], k, allowed, **search_params)[0]
+
+    def query_batch(
+        self,
+        vectors: list[list[float]],
+        k: int,
+        allowed: Optional[AbstractSet[str]] = None,
+        **search_params: Any,
+    ) -> list[list[tuple[str, float]]]:
+        """Query every shard for all vectors in parallel, merging per vector."""
+        per_shard = list(
+            search_pool().map(
+                lambda shard: shard.query_batch(
+                    vectors, k, allowed=allowed, **search_params
+                ),
+                self._shards,
+            )
+        )
+        return [merge_top(list(ranked), k) for ranked in zip(*per_shard)]
+
+    def range_query(
+        self,
+        vector: list[float],
+        min_score: float,
+        limit: int,
+        allowed: Optional[AbstractSet[str]] = None,
+    ) -> list[tuple[str, float]]:
+        """Range-query every shard in parallel and merge the best ``limit``."""
+        per_shard = list(
+            search_pool().map(
+                lambda shard: shard.range_query(vector, min_score, limit, allowed),
+                self._shards,
+            )
+        )
+        return merge_top(per_shard, limit)
+
+    def add(self, ids: list[str], vectors: list[list[float]]) -> None:
+        """Insert or replace vectors in the shards that own their ids."""
+        self._validate_inputs(vectors, ids)
+        for shard, (part_ids, part_vectors) in zip(
+            self._shards, self._partition(ids, vectors)
+        ):
+            if part_ids:
+                shard.add(part_ids, part_vectors)
+
+    def remove(self, ids: list[str]) -> None:
+        """Drop ids from the shards that own them."""
+        for shard, (part_ids, _) in zip(self._shards, self._partition(ids)):
+            if part_ids:
+                shard.remove(part_ids)
+
+    def size(self) -> int:
+        return sum(shard.size() for shard in self._shards)
+
+    def _append(self, ids: list[str], vectors: list[list[float]]) -> None:
+        self.add(ids, vectors)
+
+    def metric(self) -> str:
+        """Return the distance metric of the shards."""
+        return self._shards[0].metric()
+
+    def kind(self) -> str:
+        """Return the index type of the shards."""
+        return self._shards[0].kind()
+
+    def params(self) -> dict[str, Any]:
+        """Return the shards' build parameters plus the shard count."""
+        return {**self._shards[0].params(), "shards": len(self._shards)}
+
+    def rerank_candidates(self) -> int:
+        """Return how many merged candidates should be re-scored exactly."""
+        return self._shards[0].rerank_candidates()
+
+    def needs_compaction(self) -> bool:
+        return any(shard.needs_compaction() for shard in self._shards)
+
+    def ids(self) -> list[str]:
+        return [vec_id for shard in self._shards for vec_id in shard.ids()]
+
+    def _state(self) -> dict[str, Any]:
+        return {"shards": [shard._state() for shard in self._shards]}
+
+    def _load_state(self, state: dict[str, Any]) -> None:
+        for shard, shard_state in zip(self._shards, state["shards"]):
+            shard._load_state(shard_state)
+
+    def _partition(
+        self, ids: list[str], vectors: Optional[list[list[float]]] = None
+    ) -> list[tuple[list[str], list[list[float]]]]:
+        """Split ids (and their vectors) into one part per shard."""
+        parts: list[tuple[list[str], list[list[float]]]] = [
+            ([], []) for _ in self._shards
+        ]
+        for position, vec_id in enumerate(ids):
+            part_ids, part_vectors = parts[shard_of(vec_id, len(self._shards))]
+            part_ids.append(vec_id)
+            if vectors is not None:
+                part_vectors.append(vectors[position])
+        return parts
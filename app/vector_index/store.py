@@ -0,0 +1,110 @@
+"""Contiguous full-precision vector store used to re-rank candidates."""
+
+from __future__ import annotations
+
+import numpy as np
+
+from app.vector_index import reserve_rows, scores_from_dots, top_k_indices
+
+
+class VectorStore:
+    """Float32 embeddings of one library, packed in a single matrix.
+
+    Approximate and compressed indices rank candidates on a cheap
+    representation; the service re-scores the best of them against these
+    rows. A query's candidates are gathered with one fancy index and
+    scored with one product against cached row norms, instead of
+    converting per-chunk embedding lists. Removed rows are filled with the
+    last row so the matrix stays dense.
+    """
+
+    def __init__(self) -> None:
+        self._reset(0)
+
+    def _reset(self, dim: int) -> None:
+        self._dim = dim
+        self._data = np.empty((0, dim), dtype=np.float32)
+        self._norms = np.empty(0, dtype=np.float64)
+        self._ids: list[str] = []
+        self._row_of: dict[str, int] = {}
+
+    def build(self, vectors: list[list[float]], ids: list[str]) -> None:
+        """Replace the contents with the given vectors."""
+        if len(vectors) != len(ids):
+            raise ValueError("Vectors and ids must have the same length")
+
+        self._reset(len(vectors[0]) if vectors else 0)
+        if vectors:
+            self.put(ids, vectors)
+
+    def put(self, ids: list[str], vectors: list[list[float]]) -> None:
+        """Insert vectors, overwriting the rows of ids already stored."""
+        if not ids:
+            return
+
+        block = np.asarray(vectors, dtype=np.float32)
+        if not self._ids and not self._dim:
+            self._reset(block.shape[1])
+        if block.ndim != 2 or block.shape[1] != self._dim:
+            raise ValueError("Vector dimensionality mismatch")
+
+        norms = np.linalg.norm(block.astype(np.float64), axis=1)
+        new = [i for i, cid in enumerate(ids) if cid not in self._row_of]
+        for i, cid in enumerate(ids):
+            row = self._row_of.get(cid)
+            if row is not None:
+                self._data[row] = block[i]
+                self._norms[row] = norms[i]
+
+        start = len(self._ids)
+        self._data = reserve_rows(self._data, start, len(new))
+        self._norms = reserve_rows(self._norms, start, len(new))
+        self._data[start : start + len(new)] = block[new]
+        self._norms[start : start + len(new)] = norms[new]
+        for row, i in enumerate(new, start):
+            self._ids.append(ids[i])
+            self._row_of[ids[i]] = row
+
+    def remove(self, ids: list[str]) -> None:
+        """Drop vectors, moving the last row into each freed slot."""
+        for cid in ids:
+            row = self._row_of.pop(cid, None)
+            if row is None:
+                continue
+            last = len(self._ids) - 1
+            if row != last:
+                moved = self._ids[last]
+                self._data[row] = self._data[last]
+                self._norms[row] = self._norms[last]
+                self._ids[row] = moved
+                self._row_of[moved] = row
+            self._ids.pop()
+
+    def size(self) -> int:
+        return len(self._ids)
+
+    def rerank(
+        self, queries: list[list[float]], candidates: list[list[str]], metric: str
+    ) -> list[list[tuple[str, float]]]:
+        """Score each query's candidates exactly, best first.
+
+        Candidates that are not stored are dropped.
+        """
+        reranked = []
+        for query, ids in zip(queries, candidates):
+            ids = [cid for cid in ids if cid in self._row_of]
+            if not ids:
+                reranked.append([])
+                continue
+
+            if len(query) != self._dim:
+                raise ValueError("Query vector dimensionality mismatch")
+            rows = np.fromiter(
+                (self._row_of[cid] for cid in ids), dtype=np.int64, count=len(ids)
+            )
+            vector = np.asarray([query], dtype=np.float32)
+            dots = (vector @ self._data[rows].T).astype(np.float64)
+            scores = scores_from_dots(dots, vector, self._norms[rows], metric)[0]
+            order = top_k_indices(scores, len(ids))
+            reranked.append([(ids[i], float(scores[i])) for i in order])
+        return reranked
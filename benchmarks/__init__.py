@@ -0,0 +1 @@
+"""Recall and throughput benchmarks for the vector index implementations."""
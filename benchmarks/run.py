@@ -0,0 +1,263 @@
+"""Benchmark every index algorithm and metric on a synthetic dataset.
+
+Usage:
+    python -m benchmarks.run [--n 2000] [--dim 32] [--output results.json]
+        [--baseline benchmarks/baselines.json] [--update-baseline]
+        [--trace-memory]
+
+Each supported algorithm/metric pair is built with its default parameters
+and measured for build time, index memory, recall@k, QPS and p50/p95/p99
+query latency. With ``--trace-memory`` a second, untimed build runs under
+tracemalloc to report its peak allocation; tracing slows pure-Python
+builds such as HNSW down by an order of magnitude. Results are printed as a
+table and optionally written as JSON. With ``--baseline`` the run is
+compared against stored results and exits non-zero on a regression.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import pathlib
+import sys
+import tracemalloc
+from typing import Any, Callable, Optional
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.constants import ALGORITHM_METRICS, IndexAlgorithm
+from app.services.index_service import IndexService
+from app.vector_index import VectorIndex
+from app.vector_index.evaluation import evaluate_index
+from benchmarks.datasets import clustered_dataset, ground_truth
+
+DEFAULT_BASELINE = pathlib.Path(__file__).with_name("baselines.json")
+# Largest absolute recall drop tolerated against the baseline
+RECALL_TOLERANCE = 0.02
+# Largest slowdown of build time or median latency tolerated against the
+# baseline; timings vary between machines, so this is deliberately loose
+LATENCY_FACTOR = 3.0
+
+COLUMNS = [
+    ("algorithm", "algorithm", "{}"),
+    ("metric", "metric", "{}"),
+    ("recall", "recall", "{:.3f}"),
+    ("qps", "qps", "{:.0f}"),
+    ("p50_ms", "p50 ms", "{:.3f}"),
+    ("p95_ms", "p95 ms", "{:.3f}"),
+    ("p99_ms", "p99 ms", "{:.3f}"),
+    ("build_ms", "build ms", "{:.1f}"),
+    ("peak_build_bytes", "peak build MB", "{:.2f}"),
+    ("memory_bytes", "index MB", "{:.2f}"),
+]
+MEGABYTE_COLUMNS = {"peak_build_bytes", "memory_bytes"}
+
+
+def peak_build_bytes(make_index: Callable[[], VectorIndex], vectors: np.ndarray) -> int:
+    """Peak bytes allocated while building a fresh index on vectors."""
+    ids = [str(row) for row in range(len(vectors))]
+    data = vectors.tolist()
+    index = make_index()
+    tracemalloc.start()
+    try:
+        index.build(data, ids)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run_suite(
+    n: int,
+    dim: int,
+    clusters: int,
+    num_queries: int,
+    k: int,
+    seed: int = 0,
+    algorithms: Optional[list[str]] = None,
+    metrics: Optional[list[str]] = None,
+    trace_memory: bool = False,
+) -> dict[str, Any]:
+    """Measure each selected algorithm/metric pair on one dataset.
+
+    Returns:
+        The dataset parameters under ``dataset`` and one row per pair under
+        ``results``
+    """
+    vectors, queries = clustered_dataset(n, dim, clusters, num_queries, seed)
+    results = []
+    for algorithm, supported in ALGORITHM_METRICS.items():
+        if algorithms and algorithm.value not in algorithms:
+            continue
+        for metric in supported:
+            if metrics and metric.value not in metrics:
+                continue
+            truth = ground_truth(vectors, queries, k, metric.value)
+
+            def make_index() -> VectorIndex:
+                return IndexService.create_index(algorithm.value, metric.value)
+
+            measured = evaluate_index(
+                make_index, vectors, queries, truth, k, settings.rerank_factor
+            )
+            if trace_memory:
+                measured["peak_build_bytes"] = peak_build_bytes(make_index, vectors)
+            results.append(
+                {"algorithm": algorithm.value, "metric": metric.value, **measured}
+            )
+
+    return {
+        "dataset": {
+            "n": n,
+            "dim": dim,
+            "clusters": clusters,
+            "num_queries": num_queries,
+            "k": k,
+            "seed": seed,
+        },
+        "results": results,
+    }
+
+
+def compare(
+    report: dict[str, Any],
+    baseline: dict[str, Any],
+    recall_tolerance: float = RECALL_TOLERANCE,
+    latency_factor: float = LATENCY_FACTOR,
+) -> list[str]:
+    """List the regressions of report against baseline.
+
+    Recall may drop by at most ``recall_tolerance``; build time and median
+    latency may grow by at most ``latency_factor`` (0 disables timing
+    checks). Pairs missing from either side are not compared.
+    """
+    if report["dataset"] != baseline["dataset"]:
+        return [
+            f"dataset {report['dataset']} differs from baseline {baseline['dataset']}"
+        ]
+
+    expected = {(r["algorithm"], r["metric"]): r for r in baseline["results"]}
+    regressions = []
+    for row in report["results"]:
+        name = f"{row['algorithm']}/{row['metric']}"
+        base = expected.get((row["algorithm"], row["metric"]))
+        if base is None:
+            continue
+        if row["recall"] < base["recall"] - recall_tolerance:
+            regressions.append(
+                f"{name}: recall {row['recall']:.3f} < baseline {base['recall']:.3f}"
+            )
+        if not latency_factor:
+            continue
+        for key in ("build_ms", "p50_ms"):
+            if row[key] > base[key] * latency_factor:
+                regressions.append(
+                    f"{name}: {key} {row[key]:.3f} > {latency_factor:g}x "
+                    f"baseline {base[key]:.3f}"
+                )
+    return regressions
+
+
+def format_table(report: dict[str, Any]) -> str:
+    """Render the results as an aligned plain-text table."""
+    rows = [[title for _, title, _ in COLUMNS]]
+    for result in report["results"]:
+        cells = []
+        for key, _, fmt in COLUMNS:
+            value = result.get(key)
+            if value is None:
+                cells.append("-")
+                continue
+            if key in MEGABYTE_COLUMNS:
+                value = value / 1e6
+            cells.append(fmt.format(value))
+        rows.append(cells)
+
+    widths = [max(len(row[i]) for row in rows) for i in range(len(COLUMNS))]
+    lines = [
+        "  ".join(
+            cell.ljust(width) if i < 2 else cell.rjust(width)
+            for i, (cell, width) in enumerate(zip(row, widths))
+        )
+        for row in rows
+    ]
+    lines.insert(1, "  ".join("-" * width for width in widths))
+    return "\n".join(lines)
+
+
+def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--n", type=int, default=2000, help="Indexed vectors")
+    parser.add_argument("--dim", type=int, default=32, help="Vector dimension")
+    parser.add_argument("--clusters", type=int, default=16, help="Mixture size")
+    parser.add_argument("--queries", type=int, default=200, help="Query count")
+    parser.add_argument("--k", type=int, default=10, help="Neighbors per query")
+    parser.add_argument("--seed", type=int, default=0, help="Dataset seed")
+    parser.add_argument(
+        "--algorithm",
+        action="append",
+        choices=[a.value for a in IndexAlgorithm],
+        help="Only benchmark this algorithm (repeatable)",
+    )
+    parser.add_argument(
+        "--metric", action="append", help="Only benchmark this metric (repeatable)"
+    )
+    parser.add_argument(
+        "--trace-memory",
+        action="store_true",
+        help="Also report each build's peak allocation (slow)",
+    )
+    parser.add_argument("--output", type=pathlib.Path, help="Write results as JSON")
+    parser.add_argument(
+        "--baseline", type=pathlib.Path, help="Fail on regressions against this file"
+    )
+    parser.add_argument(
+        "--update-baseline",
+        action="store_true",
+        help="Overwrite the baseline file with this run",
+    )
+    parser.add_argument("--recall-tolerance", type=float, default=RECALL_TOLERANCE)
+    parser.add_argument("--latency-factor", type=float, default=LATENCY_FACTOR)
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    args = parse_args(argv)
+    report = run_suite(
+        args.n,
+        args.dim,
+        args.clusters,
+        args.queries,
+        args.k,
+        args.seed,
+        args.algorithm,
+        args.metric,
+        args.trace_memory,
+    )
+    print(format_table(report))
+
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2) + "\n")
+
+    baseline_path = args.baseline or DEFAULT_BASELINE
+    if args.update_baseline:
+        baseline_path.write_text(json.dumps(report, indent=2) + "\n")
+        print(f"\nBaseline written to {baseline_path}")
+        return 0
+
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text())
+        regressions = compare(
+            report, baseline, args.recall_tolerance, args.latency_factor
+        )
+        if regressions:
+            print("\nRegressions against " + str(args.baseline) + ":")
+            for regression in regressions:
+                print(f"  {regression}")
+            return 1
+        print(f"\nNo regressions against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -120,11 +120,41 @@ class VectorDBClient:
         self._request("DELETE", f"/libraries/{library_id}/chunks/{chunk_id}")
 
     def build_index(
-        self, library_id: str, algorithm: str, metric: str
+        self,
+        library_id: str,
+        algorithm: str,
+        metric: str,
+        params: Optional[Dict[str, Any]] = None,
     ) -> Dict[str, Any]:
-        payload = {"algorithm": algorithm, "metric": metric}
+        payload = {"algorithm": algorithm, "metric": metric, "params": params or {}}
         return self._request("PUT", f"/libraries/{library_id}/index", json=payload)
 
+    def submit_index_build(
+        self,
+        library_id: str,
+        algorithm: str,
+        metric: str,
+        params: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        payload = {"algorithm": algorithm, "metric": metric, "params": params or {}}
+        return self._request(
+            "POST", f"/libraries/{library_id}/index/jobs", json=payload
+        )
+
+    def submit_autotune(
+        self,
+        library_id: str,
+        metric: str,
+        **options: Any,
+    ) -> Dict[str, Any]:
+        payload = {"metric": metric, **options}
+        return self._request(
+            "POST", f"/libraries/{library_id}/index/autotune", json=payload
+        )
+
+    def get_index_job(self, library_id: str, job_id: str) -> Dict[str, Any]:
+        return self._request("GET", f"/libraries/{library_id}/index/jobs/{job_id}")
+
     def get_index(self, library_id: str) -> Dict[str, Any]:
         return self._request("GET", f"/libraries/{library_id}/index")
 
@@ -159,6 +189,34 @@ class VectorDBClient:
             "POST", f"/libraries/{library_id}/chunks/search", json=payload
         )
 
+    def search_batch(
+        self,
+        library_id: str,
+        vectors: List[List[float]],
+        k: int = 10,
+        metadata_filters: Optional[Dict[str, str]] = None,
+    ) -> Dict[str, Any]:
+        """Search for similar chunks for several query vectors in one request.
+
+        Args:
+            library_id: The library to search in
+            vectors: Query vectors
+            k: Number of results to return per vector (default: 10)
+            metadata_filters: Optional metadata filters applied to every vector
+
+        Returns:
+            Search response with one result list per query vector
+        """
+        payload = {
+            "vectors": vectors,
+            "k": k,
+            "metadata_filters": metadata_filters or {},
+        }
+
+        return self._request(
+            "POST", f"/libraries/{library_id}/chunks/search/batch", json=payload
+        )
+
     def create_snapshot(self, name: Optional[str] = None) -> Dict[str, Any]:
         """Create a new database snapshot.
 